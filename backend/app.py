@@ -1,19 +1,31 @@
 import os
 import json
-import pandas as pd
 import re
-import numpy as np
-from flask import Flask, request, jsonify
+import threading
+import multiprocessing
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-from openai import OpenAI
-import chromadb
-from chromadb.utils import embedding_functions
-import tiktoken
 from dotenv import load_dotenv
-from collections import deque
-from datetime import datetime
-import PyPDF2
-from werkzeug.utils import secure_filename
+import time
+
+from conversation_summary import ConversationSummarizer, describe_summary, unsummarized_messages
+from course_index import CourseIndex, base_number
+from degree_planner import DegreePlanner, describe_plan
+from pdf_extraction import PdfExtractionError, PdfExtractionPool
+from prereq_graph import PrereqGraph, describe_eligibility
+from prompt_builder import PromptBuilder, TokenCounter
+from response_cache import ResponseCache
+from llm_gateway import GatewayOverloaded, LLMGateway
+from intent_router import REFERENCE_PATTERNS, IntentRouter, find_course_numbers
+from lazy import LazyResource, ResourceUnavailable
+from metrics import TOKEN_BUCKETS, Metrics
+from retrieval import SemanticRetriever
+from session_store import create_session_store
+from shards import ShardCollections, ShardRouter
+from transcript_cache import TranscriptCache
+from transcript_parser import TranscriptParser
 
 # Load environment variables from .env file
 load_dotenv()
@@ -21,187 +33,418 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app) 
 
+# Stage timings, token counts, cache hit rates and session counts, served on
+# /metrics. METRICS_TRACE=1 also logs one JSON line per request with its stages.
+metrics = Metrics(trace=os.getenv('METRICS_TRACE', '').lower() in ('1', 'true', 'yes'))
+request_seconds = metrics.histogram('request_seconds', 'Request latency by endpoint, including streamed bodies', ['endpoint'])
+requests_total = metrics.counter('requests_total', 'Requests by endpoint and status code', ['endpoint', 'status'])
+llm_tokens = metrics.counter('llm_tokens_total', 'Tokens used by chat completions', ['type'])
+embedding_tokens = metrics.counter('embedding_tokens_total', 'Tokens sent to the embeddings API')
+prompt_tokens = metrics.histogram('prompt_tokens', 'Tokens in each assembled prompt', buckets=TOKEN_BUCKETS)
+token_counter = TokenCounter()
+
+def record_completion_usage(usage):
+    """Count the tokens an OpenAI completion reports"""
+    if usage:
+        llm_tokens.inc(usage.prompt_tokens, type='prompt')
+        llm_tokens.inc(usage.completion_tokens, type='completion')
+        metrics.annotate('prompt_tokens', usage.prompt_tokens)
+        metrics.annotate('completion_tokens', usage.completion_tokens)
+
 # Add these configurations after the CORS setup and before the routes
-UPLOAD_FOLDER = './uploads'
 ALLOWED_EXTENSIONS = {'pdf'}
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
-# Create uploads directory if it doesn't exist
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+# Uploads are parsed straight from the request stream, never written to disk
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', 5 * 1024 * 1024))
+MAX_PDF_PAGES = int(os.getenv('MAX_PDF_PAGES', 20))
+# Leave room for the multipart envelope; the file itself is checked against MAX_UPLOAD_BYTES
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + 64 * 1024
+
+# PDF text extraction runs in worker processes so slow PDFs can't stall chat traffic
+pdf_pool = PdfExtractionPool(
+    workers=int(os.getenv('PDF_WORKERS', 2)),
+    timeout=float(os.getenv('PDF_TIMEOUT', 15)),
+    max_pages=MAX_PDF_PAGES
+)
+
+# Below this share of cleanly parsed course lines, transcripts are sent to GPT-4 instead
+TRANSCRIPT_MIN_CONFIDENCE = float(os.getenv('TRANSCRIPT_MIN_CONFIDENCE', 0.8))
+
+# Extraction results keyed by a hash of the uploaded bytes, so re-uploads skip
+# PyPDF2 and GPT-4. Only the course list is kept, never the PDF. Set
+# TRANSCRIPT_CACHE_PATH to also keep results in a local SQLite file.
+transcript_cache = TranscriptCache(
+    max_size=int(os.getenv('TRANSCRIPT_CACHE_SIZE', 256)),
+    ttl=int(os.getenv('TRANSCRIPT_CACHE_TTL', 7 * 24 * 3600)),
+    db_path=os.getenv('TRANSCRIPT_CACHE_PATH') or None,
+    namespace=f"{TRANSCRIPT_MIN_CONFIDENCE}:{MAX_PDF_PAGES}"
+)
 
 def allowed_file(filename):
     """Check if the file extension is allowed"""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# The OpenAI client, embedding function, Chroma collections and retriever are
+# created on first use (or by warm_up below), so importing this module doesn't
+# pay for the openai and chromadb imports or fail when the database is missing
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', 64))
 
-# Initialize ChromaDB
-chroma_client = chromadb.PersistentClient(path="./chroma_db")
-openai_ef = embedding_functions.OpenAIEmbeddingFunction(
-    api_key=os.getenv('OPENAI_API_KEY'),
-    model_name="text-embedding-ada-002"
+def create_openai_client():
+    """OpenAI client shared by all request threads, with a connection pool
+    sized for the number of concurrent completions we expect to run"""
+    import httpx
+    from openai import OpenAI
+    return OpenAI(
+        api_key=os.getenv('OPENAI_API_KEY'),
+        http_client=httpx.Client(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_CONNECTIONS
+            )
+        )
+    )
+
+openai_client = LazyResource('OpenAI client', create_openai_client)
+
+# Every chat completion goes through the gateway: identical in-flight prompts
+# share one call, at most LLM_MAX_CONCURRENCY run at once and LLM_MAX_QUEUE
+# more may wait, and calls that waited over LLM_FALLBACK_AFTER seconds use
+# LLM_FALLBACK_MODEL (if set) instead of GPT-4
+llm_gateway = LLMGateway(
+    openai_client.get,
+    model="gpt-4",
+    fallback_model=os.getenv('LLM_FALLBACK_MODEL') or None,
+    max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', OPENAI_MAX_CONNECTIONS)),
+    max_queue=int(os.getenv('LLM_MAX_QUEUE', 128)),
+    queue_timeout=float(os.getenv('LLM_QUEUE_TIMEOUT', 10)),
+    fallback_after=float(os.getenv('LLM_FALLBACK_AFTER', 2)),
+    timeout=float(os.getenv('OPENAI_TIMEOUT', 60)),
+    retries=int(os.getenv('LLM_RETRIES', 2)),
+    on_usage=record_completion_usage
 )
 
-# Get both collections
-try:
-    title_collection_undergrad = chroma_client.get_collection(
-        name="undergrad_titles",
-        embedding_function=openai_ef
-    )
-    full_collection_undergrad = chroma_client.get_collection(
-        name="undergrad_courses",
-        embedding_function=openai_ef
-    )
-    title_collection_grad = chroma_client.get_collection(
-        name="grad_titles",
-        embedding_function=openai_ef
+def create_embedding_function():
+    from chromadb.utils import embedding_functions
+    from embedding_cache import CachedEmbeddingFunction
+    return CachedEmbeddingFunction(
+        embedding_functions.OpenAIEmbeddingFunction(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            model_name="text-embedding-ada-002"
+        ),
+        model_name="text-embedding-ada-002",
+        max_size=int(os.getenv('EMBEDDING_CACHE_SIZE', 10000)),
+        ttl=int(os.getenv('EMBEDDING_CACHE_TTL', 30 * 24 * 3600)),
+        db_path=os.getenv('EMBEDDING_CACHE_PATH', './embedding_cache.sqlite3') or None,  # empty disables the disk tier
+        on_embed=lambda texts: embedding_tokens.inc(sum(token_counter.count(text) for text in texts))
     )
-    full_collection_grad = chroma_client.get_collection(
-        name="grad_courses",
-        embedding_function=openai_ef
+
+openai_ef = LazyResource('embedding function', create_embedding_function)
+
+# Courses are stored in one (title, full) collection pair per department and
+# level; each query is routed to a single shard (see shards.ShardRouter), so
+# query cost doesn't grow with the number of catalogs ingested
+DEFAULT_DEPARTMENT = os.getenv('DEFAULT_DEPARTMENT', 'CSE')
+shard_router = ShardRouter(os.getenv('SHARDS_PATH', './chroma_db/shards.json'), DEFAULT_DEPARTMENT)
+
+def open_collections():
+    """Shard collections, opened on first use; init_db.py must have created them"""
+    import chromadb
+    chroma_client = chromadb.PersistentClient(path="./chroma_db")
+    embedding_function = openai_ef.get()
+    collections = ShardCollections(
+        shard_router,
+        lambda name: chroma_client.get_collection(name=name, embedding_function=embedding_function)
     )
-    print("Successfully connected to existing collections")
-except Exception as e:
-    print(f"Error connecting to collections: {e}")
-    print("Please run init_db.py first to initialize the database")
-    exit(1)
-
-# Initialize conversation memory
-conversation_memory = {}  # Dictionary to store conversations by session
+    shard_router.reload_if_changed()
+    try:
+        if not shard_router.shards:
+            raise RuntimeError(f"No shard registry at {shard_router.path}")
+        collections.get(shard_router.route('', 'undergraduate'))
+    except Exception as e:
+        raise RuntimeError(f"{e}. Please run init_db.py first to initialize the database") from e
+    print(f"Successfully connected to existing collections ({len(shard_router.shards)} shards)")
+    return collections
+
+chroma_collections = LazyResource('Chroma collections', open_collections)
+
+# In-memory index for exact course-number lookups; Chroma is only needed for semantic search
+course_index = CourseIndex()
+course_index.load()
+
+# Parsed prerequisite/exclusion graph (written by process_prereqs.py) for
+# eligibility checks that don't need the LLM
+prereq_graph = PrereqGraph()
+prereq_graph.load()
+
+# Answers title/units/prerequisite/description lookups straight from the catalog
+intent_router = IntentRouter(course_index, prereq_graph, DEFAULT_DEPARTMENT)
+
+# Deterministic semester-by-semester planning; the LLM only narrates its output
+degree_planner = DegreePlanner(prereq_graph)
+PLAN_QUERY = re.compile(r'\b(plan\w*|schedul\w*|roadmap|semester by semester|4.year|four.year)\b', re.IGNORECASE)
+
+# Embeds each semantic query once and shares the vector across both collections.
+# RETRIEVAL_BACKEND=snapshot answers from the memory-mapped export init_db.py
+# writes instead of going through Chroma (which is then never opened).
+# RETRIEVAL_BACKEND=hybrid fuses an in-process BM25 index with the Chroma
+# results; RETRIEVAL_BACKEND=local fuses it with LOCAL_EMBEDDING vectors
+# computed on the CPU, so retrieval needs neither Chroma nor the network.
+RETRIEVAL_BACKEND = os.getenv('RETRIEVAL_BACKEND', 'chroma')
+
+def create_retriever():
+    if RETRIEVAL_BACKEND == 'snapshot':
+        from vector_snapshot import SNAPSHOT_PATH, SnapshotRetriever
+        return SnapshotRetriever(openai_ef.get(), os.getenv('SNAPSHOT_PATH', SNAPSHOT_PATH))
+    if RETRIEVAL_BACKEND == 'local':
+        from hybrid_retrieval import HybridRetriever
+        from local_embeddings import LocalVectorIndex, create_local_embedding_function
+        vectors = LocalVectorIndex(create_local_embedding_function(os.getenv('LOCAL_EMBEDDING', 'hashing')))
+        return HybridRetriever(vectors, rrf_k=int(os.getenv('HYBRID_RRF_K', 60)))
+    chroma_collections.get()
+    vectors = SemanticRetriever(openai_ef.get(), collections_for_shard)
+    if RETRIEVAL_BACKEND == 'hybrid':
+        from hybrid_retrieval import HybridRetriever
+        return HybridRetriever(vectors, rrf_k=int(os.getenv('HYBRID_RRF_K', 60)))
+    return vectors
+
+retriever = LazyResource('retriever', create_retriever)
+
+# Initialize conversation memory. SESSION_STORE=sqlite shares sessions between
+# worker processes through a local SQLite file instead of keeping them per-process.
 MEMORY_LIMIT = 5  # Number of recent messages to remember
-MEMORY_EXPIRY = 7200  # Session expiry in seconds (1 hour)
+MEMORY_EXPIRY = 7200  # Session expiry in seconds (2 hours)
+session_store = create_session_store(
+    backend=os.getenv('SESSION_STORE', 'memory'),
+    path=os.getenv('SESSION_DB_PATH', './sessions.sqlite3'),
+    memory_limit=MEMORY_LIMIT,
+    expiry=MEMORY_EXPIRY
+)
 
+# Once the unsummarized history passes SUMMARY_TOKEN_THRESHOLD tokens, older
+# exchanges are folded into a short per-session summary (goals, decisions,
+# courses discussed) in the background, so prompts carry the summary instead
+# of re-sending the full history. CONVERSATION_SUMMARY=0 sends the last
+# MEMORY_LIMIT exchanges verbatim instead. Summaries use the cheap
+# SUMMARY_MODEL through their own gateway of SUMMARY_MAX_CONCURRENCY slots,
+# so they never take a slot from a student's request, and they wait while
+# student completions are queued.
+CONVERSATION_SUMMARY = os.getenv('CONVERSATION_SUMMARY', '1').lower() in ('1', 'true', 'yes')
+SUMMARY_MAX_CONCURRENCY = int(os.getenv('SUMMARY_MAX_CONCURRENCY', 2))
+
+summary_gateway = LLMGateway(
+    openai_client.get,
+    model=os.getenv('SUMMARY_MODEL', 'gpt-4o-mini'),
+    max_concurrency=SUMMARY_MAX_CONCURRENCY,
+    max_queue=SUMMARY_MAX_CONCURRENCY,
+    timeout=float(os.getenv('OPENAI_TIMEOUT', 60)),
+    retries=1,
+    on_usage=record_completion_usage
+)
+
+@metrics.timed('conversation_summary')
+def summarize_conversation(messages):
+    response = summary_gateway.complete(messages, temperature=0, max_tokens=300)
+    return response.choices[0].message.content
+
+conversation_summarizer = ConversationSummarizer(
+    session_store,
+    summarize_conversation,
+    max_workers=SUMMARY_MAX_CONCURRENCY,
+    count_tokens=token_counter.count,
+    token_threshold=int(os.getenv('SUMMARY_TOKEN_THRESHOLD', 800)),
+    should_defer=llm_gateway.saturated,
+    find_courses=lambda text: find_course_numbers(text, course_index.departments, DEFAULT_DEPARTMENT, bare=False)
+) if CONVERSATION_SUMMARY else None
+
+# Caps the tokens sent per completion (system message + prompt) so prompt size
+# and latency stay flat as conversations grow
+prompt_builder = PromptBuilder(budget=int(os.getenv('PROMPT_TOKEN_BUDGET', 3000)), counter=token_counter)
+
+def embedding_cache_lookups():
+    if not openai_ef.loaded:
+        return {}
+    stats = openai_ef.get().stats()
+    return {('memory',): stats['hits'] - stats['disk_hits'], ('disk',): stats['disk_hits'], ('miss',): stats['misses']}
+
+def router_queries():
+    stats = intent_router.stats()
+    return {('fast_path',): stats['fast_path'], ('llm',): stats['llm']}
+
+metrics.callback('embedding_cache_lookups_total', 'Embedding cache lookups by result', embedding_cache_lookups,
+                 kind='counter', labelnames=['result'])
+metrics.callback('embedding_cache_hit_ratio', 'Share of embedding lookups served from the cache',
+                 lambda: openai_ef.get().stats()['hit_rate'] if openai_ef.loaded else 0.0)
+metrics.callback('router_queries_total', 'Chat messages by how they were answered', router_queries,
+                 kind='counter', labelnames=['path'])
+metrics.callback('router_hit_ratio', 'Share of chat messages answered without the LLM',
+                 lambda: intent_router.stats()['hit_rate'])
+def transcript_cache_lookups():
+    stats = transcript_cache.stats()
+    return {('memory',): stats['hits'] - stats['disk_hits'], ('disk',): stats['disk_hits'], ('miss',): stats['misses']}
+
+metrics.callback('transcript_cache_lookups_total', 'Transcript extraction cache lookups by result',
+                 transcript_cache_lookups, kind='counter', labelnames=['result'])
+metrics.callback('active_sessions', 'Conversation sessions that have not expired', session_store.active_count)
+
+# Answers to questions that don't depend on the session are reused for
+# near-identical questions (cosine similarity >= RESPONSE_CACHE_THRESHOLD)
+# about the same retrieved courses; RESPONSE_CACHE_SIZE=0 disables this
+response_cache = ResponseCache(
+    max_size=int(os.getenv('RESPONSE_CACHE_SIZE', 1000)),
+    ttl=int(os.getenv('RESPONSE_CACHE_TTL', 6 * 3600)),
+    threshold=float(os.getenv('RESPONSE_CACHE_THRESHOLD', 0.97))
+)
+
+def response_cache_lookups():
+    stats = response_cache.stats()
+    return {('hit',): stats['hits'], ('miss',): stats['misses']}
+
+metrics.callback('response_cache_lookups_total', 'Response cache lookups by result', response_cache_lookups,
+                 kind='counter', labelnames=['result'])
+metrics.callback('response_cache_hit_ratio', 'Share of cacheable questions answered from the response cache',
+                 lambda: response_cache.stats()['hit_rate'])
+metrics.callback('response_cache_entries', 'Answers in the response cache', lambda: response_cache.stats()['size'])
+
+def llm_gateway_calls():
+    stats = llm_gateway.stats()
+    return {(outcome,): stats[outcome] for outcome in
+            ('calls', 'upstream', 'coalesced', 'shed', 'retries', 'timeouts', 'fallbacks', 'errors')}
+
+metrics.callback('llm_gateway_events_total', 'Completion gateway calls, merges, shedding, retries and fallbacks',
+                 llm_gateway_calls, kind='counter', labelnames=['event'])
+metrics.callback('llm_gateway_active', 'Completions running upstream', lambda: llm_gateway.stats()['active'])
+metrics.callback('llm_gateway_queued', 'Completions waiting for a slot', lambda: llm_gateway.stats()['queued'])
+metrics.callback('llm_gateway_queue_wait_seconds_total', 'Total time completions spent waiting for a slot',
+                 lambda: llm_gateway.stats()['queue_wait_seconds'], kind='counter')
+
+def conversation_summary_events():
+    if not conversation_summarizer:
+        return {}
+    stats = conversation_summarizer.stats()
+    return {(event,): stats[event] for event in ('scheduled', 'updates', 'exchanges', 'deferred', 'failures')}
+
+metrics.callback('conversation_summary_events_total', 'Background conversation summary updates and exchanges folded in',
+                 conversation_summary_events, kind='counter', labelnames=['event'])
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    if request.path not in ('/metrics', '/healthz', '/readyz'):
+        metrics.start_trace(method=request.method, path=request.path)
+
+@app.after_request
+def finish_request_metrics(response):
+    # Recorded when the response is closed so streamed bodies are included
+    start = g.request_start
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    status = response.status_code
+    def finish():
+        elapsed = time.perf_counter() - start
+        request_seconds.observe(elapsed, endpoint=endpoint)
+        requests_total.inc(endpoint=endpoint, status=str(status))
+        metrics.finish_trace(endpoint=endpoint, status=status, ms=round(elapsed * 1000, 3))
+    response.call_on_close(finish)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text exposition of this process's metrics"""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@metrics.timed('session_memory')
 def get_session_memory(session_id):
-    """Get or create conversation memory for a session"""
-    now = datetime.now()
-    
-    # Clean up expired sessions
-    expired = [sid for sid, data in conversation_memory.items() 
-              if (now - data['last_access']).total_seconds() > MEMORY_EXPIRY]
-    for sid in expired:
-        del conversation_memory[sid]
-    
-    # Get or create session
-    if session_id not in conversation_memory:
-        conversation_memory[session_id] = {
-            'messages': deque(maxlen=MEMORY_LIMIT),
-            'last_access': now,
-            'mentioned_courses': set(),
-            'student_level': 'undergraduate',
-            'transcript_courses': set(),
-            'completed_courses': set()
-        }
-    else:
-        conversation_memory[session_id]['last_access'] = now
-    
-    return conversation_memory[session_id]
+    """Get or create conversation memory for a session (a read-only snapshot)"""
+    return session_store.get(session_id)
 
-def update_session_memory(session_id, user_message, ai_response, mentioned_courses):
-    """Update session memory with new interaction"""
-    memory = get_session_memory(session_id)
-    memory['messages'].append({
-        'user': user_message,
-        'assistant': ai_response,
-        'timestamp': datetime.now()
-    })
-    memory['mentioned_courses'].update(mentioned_courses)
+@metrics.timed('update_session_memory')
+def update_session_memory(session_id, user_message, ai_response, mentioned_courses, summarize=True):
+    """Update session memory with new interaction.
 
-def get_relevant_courses(query, session_id=None, n_results=3):
-    """Retrieve relevant courses based on query and student level"""
+    Pass ``summarize=False`` for replies that didn't come from the LLM (level
+    changes, catalog answers, cache hits); only LLM turns check whether the
+    conversation summary is due. Requests without a session id (anonymous
+    /chat and batch items) have nothing to remember.
+    """
+    if not session_id:
+        return
+    with session_store.edit(session_id) as memory:
+        memory.messages.append({
+            'user': user_message,
+            'assistant': ai_response,
+            'timestamp': time.time()
+        })
+        memory.mentioned_courses.update(mentioned_courses)
+        # "It" means the last course the student named, or the only course in
+        # this exchange; mentioned_courses is a set, so it can't tell us
+        named = find_course_numbers(user_message, course_index.departments, DEFAULT_DEPARTMENT)
+        if named:
+            memory.last_course = named[-1]
+        elif len(mentioned_courses) == 1:
+            memory.last_course = next(iter(mentioned_courses))
+    if conversation_summarizer and summarize:
+        conversation_summarizer.schedule(session_id)
+
+def prompt_history(memory):
+    """(exchanges to send verbatim, summary lines) for a session's prompt"""
+    if not memory:
+        return [], []
+    if not conversation_summarizer:
+        return list(memory.messages), []
+    return unsummarized_messages(memory), describe_summary(memory.summary or {})
+
+def collections_for_shard(shard):
+    """Return the (title, full) collections for a shard key"""
+    return chroma_collections.get().get(shard)
+
+def plan_retrieval(query, session_id=None):
+    """Work out how to retrieve courses for a query.
+
+    Returns (shard, exact course-number matches, weighted query). The weighted
+    query is None when exact matches were found, otherwise it is the text to
+    search semantically in the shard.
+    """
     memory = get_session_memory(session_id) if session_id else None
-    student_level = memory['student_level'] if memory else 'undergraduate'
-    
-    # Select appropriate collections based on student level
-    title_collection = title_collection_grad if student_level == 'graduate' else title_collection_undergrad
-    full_collection = full_collection_grad if student_level == 'graduate' else full_collection_undergrad
+    student_level = memory.student_level if memory else 'undergraduate'
+    shard = shard_router.route(query, student_level)
     
     query = query.upper()
     
     # Extract course numbers from current query and conversation history
-    course_numbers = set()
-    search_variations = []
-    
-    # Process current query
-    patterns = [
-        r'CSE\s*(\d{4})',
-        r'(?<![\d])\d{4}(?![\d])'
-    ]
-    
-    # First check current query
-    for pattern in patterns:
-        matches = re.findall(pattern, query)
-        for match in matches:
-            if isinstance(match, tuple):
-                match = match[0]
-            cse_num = f"CSE{match}"
-            course_numbers.add(cse_num)
-            search_variations.extend([
-                f"Course Number: {cse_num}",
-                f"Course: {cse_num}",
-                cse_num,
-                match
-            ])
+    course_index.reload_if_changed()
+    course_numbers = find_course_numbers(query, course_index.departments, DEFAULT_DEPARTMENT)
     
     # If no explicit course numbers in query, check memory for context
     if memory and not course_numbers:
         # Check if query contains references to "this course" or "it"
-        reference_patterns = [
-            r'\b(this|that|the|current|same) course\b',
-            r'\bit\b',
-            r'\bthis one\b'
-        ]
-        
-        has_reference = any(re.search(pattern, query.lower()) for pattern in reference_patterns)
-        if has_reference and memory['mentioned_courses']:
+        has_reference = any(re.search(pattern, query.lower()) for pattern in REFERENCE_PATTERNS)
+        if has_reference and memory.last_course:
             # Add the most recently mentioned course
-            last_course = list(memory['mentioned_courses'])[-1]
-            course_numbers.add(last_course)
-            search_variations.extend([
-                f"Course Number: {last_course}",
-                f"Course: {last_course}",
-                last_course,
-                last_course[-4:]
-            ])
+            course_numbers = [memory.last_course]
+    
+    search_variations = []
+    for course_num in course_numbers:
+        search_variations.extend([
+            f"Course Number: {course_num}",
+            f"Course: {course_num}",
+            course_num,
+            base_number(course_num)[1]
+        ])
     
     results = []
     seen_courses = set()
     
-    # First priority: Exact metadata match
+    # First priority: Exact course number match from the in-memory index
     if course_numbers:
         for course_num in course_numbers:
-            # Try exact metadata match
-            exact_matches = full_collection.get(
-                where={"number": course_num}
-            )
-            if exact_matches['documents']:
-                for doc in exact_matches['documents']:
-                    if doc not in seen_courses:
-                        results.append(doc)
-                        seen_courses.add(doc)
-                continue
-            
-            # Try number_raw match if exact match fails
-            raw_num = course_num[-4:]
-            raw_matches = full_collection.get(
-                where={"number_raw": raw_num}
-            )
-            if raw_matches['documents']:
-                for doc in raw_matches['documents']:
-                    if doc not in seen_courses:
-                        results.append(doc)
-                        seen_courses.add(doc)
+            for doc in course_index.lookup(course_num, student_level):
+                if doc not in seen_courses:
+                    results.append(doc)
+                    seen_courses.add(doc)
     
-    # If we found exact matches, return immediately
+    # If we found exact matches, no semantic search is needed
     if results:
-        return {
-            'documents': [results[:n_results]],
-            'metadatas': [[]],
-            'distances': [[]],
-            'ids': [[]]
-        }
+        return shard, results, None
     
     # Second priority: Enhanced semantic search with course number emphasis
     if course_numbers:
@@ -209,105 +452,177 @@ def get_relevant_courses(query, session_id=None, n_results=3):
         weighted_query = " ".join(search_variations + [query] * 2)
     else:
         weighted_query = query
-    
-    # Try title collection first
-    title_results = title_collection.query(
-        query_texts=[weighted_query],
-        n_results=n_results
-    )
-    
-    for i, doc_id in enumerate(title_results['ids'][0]):
-        full_course = full_collection.get(
-            ids=[doc_id]
-        )
-        if full_course['documents'][0] not in seen_courses and len(results) < n_results:
-            results.append(full_course['documents'][0])
-            seen_courses.add(full_course['documents'][0])
-    
-    # If we still need more results, try full collection
-    if len(results) < n_results:
-        full_results = full_collection.query(
-            query_texts=[weighted_query],
-            n_results=n_results
-        )
-        
-        for doc in full_results['documents'][0]:
-            if doc not in seen_courses and len(results) < n_results:
-                results.append(doc)
-                seen_courses.add(doc)
-    
+    return shard, results, weighted_query
+
+def retrieval_result(documents, stats, query_embedding=None):
+    """Chroma-style query result; ``query_embedding`` is the vector semantic search used, if any"""
     return {
-        'documents': [results],
+        'documents': [documents],
         'metadatas': [[]],
         'distances': [[]],
-        'ids': [[]]
+        'ids': [[]],
+        'stats': stats,
+        'query_embedding': query_embedding
     }
 
+def retrieved_courses(relevant_courses):
+    """Course numbers of the retrieved documents (every document starts with its number)"""
+    return {match.group(1) for match in (re.match(r'Course Number: (\S+)', doc)
+                                         for doc in relevant_courses['documents'][0]) if match}
+
+@metrics.timed('retrieval')
+def get_relevant_courses(query, session_id=None, n_results=3):
+    """Retrieve relevant courses based on query and student level"""
+    shard, exact_matches, weighted_query = plan_retrieval(query, session_id)
+    if weighted_query is None:
+        return retrieval_result(exact_matches[:n_results], {'embedding_calls': 0, 'db_calls': 0})
+    
+    with metrics.stage('semantic_search'):
+        # Embedded here so the response cache can reuse the vector
+        query_embedding = retriever.get().embed(weighted_query)
+        results, stats = retriever.get().search(weighted_query, shard, n_results=n_results,
+                                                query_embedding=query_embedding)
+        stats['embedding_calls'] += 1
+    print(f"Semantic retrieval: {stats['embedding_calls']} embedding call(s), {stats['db_calls']} DB call(s)")
+    
+    return retrieval_result(results, stats, query_embedding)
+
+@metrics.timed('batch_retrieval')
+def get_relevant_courses_batch(queries, session_ids, n_results=3, embed_exact=None):
+    """get_relevant_courses for many queries at once, in query order.
+
+    Every text that needs embedding goes out in a single embeddings request:
+    the semantic queries, plus the text of each query answered from exact
+    matches whose ``embed_exact`` flag is set (for the response cache). Then
+    each shard gets one batched search with those vectors.
+    """
+    plans = [plan_retrieval(query, session_id) for query, session_id in zip(queries, session_ids)]
+    results = [None] * len(plans)
+    by_shard = {}
+    texts = {}  # query index -> text whose embedding it needs
+    for i, (shard, exact_matches, weighted_query) in enumerate(plans):
+        if weighted_query is None:
+            results[i] = retrieval_result(exact_matches[:n_results], {'embedding_calls': 0, 'db_calls': 0})
+            if embed_exact and embed_exact[i]:
+                texts[i] = queries[i].upper()
+        else:
+            by_shard.setdefault(shard, []).append(i)
+            texts[i] = weighted_query
+    
+    vectors = {}
+    if texts:
+        unique_texts = list(dict.fromkeys(texts.values()))
+        vectors = dict(zip(unique_texts, retriever.get().embedding_function(unique_texts)))
+    for i, result in enumerate(results):
+        if result is not None and i in texts:
+            result['query_embedding'] = vectors[texts[i]]
+    
+    with metrics.stage('semantic_search'):
+        for shard, indexes in by_shard.items():
+            shard_vectors = [vectors[texts[i]] for i in indexes]
+            documents, stats = retriever.get().search_many([texts[i] for i in indexes], shard, n_results,
+                                                           query_embeddings=shard_vectors)
+            print(f"Batch retrieval ({shard}): {len(indexes)} queries, {stats['db_calls']} DB call(s)")
+            for i, docs, vector in zip(indexes, documents, shard_vectors):
+                results[i] = retrieval_result(docs, stats, vector)
+    return results
+
+@metrics.timed('lookup_courses')
+def lookup_courses(course_numbers, student_level='undergraduate', n_results=1):
+    """Resolve many course numbers in one pass.
+
+    Exact matches come from the in-memory index; the rest are searched with
+    one batched query (one embeddings request) per shard they route to.
+    Bare numbers ('3901') are taken to be DEFAULT_DEPARTMENT courses.
+    Returns (list of {'course_number', 'documents'} in input order, stats).
+    """
+    course_index.reload_if_changed()
+    
+    documents = {}
+    unmatched = {}
+    for course_number in dict.fromkeys(course_numbers):
+        normalized = course_number.upper().replace(' ', '')
+        if normalized[:1].isdigit():
+            normalized = f"{DEFAULT_DEPARTMENT}{normalized}"
+        docs = course_index.lookup(normalized, student_level)
+        if docs:
+            documents[course_number] = docs[:n_results]
+        else:
+            shard = shard_router.route(normalized, student_level)
+            unmatched.setdefault(shard, []).append((course_number, normalized))
+    
+    stats = {'embedding_calls': 0, 'db_calls': 0}
+    for shard, shard_unmatched in unmatched.items():
+        # Same course-number emphasis get_relevant_courses uses for its semantic fallback
+        weighted_queries = [
+            " ".join([f"Course Number: {normalized}", f"Course: {normalized}", normalized,
+                      normalized.lstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZ'), course_number.upper(), course_number.upper()])
+            for course_number, normalized in shard_unmatched
+        ]
+        doc_lists, shard_stats = retriever.get().search_many(weighted_queries, shard, n_results)
+        for key in stats:
+            stats[key] += shard_stats[key]
+        for (course_number, _), docs in zip(shard_unmatched, doc_lists):
+            documents[course_number] = docs
+    
+    return [{'course_number': course_number, 'documents': documents[course_number]}
+            for course_number in course_numbers], stats
+
+@metrics.timed('create_prompt')
 def create_prompt(query, relevant_courses, session_id=None):
     """Create a prompt combining user query, course information, and conversation history"""
     memory = get_session_memory(session_id) if session_id else None
     
-    # Add transcript context if available
-    transcript_context = ""
-    if memory and memory['transcript_courses']:
-        transcript_context = "\nStudent's completed courses from transcript:\n"
-        transcript_context += ", ".join(sorted(memory['transcript_courses']))
-        transcript_context += "\n"
-    
-    context = transcript_context + "\nRelevant courses:\n"
-    
     # Extract course numbers and organize courses
-    course_numbers = re.findall(r'CSE\s*\d{4}', query.upper())
+    course_numbers = find_course_numbers(query, course_index.departments, DEFAULT_DEPARTMENT)
     exact_matches = []
     related_courses = []
-    mentioned_courses = set()
+    mentioned_courses = retrieved_courses(relevant_courses)
     
     for doc in relevant_courses['documents'][0]:
-        # Extract course number from document
-        course_match = re.search(r'CSE\d{4}', doc.split('\n')[0])
-        if course_match:
-            mentioned_courses.add(course_match.group())
-            
-        is_exact_match = any(course_num.replace(' ', '') in doc.split('\n')[0] 
+        is_exact_match = any(course_num in doc.split('\n')[0]
                            for course_num in course_numbers)
         if is_exact_match:
             exact_matches.append(doc)
         else:
             related_courses.append(doc)
     
-    # Add conversation history if available
-    conversation_context = ""
-    if memory and memory['messages']:
-        conversation_context = "\nRecent conversation history:\n"
-        for msg in memory['messages']:
-            conversation_context += f"User: {msg['user']}\n"
-            conversation_context += f"Assistant: {msg['assistant']}\n"
+    # Check prerequisites for the retrieved courses against the transcript
+    # here rather than leaving the LLM to work them out from raw text
+    eligibility = []
+    if memory and memory.completed_courses:
+        prereq_graph.reload_if_changed()
+        results = [prereq_graph.check(course, memory.completed_courses, memory.student_level)
+                   for course in sorted(mentioned_courses)]
+        eligibility = describe_eligibility(results)
     
-    # Combine all context
-    for doc in exact_matches:
-        context += f"\n[EXACT MATCH]\n{doc}\n"
-    for doc in related_courses:
-        context += f"\n[RELATED COURSE]\n{doc}\n"
+    # Planning questions get a computed plan to explain instead of freehand sequencing
+    plan = []
+    student_level = memory.student_level if memory else 'undergraduate'
+    if student_level == 'undergraduate' and PLAN_QUERY.search(query):
+        with metrics.stage('degree_plan'):
+            plan = describe_plan(degree_planner.plan(memory.completed_courses if memory else []))
     
-    prompt = f"""You are an AI academic advisor at Ohio State University's Computer Science department. 
-A student has asked: "{query}"
-
-{conversation_context}
-{context}
-
-Please provide a clear, concise response that, using the provided information, directly addresses only the student's query.
-If discussing prerequisites, check if the student has completed the required courses based on their transcript.
-If recommending courses, consider the courses they've already taken.
-If this is a follow-up question, maintain consistency with previous responses.
-
-Response:"""
+    # Fit everything into the token budget, most important context first
+    history, summary = prompt_history(memory)
+    prompt, tokens = prompt_builder.build(
+        query,
+        SYSTEM_MESSAGE,
+        exact_matches,
+        related_courses,
+        history,
+        sorted(memory.transcript_courses) if memory else [],
+        eligibility,
+        plan,
+        summary
+    )
+    print("Prompt tokens: " + ", ".join(f"{section}={n}" for section, n in tokens.items()) +
+          f" (budget {prompt_builder.budget})")
+    prompt_tokens.observe(tokens['total'])
     
     return prompt, mentioned_courses
 
-def query_openai(prompt):
-    """Query OpenAI with the constructed prompt"""
-    try:
-        system_message = """You are an AI academic advisor for Ohio State University's Computer Science and Engineering department. 
+SYSTEM_MESSAGE = """You are an AI academic advisor for Ohio State University's Computer Science and Engineering department. 
 You have expertise in the CSE curriculum and degree requirements for the BS CSE program.
 
 Key degree requirements (BS CSE, Individualized Specialization):
@@ -341,99 +656,510 @@ When advising students:
 5. Ensure recommendations align with degree requirements
 6. Help with course planning and scheduling decisions"""
 
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": system_message},
+BUSY_MESSAGE = "I'm answering a lot of questions right now. Please try again in a moment."
+OPENAI_ERROR_MESSAGE = "I apologize, but I'm having trouble generating a response right now. Please try again later."
+
+@metrics.timed('openai_completion')
+def query_openai(prompt):
+    """Query OpenAI with the constructed prompt"""
+    try:
+        response = llm_gateway.complete(
+            [
+                {"role": "system", "content": SYSTEM_MESSAGE},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
             max_tokens=500
         )
         return response.choices[0].message.content
+    except GatewayOverloaded as e:
+        print(f"Shed completion: {e}")
+        metrics.errors.inc(source='llm_overloaded')
+        return BUSY_MESSAGE
     except Exception as e:
         print(f"Error querying OpenAI: {e}")
-        return "I apologize, but I'm having trouble generating a response right now. Please try again later."
+        metrics.errors.inc(source='openai_completion')
+        return OPENAI_ERROR_MESSAGE
 
-@app.route('/chat', methods=['POST'])
-def chat():
-    user_input = request.json.get('message')
-    session_id = request.json.get('session_id')
+@metrics.timed('openai_stream')
+def stream_openai(prompt):
+    """Query OpenAI with streaming enabled, yielding response text as it arrives"""
+    stream = llm_gateway.stream(
+        [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.7,
+        max_tokens=500,
+        stream_options={"include_usage": True}  # the last chunk carries the token counts
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+def session_has_context(session_id):
+    """Whether answers for this session can depend on its history or transcript"""
+    memory = get_session_memory(session_id) if session_id else None
+    return bool(memory and (memory.messages or memory.transcript_courses or memory.completed_courses))
+
+def response_cache_key(query, session_id, mentioned_courses, query_embedding=None):
+    """(level, course ids, query embedding) if the answer can't depend on the session, else None.
+
+    ``query_embedding`` is the vector semantic search already computed. Only
+    queries answered from exact course-number matches need embedding here.
+    """
+    if not response_cache.max_size or session_has_context(session_id):
+        return None
+    memory = get_session_memory(session_id) if session_id else None
+    if query_embedding is None:
+        try:
+            query_embedding = retriever.get().embed(query.upper())
+        except Exception as e:
+            print(f"Could not embed query for the response cache: {e}")
+            return None
+    return memory.student_level if memory else 'undergraduate', mentioned_courses, query_embedding
+
+@metrics.timed('response_cache')
+def lookup_cached_response(query, session_id, relevant_courses):
+    """(cache key or None, cached answer or None) for a question, checked before any prompt is built"""
+    cache_key = response_cache_key(query, session_id, retrieved_courses(relevant_courses),
+                                   relevant_courses.get('query_embedding'))
+    return cache_key, response_cache.get(*cache_key) if cache_key else None
+
+def cacheable_response(response):
+    return response not in (BUSY_MESSAGE, OPENAI_ERROR_MESSAGE)
+
+def answer_with_llm(user_input, session_id, relevant_courses):
+    """Answer from the response cache or OpenAI and remember the exchange.
+
+    Returns (response, whether it came from the cache).
+    """
+    # Reuse the answer to a near-identical context-free question, else ask OpenAI
+    cache_key, response = lookup_cached_response(user_input, session_id, relevant_courses)
+    cached = response is not None
+    if cached:
+        mentioned_courses = retrieved_courses(relevant_courses)
+    else:
+        prompt, mentioned_courses = create_prompt(user_input, relevant_courses, session_id)
+        response = query_openai(prompt)
+        if cache_key and cacheable_response(response):
+            response_cache.put(*cache_key, response)
     
-    # Check if user is indicating their level
+    update_session_memory(session_id, user_input, response, mentioned_courses, summarize=not cached)
+    return response, cached
+
+def handle_level_change(session_id, user_input):
+    """Switch the session's student level if the message indicates one, returning the reply"""
     level_patterns = {
         'graduate': r'\b(grad|graduate|master|masters|phd|doctoral)\b',
         'undergraduate': r'\b(undergrad|undergraduate)\b'
     }
     
-    memory = get_session_memory(session_id)
-    
-    # Update student level if indicated in message
     for level, pattern in level_patterns.items():
         if re.search(pattern, user_input.lower()):
-            memory['student_level'] = level
+            if session_id:
+                with session_store.edit(session_id) as memory:
+                    memory.student_level = level
             response = f"I'll focus on {level} level courses for you. How can I help?"
-            update_session_memory(session_id, user_input, response, set())
-            return jsonify({"response": response})
+            update_session_memory(session_id, user_input, response, set(), summarize=False)
+            return response
+    return None
+
+@metrics.timed('intent_router')
+def route_factual_query(session_id, user_input):
+    """Answer a factual course question from the catalog, returning the reply or None"""
+    memory = get_session_memory(session_id) if session_id else None
+    routed = intent_router.route(user_input, memory)
+    if not routed:
+        return None
+    
+    response, mentioned_courses = routed
+    update_session_memory(session_id, user_input, response, mentioned_courses, summarize=False)
+    stats = intent_router.stats()
+    print(f"Answered without the LLM ({stats['fast_path']}/{stats['queries']} queries, "
+          f"hit rate {stats['hit_rate']:.0%})")
+    return response
+
+def sse_event(data):
+    """Format a payload as a server-sent event"""
+    return f"data: {json.dumps(data)}\n\n"
+
+@app.route('/router/stats', methods=['GET'])
+def router_stats():
+    """How many chat messages the intent router answered without the LLM"""
+    return jsonify(intent_router.stats())
+
+@app.route('/chat', methods=['POST'])
+def chat():
+    user_input = request.json.get('message')
+    session_id = request.json.get('session_id')
+    
+    # Update student level if indicated in message
+    response = handle_level_change(session_id, user_input)
+    if response:
+        return jsonify({"response": response})
+    
+    # Plain catalog lookups are answered without retrieval or the LLM
+    response = route_factual_query(session_id, user_input)
+    if response:
+        return jsonify({"response": response})
     
     # Get relevant courses
     relevant_courses = get_relevant_courses(user_input, session_id)
     
-    # Create prompt with context
-    prompt, mentioned_courses = create_prompt(user_input, relevant_courses, session_id)
-    
-    # Get response from OpenAI
-    response = query_openai(prompt)
+    # Build the prompt, answer it and update conversation memory
+    response, _ = answer_with_llm(user_input, session_id, relevant_courses)
     
     # Ensure newlines are preserved (not strictly necessary but good practice)
     response = response.replace('\n', '\n')
     
-    # Update conversation memory
-    update_session_memory(session_id, user_input, response, mentioned_courses)
-    
     return jsonify({"response": response})
 
-def extract_courses_from_pdf(file_path):
-   """Extract text from PDF and identify course information"""
-   try:
-       pdf_reader = PyPDF2.PdfReader(file_path)
-      
-       # Check if PDF is encrypted
-       if pdf_reader.is_encrypted:
-           print("Error: This PDF is encrypted. Please provide an unencrypted PDF file.")
-          
-       text = ""
-       for page in pdf_reader.pages:
-           text += page.extract_text()
-
-
-       # Check if text was extracted
-       if not text.strip():
-           print("Error: No text could be extracted from the PDF. Please ensure the PDF contains readable text.")
-      
-
-
-       # Create a prompt for OpenAI to extract course information
-       prompt = f"""Please analyze this transcript text and extract all CSE (Computer Science) courses.
-       Format the response as a list of course numbers only (e.g., CSE 1223, CSE 2221, etc.).
-       Transcript text: {text}"""
-
-
-       response = client.chat.completions.create(
-           model="gpt-4",
-           messages=[
-               {"role": "system", "content": "You are a transcript analysis assistant. Extract only CSE course numbers from the transcript."},
-               {"role": "user", "content": prompt}
-           ]
-       )
-      
-       return response.choices[0].message.content
-   except Exception as e:
-       print(f"Error processing PDF: {str(e)}")
-       if "PyCryptodome" in str(e):
-           return "Error: The PDF file appears to be encrypted. Please provide an unencrypted PDF file."
-       return f"Error processing PDF: {str(e)}"
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Same as /chat, but sends the response as server-sent events while it is generated"""
+    user_input = request.json.get('message')
+    session_id = request.json.get('session_id')
+    
+    level_response = handle_level_change(session_id, user_input)
+    if level_response:
+        def generate_level_response():
+            yield sse_event({"token": level_response})
+            yield sse_event({"done": True})
+        return Response(generate_level_response(), mimetype='text/event-stream')
+    
+    factual_response = route_factual_query(session_id, user_input)
+    if factual_response:
+        def generate_factual_response():
+            yield sse_event({"token": factual_response})
+            yield sse_event({"done": True})
+        return Response(generate_factual_response(), mimetype='text/event-stream')
+    
+    relevant_courses = get_relevant_courses(user_input, session_id)
+    
+    cache_key, cached_response = lookup_cached_response(user_input, session_id, relevant_courses)
+    if cached_response:
+        update_session_memory(session_id, user_input, cached_response, retrieved_courses(relevant_courses),
+                              summarize=False)
+        def generate_cached_response():
+            yield sse_event({"token": cached_response})
+            yield sse_event({"done": True})
+        return Response(generate_cached_response(), mimetype='text/event-stream')
+    
+    prompt, mentioned_courses = create_prompt(user_input, relevant_courses, session_id)
+    
+    def generate():
+        chunks = []
+        completed = False
+        try:
+            for token in stream_openai(prompt):
+                chunks.append(token)
+                yield sse_event({"token": token})
+            completed = True
+            yield sse_event({"done": True})
+        except GatewayOverloaded as e:
+            print(f"Shed streamed completion: {e}")
+            yield sse_event({"error": BUSY_MESSAGE})
+        except Exception as e:
+            print(f"Error streaming from OpenAI: {e}")
+            yield sse_event({"error": OPENAI_ERROR_MESSAGE})
+        finally:
+            # Also runs when the client disconnects mid-stream, so partial answers are remembered;
+            # a stream that failed before its first token leaves the session untouched
+            if not chunks:
+                return
+            response = "".join(chunks)
+            if not completed:
+                response += " [response interrupted]"
+            elif cache_key:
+                response_cache.put(*cache_key, response)
+            update_session_memory(session_id, user_input, response, mentioned_courses)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # keep reverse proxies from buffering the stream
+    })
+
+# Bulk advising: /chat/batch answers up to CHAT_BATCH_MAX_ITEMS messages per
+# request with at most CHAT_BATCH_CONCURRENCY completions in flight (the LLM
+# gateway's limits still apply on top)
+CHAT_BATCH_MAX_ITEMS = int(os.getenv('CHAT_BATCH_MAX_ITEMS', 200))
+CHAT_BATCH_CONCURRENCY = int(os.getenv('CHAT_BATCH_CONCURRENCY', 8))
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """Answer many (session_id, message) pairs in one request.
+    
+    Body: {"requests": [{"session_id": ..., "message": ...}, ...], "stream": false}.
+    Messages for the same session are handled one after another in input
+    order, each seeing the session as the previous one left it. The first
+    message of every session is handled up front: level changes and catalog
+    lookups are answered directly, and the rest are retrieved together (one
+    embeddings request, one search per shard). Answers are then generated
+    with bounded parallelism across sessions. Returns {"results": [...]} in
+    input order, or with "stream": true one NDJSON line per result as soon
+    as it is ready. Each result carries its "index".
+    """
+    items = request.json.get('requests')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "requests must be a non-empty list"}), 400
+    if len(items) > CHAT_BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {CHAT_BATCH_MAX_ITEMS} requests per batch"}), 400
+    for item in items:
+        if (not isinstance(item, dict) or not isinstance(item.get('message'), str) or not item['message'].strip()
+                or not isinstance(item.get('session_id'), (str, type(None)))):
+            return jsonify({"error": "Each request needs a message and an optional string session_id"}), 400
+    
+    messages = [item['message'] for item in items]
+    session_ids = [item.get('session_id') for item in items]
+    
+    def result(i, response, source):
+        return {"index": i, "session_id": session_ids[i], "response": response, "source": source}
+    
+    def answer_directly(i):
+        """The result for a level change or catalog lookup, else None"""
+        response = handle_level_change(session_ids[i], messages[i])
+        if response:
+            return result(i, response, 'level')
+        response = route_factual_query(session_ids[i], messages[i])
+        if response:
+            return result(i, response, 'catalog')
+        return None
+    
+    groups = {}
+    for i, session_id in enumerate(session_ids):
+        groups.setdefault(session_id or f"anonymous-{i}", []).append(i)
+    
+    # Only a session's first message can be handled before its earlier
+    # messages are answered, so only those are answered directly or batched here
+    answered = []
+    first_pending = []
+    for indexes in groups.values():
+        direct = answer_directly(indexes[0])
+        if direct:
+            answered.append(direct)
+        else:
+            first_pending.append(indexes[0])
+    
+    # Context-free questions answered from exact matches also need their text
+    # embedded for the response cache; do it in the same request
+    embed_exact = [bool(response_cache.max_size) and not session_has_context(session_ids[i]) for i in first_pending]
+    relevant = dict(zip(first_pending, get_relevant_courses_batch(
+        [messages[i] for i in first_pending], [session_ids[i] for i in first_pending], embed_exact=embed_exact
+    ))) if first_pending else {}
+    
+    remaining = [indexes if indexes[0] in relevant else indexes[1:] for indexes in groups.values()]
+    remaining = [indexes for indexes in remaining if indexes]
+    
+    def answer_group(indexes, emit):
+        for i in indexes:
+            try:
+                relevant_courses = relevant.get(i)
+                if relevant_courses is None:
+                    direct = answer_directly(i)
+                    if direct:
+                        emit(direct)
+                        continue
+                    relevant_courses = get_relevant_courses(messages[i], session_ids[i])
+                response, cached = answer_with_llm(messages[i], session_ids[i], relevant_courses)
+                emit(result(i, response, 'cache' if cached else 'llm'))
+            except Exception as e:
+                print(f"Error answering batch item {i}: {e}")
+                metrics.errors.inc(source='chat_batch')
+                emit(dict(result(i, None, 'error'), error=OPENAI_ERROR_MESSAGE))
+    
+    def generate_results():
+        yield from answered
+        if not remaining:
+            return
+        finished = queue.Queue()
+        executor = ThreadPoolExecutor(max_workers=min(CHAT_BATCH_CONCURRENCY, len(remaining)))
+        try:
+            for indexes in remaining:
+                executor.submit(answer_group, indexes, finished.put)
+            for _ in range(len(items) - len(answered)):
+                yield finished.get()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    if request.json.get('stream'):
+        return Response((json.dumps(r) + "\n" for r in generate_results()), mimetype='application/x-ndjson',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    
+    results = [None] * len(items)
+    for r in generate_results():
+        results[r['index']] = r
+    return jsonify({"results": results})
+
+@metrics.timed('transcript_llm')
+def extract_courses_with_llm(text):
+    """Ask GPT-4 for the CSE course numbers in raw transcript text"""
+    # Create a prompt for OpenAI to extract course information
+    prompt = f"""Please analyze this transcript text and extract all CSE (Computer Science) courses.
+    Format the response as a list of course numbers only (e.g., CSE 1223, CSE 2221, etc.).
+    Transcript text: {text}"""
+
+    response = llm_gateway.complete([
+        {"role": "system", "content": "You are a transcript analysis assistant. Extract only CSE course numbers from the transcript."},
+        {"role": "user", "content": prompt}
+    ])
+    return list(dict.fromkeys(
+        f"CSE {number}" for number in re.findall(r'CSE\s*(\d{4})', response.choices[0].message.content)
+    ))
+
+@metrics.timed('transcript_extraction')
+def extract_courses_from_pdf(pdf_bytes):
+    """Extract text from PDF and identify course information.
+
+    Repeated uploads of the same file are answered from transcript_cache.
+    Returns a dict with the parsed courses, or an error string starting with "Error".
+    """
+    key = transcript_cache.key(pdf_bytes)
+    transcript = transcript_cache.get(key)
+    if transcript is not None:
+        print(f"Transcript cache hit ({len(transcript['course_numbers'])} courses)")
+        return transcript
+    
+    transcript = parse_transcript_pdf(pdf_bytes)
+    if isinstance(transcript, dict):
+        transcript_cache.put(key, transcript)
+    return transcript
+
+def parse_transcript_pdf(pdf_bytes):
+    """Pages are parsed locally one at a time; GPT-4 is only asked when the
+    local parse confidence is below TRANSCRIPT_MIN_CONFIDENCE"""
+    try:
+        pages = pdf_pool.extract(pdf_bytes)
+    except PdfExtractionError as e:
+        print(f"PDF extraction failed: {str(e)}")
+        metrics.errors.inc(source='pdf_extraction')
+        return str(e)
+    
+    # Check if text was extracted
+    if not any(text.strip() for text in pages):
+        return "Error: No text could be extracted from the PDF. Please ensure the PDF contains readable text."
+    
+    parser = TranscriptParser()
+    for text in pages:
+        parser.feed_page(text)
+    
+    if parser.confidence >= TRANSCRIPT_MIN_CONFIDENCE:
+        return {
+            'source': 'local',
+            'courses': parser.courses,
+            'course_numbers': parser.course_numbers(),
+            'completed_courses': parser.completed_course_numbers()
+        }
+    
+    try:
+        print(f"Local transcript parse confidence {parser.confidence:.2f}, falling back to GPT-4")
+        course_numbers = extract_courses_with_llm("\n".join(pages))
+    except Exception as e:
+        print(f"Error extracting courses with GPT-4: {str(e)}")
+        return f"Error processing PDF: {str(e)}"
+    return {
+        'source': 'llm',
+        'courses': [{'number': number, 'term': None, 'grade': None, 'credits': None} for number in course_numbers],
+        'course_numbers': course_numbers,
+        'completed_courses': course_numbers
+    }
+
+
+# /courses/lookup resolves at most this many course numbers per request, which
+# also bounds the size of its embeddings requests
+COURSE_LOOKUP_MAX_ITEMS = int(os.getenv('COURSE_LOOKUP_MAX_ITEMS', 200))
+
+@app.route('/courses/lookup', methods=['POST'])
+def courses_lookup():
+    """Look up documents for a list of course numbers in a single request"""
+    course_numbers = request.json.get('course_numbers') or []
+    if not isinstance(course_numbers, list) or not all(isinstance(c, str) for c in course_numbers):
+        return jsonify({"error": "course_numbers must be a list of strings"}), 400
+    if len(course_numbers) > COURSE_LOOKUP_MAX_ITEMS:
+        return jsonify({"error": f"At most {COURSE_LOOKUP_MAX_ITEMS} course numbers per lookup"}), 400
+    
+    student_level = request.json.get('level')
+    session_id = request.json.get('session_id')
+    if student_level not in ('undergraduate', 'graduate'):
+        student_level = get_session_memory(session_id).student_level if session_id else 'undergraduate'
+    
+    try:
+        n_results = min(max(int(request.json.get('n_results', 1)), 1), 10)
+    except (TypeError, ValueError):
+        return jsonify({"error": "n_results must be a number"}), 400
+    results, stats = lookup_courses(course_numbers, student_level, n_results)
+    return jsonify({"results": results, "stats": stats})
+
+@app.route('/courses/eligibility', methods=['POST'])
+def courses_eligibility():
+    """Eligible, conditional and blocked courses for a session's (or the given) completed courses"""
+    session_id = request.json.get('session_id')
+    memory = get_session_memory(session_id) if session_id else None
+    
+    completed_courses = request.json.get('completed_courses')
+    if completed_courses is None:
+        completed_courses = sorted(memory.completed_courses) if memory else []
+    if not isinstance(completed_courses, list) or not all(isinstance(c, str) for c in completed_courses):
+        return jsonify({"error": "completed_courses must be a list of strings"}), 400
+    
+    courses = request.json.get('courses')
+    if courses is not None and (not isinstance(courses, list) or not all(isinstance(c, str) for c in courses)):
+        return jsonify({"error": "courses must be a list of strings"}), 400
+    
+    student_level = request.json.get('level')
+    if student_level not in ('undergraduate', 'graduate'):
+        student_level = memory.student_level if memory else 'undergraduate'
+    
+    prereq_graph.reload_if_changed()
+    results = prereq_graph.eligibility(completed_courses, student_level, courses)
+    return jsonify({"level": student_level, "completed_courses": completed_courses, **results})
 
+@app.route('/plan', methods=['POST'])
+def degree_plan():
+    """Semester-by-semester plan of the remaining BS CSE requirements.
+
+    Uses the session's completed courses unless completed_courses is given;
+    with narrate=true the plan is also explained by the LLM.
+    """
+    session_id = request.json.get('session_id')
+    memory = get_session_memory(session_id) if session_id else None
+    
+    completed_courses = request.json.get('completed_courses')
+    if completed_courses is None:
+        completed_courses = sorted(memory.completed_courses) if memory else []
+    if not isinstance(completed_courses, list) or not all(isinstance(c, str) for c in completed_courses):
+        return jsonify({"error": "completed_courses must be a list of strings"}), 400
+    
+    try:
+        max_credits = float(request.json.get('max_credits', 17))
+        max_terms = int(request.json.get('max_terms', 12))
+    except (TypeError, ValueError):
+        return jsonify({"error": "max_credits and max_terms must be numbers"}), 400
+    if max_credits < 4 or max_terms < 1:
+        return jsonify({"error": "max_credits must be at least 4 and max_terms at least 1"}), 400
+    
+    prereq_graph.reload_if_changed()
+    plan = degree_planner.plan(completed_courses, max_credits=max_credits, max_terms=min(max_terms, 20))
+    print(f"Planned {sum(len(t['courses']) for t in plan['terms'])} courses over "
+          f"{len(plan['terms'])} semesters in {plan['elapsed_ms']:.1f}ms")
+    
+    if request.json.get('narrate'):
+        history, summary = prompt_history(memory)
+        prompt, _ = prompt_builder.build(
+            "Explain my semester-by-semester degree plan.",
+            SYSTEM_MESSAGE, [], [],
+            history,
+            sorted(memory.transcript_courses) if memory else [],
+            plan=describe_plan(plan),
+            summary=summary
+        )
+        plan['narration'] = query_openai(prompt)
+    
+    return jsonify(plan)
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    return jsonify({"error": f"File is too large (limit is {MAX_UPLOAD_BYTES / (1024 * 1024):g} MB)"}), 413
 
 @app.route('/upload-transcript', methods=['POST'])
 def upload_transcript():
@@ -447,36 +1173,36 @@ def upload_transcript():
         return jsonify({"error": "No selected file"}), 400
     
     if file and allowed_file(file.filename):
-        file_path = None
         try:
-            filename = secure_filename(file.filename)
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)
+            # Read at most one byte past the cap so oversized files are rejected without buffering them
+            pdf_bytes = file.stream.read(MAX_UPLOAD_BYTES + 1)
+            if len(pdf_bytes) > MAX_UPLOAD_BYTES:
+                return jsonify({"error": f"File is too large (limit is {MAX_UPLOAD_BYTES / (1024 * 1024):g} MB)"}), 413
             
             # Extract courses from PDF
-            courses = extract_courses_from_pdf(file_path)
+            transcript = extract_courses_from_pdf(pdf_bytes)
             
             # Check if there was an error during extraction
-            if isinstance(courses, str) and courses.startswith("Error:"):  # Add type check
-                return jsonify({"error": courses}), 400
+            if isinstance(transcript, str):
+                return jsonify({"error": transcript}), 400
             
             # Get course information and update session memory
             course_info = []
-            course_numbers = re.findall(r'CSE\s+\d{4}', courses)
+            course_numbers = transcript['course_numbers']
             
             if not course_numbers:
                 return jsonify({"error": "No CSE courses found in the transcript"}), 400
             
             # Update session memory with transcript courses
             if session_id:
-                memory = get_session_memory(session_id)
-                memory['transcript_courses'].update(course_numbers)
-                memory['completed_courses'].update(course_numbers)
+                with session_store.edit(session_id) as memory:
+                    memory.transcript_courses.update(course_numbers)
+                    memory.completed_courses.update(transcript['completed_courses'])
             
-            for course_num in course_numbers:
-                relevant_courses = get_relevant_courses(course_num, n_results=1)
-                if relevant_courses['documents'][0]:
-                    course_info.append(relevant_courses['documents'][0][0])
+            lookups, _ = lookup_courses(course_numbers)
+            for lookup in lookups:
+                if lookup['documents']:
+                    course_info.append(lookup['documents'][0])
             
             response_text = f"""Based on your transcript, I can see you've taken the following courses:
 
@@ -491,7 +1217,8 @@ or recommendations for future courses based on your academic history?"""
                     session_id,
                     "Uploaded transcript",
                     response_text,
-                    set(course_numbers)
+                    set(course_numbers),
+                    summarize=False
                 )
             
             return jsonify({
@@ -502,15 +1229,71 @@ or recommendations for future courses based on your academic history?"""
         except Exception as e:
             error_msg = str(e)
             print(f"Error in upload_transcript: {error_msg}")
+            metrics.errors.inc(source='upload_transcript')
             return jsonify({"error": f"Error processing file: {error_msg}"}), 500
-        finally:
-            if file_path and os.path.exists(file_path):
-                os.remove(file_path)
     
     return jsonify({"error": "Invalid file type"}), 400
 
+@app.errorhandler(ResourceUnavailable)
+def resource_unavailable(e):
+    return jsonify({"error": str(e)}), 503
+
+LAZY_RESOURCES = [openai_client, openai_ef, chroma_collections, retriever]
+
+# WARMUP=background (the default) builds the lazy resources in a thread right
+# after import, so a worker can serve catalog lookups at once and /readyz turns
+# ready when semantic search is too. WARMUP=sync finishes warming up before
+# the import returns; WARMUP=off leaves everything to first use.
+WARMUP = os.getenv('WARMUP', 'background')
+warmup_state = {'status': 'off' if WARMUP == 'off' else 'pending', 'seconds': None, 'error': None}
+
+def warm_up():
+    """Open the collections, load the tokenizer and prime the embedding path"""
+    warmup_state['status'] = 'running'
+    start = time.perf_counter()
+    try:
+        token_counter.count("warm up")
+        # One embedding round trip opens the HTTP connection; after the first run it is a cache hit
+        retriever.get().embed("CSE COURSES")
+        openai_client.get()
+        warmup_state['status'] = 'done'
+    except Exception as e:
+        warmup_state.update(status='failed', error=str(e))
+    warmup_state['seconds'] = time.perf_counter() - start
+    print(f"Warm-up {warmup_state['status']} in {warmup_state['seconds']:.2f}s")
+
+# Spawned PDF worker processes re-import the main module; only the server process warms up
+if multiprocessing.parent_process() is None:
+    if WARMUP == 'sync':
+        warm_up()
+    elif WARMUP == 'background':
+        threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({"status": "ok"})
 
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: semantic search (collections, embedding function) is available.
 
+    With warm-up off or failed, the probe itself builds the missing resources.
+    """
+    status, error = "ready", None
+    if warmup_state['status'] in ('pending', 'running'):
+        status = "warming up"
+    else:
+        try:
+            retriever.get()
+        except ResourceUnavailable as e:
+            status, error = "unavailable", str(e)
+    
+    body = {"status": status, "warmup": warmup_state,
+            "resources": {resource.name: resource.status() for resource in LAZY_RESOURCES}}
+    if error:
+        body["error"] = error
+    return jsonify(body), 200 if status == "ready" else 503
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
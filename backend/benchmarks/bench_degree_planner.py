@@ -0,0 +1,85 @@
+"""Benchmark the degree planner over randomized transcripts.
+
+Each transcript is a random but prerequisite-respecting history: a few
+semesters of courses drawn from whatever the student was eligible for at the
+time. Reports planning latency and checks every plan for prerequisite order,
+concurrent requirements and the per-term credit cap.
+
+    python benchmarks/bench_degree_planner.py --count 500
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from course_docs import COURSES_PATH, load_courses
+from degree_planner import DegreePlanner, EXTERNAL_COURSES
+from prereq_graph import PrereqGraph, normalize_course_id
+from process_prereqs import PREREQ_GRAPH_PATH
+from synthetic_transcripts import BACKEND_DIR
+
+def random_transcript(rng, graph, planner, max_terms=6, courses_per_term=(2, 5)):
+    """Completed courses after 0..max_terms random semesters"""
+    candidates = graph.course_ids('undergraduate') + list(EXTERNAL_COURSES)
+    completed = set()
+    for _ in range(rng.randint(0, max_terms)):
+        eligible = [c for c in candidates if c not in completed and planner.prerequisites_met(c, completed, 'undergraduate')]
+        completed.update(rng.sample(eligible, min(len(eligible), rng.randint(*courses_per_term))))
+    return sorted(completed)
+
+def validate(plan, completed, graph, planner):
+    """Problems with a plan: courses scheduled before their prerequisites or over the cap"""
+    problems = []
+    done = set(completed)
+    for term in plan['terms']:
+        taking = {normalize_course_id(c['course']) for c in term['courses']}
+        if term['credits'] > plan['max_credits']:
+            problems.append(f"term {term['term']} has {term['credits']} credits")
+        for course_id in taking:
+            if not planner.prerequisites_met(course_id, done, 'undergraduate'):
+                problems.append(f"{course_id} in term {term['term']} before its prerequisites")
+            if not planner.concurrent_met(course_id, done | taking, 'undergraduate'):
+                problems.append(f"{course_id} in term {term['term']} without its concurrent courses")
+        done |= taking
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-credits', type=int, default=17)
+    args = parser.parse_args()
+
+    graph = PrereqGraph(os.path.join(BACKEND_DIR, PREREQ_GRAPH_PATH))
+    graph.load()
+    planner = DegreePlanner(graph, load_courses(os.path.join(BACKEND_DIR, COURSES_PATH)))
+    rng = random.Random(args.seed)
+    transcripts = [random_transcript(rng, graph, planner) for _ in range(args.count)]
+    print(f"{len(transcripts)} random transcripts, "
+          f"{statistics.mean(len(t) for t in transcripts):.1f} completed courses on average")
+
+    latencies, terms, unscheduled, invalid = [], [], 0, 0
+    for completed in transcripts:
+        start = time.perf_counter()
+        plan = planner.plan(completed, max_credits=args.max_credits)
+        latencies.append(time.perf_counter() - start)
+        terms.append(len(plan['terms']))
+        unscheduled += bool(plan['unscheduled'])
+        problems = validate(plan, completed, graph, planner)
+        if problems:
+            invalid += 1
+            print(f"invalid plan for {completed}: {problems[:3]}")
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"plan median={statistics.median(latencies) * 1000:.2f}ms p95={p95 * 1000:.2f}ms "
+          f"max={latencies[-1] * 1000:.2f}ms")
+    print(f"semesters mean={statistics.mean(terms):.1f} max={max(terms)}; "
+          f"{unscheduled} plans with unscheduled courses, {invalid} invalid plans")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Compare retrieval backends on a labeled query set: relevance and latency.
+
+Backends:
+  chroma         Chroma with OpenAI embeddings (RETRIEVAL_BACKEND=chroma)
+  lexical        the in-process BM25 index alone
+  hybrid         BM25 fused with the Chroma results (RETRIEVAL_BACKEND=hybrid)
+  local-vectors  local CPU embeddings alone
+  local          BM25 fused with local embeddings (RETRIEVAL_BACKEND=local)
+
+Reports hit@1, recall@3 (the app retrieves three courses), MRR@10, per-query
+latency and embedding requests per query. Query embeddings are not cached, so
+every remote search pays the embeddings round trip. By default the database
+is built and queried against the local OpenAI stand-in, whose hashed
+bag-of-words embeddings only approximate text-embedding-ada-002; pass
+--openai to use the real API (needs OPENAI_API_KEY), e.g.
+
+    python benchmarks/bench_retrieval.py --embedding-latency 0.1 --misses
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from e2e_benchmark import prepare_workdir
+from load_test import percentile
+from shards import shard_key
+from stub_openai import StubOpenAI
+from synthetic_transcripts import BACKEND_DIR
+
+QUERIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'retrieval_queries.json')
+
+BACKENDS = ['chroma', 'lexical', 'hybrid', 'local-vectors', 'local']
+
+class CountingEmbeddingFunction:
+    """Counts embedding requests made through it"""
+
+    def __init__(self, embedding_function):
+        self.embedding_function = embedding_function
+        self.calls = 0
+
+    def __call__(self, input):
+        self.calls += 1
+        return self.embedding_function(input)
+
+def course_ids(documents):
+    return [re.match(r'Course Number: (\S+)', doc).group(1) for doc in documents]
+
+def build_backends(names, local_embedding):
+    """name -> (search(query, shard, k) -> documents, embedding counter or None)"""
+    import chromadb
+    from chromadb.utils import embedding_functions
+    from hybrid_retrieval import HybridRetriever
+    from local_embeddings import LocalVectorIndex, create_local_embedding_function
+    from retrieval import SemanticRetriever
+    from shards import ShardCollections, ShardRouter
+
+    backends = {}
+    if {'chroma', 'hybrid'} & set(names):
+        openai_ef = embedding_functions.OpenAIEmbeddingFunction(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            model_name="text-embedding-ada-002"
+        )
+        chroma_client = chromadb.PersistentClient(path="./chroma_db")
+        collections = ShardCollections(
+            ShardRouter(),
+            lambda name: chroma_client.get_collection(name=name, embedding_function=openai_ef)
+        )
+        remote_ef = CountingEmbeddingFunction(openai_ef)
+        chroma = SemanticRetriever(remote_ef, collections.get)
+        backends['chroma'] = (lambda q, shard, k: chroma.search(q, shard, k)[0], remote_ef)
+        hybrid = HybridRetriever(chroma)
+        backends['hybrid'] = (lambda q, shard, k: hybrid.search(q, shard, k)[0], remote_ef)
+
+    local_ef = CountingEmbeddingFunction(create_local_embedding_function(local_embedding))
+    local = HybridRetriever(LocalVectorIndex(local_ef))
+
+    def lexical_search(q, shard, k):
+        local.index_shard(shard)
+        return local.lexical.search_many([q], shard, k)[0]
+
+    def local_vector_search(q, shard, k):
+        local.index_shard(shard)
+        return local.vectors.search(q, shard, k)[0]
+
+    backends['lexical'] = (lexical_search, None)
+    backends['local-vectors'] = (local_vector_search, local_ef)
+    backends['local'] = (lambda q, shard, k: local.search(q, shard, k)[0], local_ef)
+    return {name: backends[name] for name in names}
+
+def evaluate(search, counter, queries):
+    """Relevance metrics, latencies and the queries with nothing relevant in the top 3"""
+    hits, recalls, reciprocal_ranks, latencies, misses = [], [], [], [], []
+    search(queries[0]['query'], shard_key(queries[0].get('department', 'CSE'), queries[0]['level']), 10)  # warm up connections and caches
+    calls_before = counter.calls if counter else 0
+    for item in queries:
+        start = time.perf_counter()
+        found = course_ids(search(item['query'], shard_key(item.get('department', 'CSE'), item['level']), 10))
+        latencies.append(time.perf_counter() - start)
+
+        relevant = set(item['relevant'])
+        ranks = [rank for rank, course in enumerate(found, start=1) if course in relevant]
+        hits.append(1.0 if ranks and ranks[0] == 1 else 0.0)
+        recalls.append(len(relevant & set(found[:3])) / min(len(relevant), 3))
+        reciprocal_ranks.append(1.0 / ranks[0] if ranks else 0.0)
+        if not relevant & set(found[:3]):
+            misses.append((item['query'], found[:3]))
+    n = len(queries)
+    return {
+        'hit@1': sum(hits) / n,
+        'recall@3': sum(recalls) / n,
+        'mrr@10': sum(reciprocal_ranks) / n,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'embedding_calls_per_query': ((counter.calls - calls_before) / n) if counter else 0.0,
+        'misses': misses,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=BACKENDS)
+    parser.add_argument('--queries', default=QUERIES_PATH, help='labeled queries (JSON list of query/level/relevant)')
+    parser.add_argument('--local-embedding', default='hashing', help='LOCAL_EMBEDDING spec for the local backends')
+    parser.add_argument('--embedding-latency', type=float, default=0.05, help='seconds per stub embeddings call')
+    parser.add_argument('--openai', action='store_true', help='use the real OpenAI API instead of the stub')
+    parser.add_argument('--misses', action='store_true', help='list queries with nothing relevant in the top 3')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    with open(args.queries) as f:
+        queries = json.load(f)
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    stub = None if args.openai else StubOpenAI(embedding_latency=args.embedding_latency).start()
+    workdir = prepare_workdir(stub, prefix='retrieval-bench-')
+    try:
+        backends = build_backends(args.backends, args.local_embedding)
+        results = {name: evaluate(search, counter, queries) for name, (search, counter) in backends.items()}
+    finally:
+        if stub:
+            stub.stop()
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{len(queries)} labeled queries, {'OpenAI' if args.openai else 'stub'} embeddings for the remote backends")
+    print(f"{'backend':14} {'hit@1':>7} {'recall@3':>9} {'MRR@10':>7} {'p50 ms':>8} {'p95 ms':>8} {'embeds/q':>9}")
+    for name, r in results.items():
+        print(f"{name:14} {r['hit@1']:>7.2f} {r['recall@3']:>9.2f} {r['mrr@10']:>7.2f} "
+              f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['embedding_calls_per_query']:>9.1f}")
+
+    if args.misses:
+        for name, r in results.items():
+            print(f"\n{name}: {len(r['misses'])} queries with nothing relevant in the top 3")
+            for query, found in r['misses']:
+                print(f"  {query!r} -> {', '.join(found) or '(nothing)'}")
+
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark worker cold start: import time, readiness and first-request latency.
+
+Builds a database against the local OpenAI stand-in, then starts fresh
+Python processes that import app.py under each WARMUP mode and measure
+  - how long `import app` takes,
+  - the first catalog lookup (answered without Chroma or the LLM),
+  - the first semantic question (needs the collections and embeddings),
+  - how long until /readyz returns 200.
+Each mode is run several times and the median is reported, e.g.
+
+    python benchmarks/bench_startup.py --runs 5 --importtime
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from e2e_benchmark import prepare_workdir
+from stub_openai import StubOpenAI
+from synthetic_transcripts import BACKEND_DIR
+
+# Runs in the child process; prints one JSON line of timings in seconds
+CHILD_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import app
+timings = {'import': time.perf_counter() - start}
+client = app.app.test_client()
+
+t = time.perf_counter()
+client.post('/chat', json={'message': 'What is the title of CSE 2221?', 'session_id': 'lookup'}).get_data()
+timings['first_lookup'] = time.perf_counter() - t
+
+t = time.perf_counter()
+client.post('/chat', json={'message': 'Which courses cover machine learning?', 'session_id': 'semantic'}).get_data()
+timings['first_semantic'] = time.perf_counter() - t
+
+while client.get('/readyz').status_code != 200:
+    time.sleep(0.01)
+timings['ready'] = time.perf_counter() - start
+print('TIMINGS ' + json.dumps(timings))
+"""
+
+MODES = ['off', 'background', 'sync']
+
+def run_child(mode, workdir):
+    env = dict(os.environ, WARMUP=mode, PYTHONPATH=BACKEND_DIR)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', CHILD_SCRIPT], cwd=workdir, env=env,
+                            capture_output=True, text=True, timeout=300)
+    elapsed = time.perf_counter() - start
+    for line in result.stdout.splitlines():
+        if line.startswith('TIMINGS '):
+            timings = json.loads(line[len('TIMINGS '):])
+            timings['process'] = elapsed
+            return timings
+    raise RuntimeError(f"Child process failed:\n{result.stdout[-2000:]}\n{result.stderr[-2000:]}")
+
+def slowest_imports(workdir, count):
+    """Top cumulative import times for `import app`, from python -X importtime"""
+    env = dict(os.environ, WARMUP='off', PYTHONPATH=BACKEND_DIR)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=workdir, env=env,
+                            capture_output=True, text=True, timeout=300)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Each nesting level adds two spaces; keep the modules app.py imports directly
+        if name.startswith('   ') and not name.startswith('     '):
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3, help='processes started per warm-up mode')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='seconds per stub completion')
+    parser.add_argument('--embedding-latency', type=float, default=0.05, help='seconds per stub embeddings call')
+    parser.add_argument('--importtime', action='store_true', help='also list the slowest imports of app.py')
+    args = parser.parse_args()
+
+    stub = StubOpenAI(latency=args.llm_latency, jitter=0, embedding_latency=args.embedding_latency).start()
+    workdir = prepare_workdir(stub, prefix='startup-bench-')
+    try:
+        print(f"\n{'WARMUP':12} {'import':>9} {'lookup':>9} {'semantic':>9} {'ready':>9} {'process':>9}   (median ms)")
+        for mode in args.modes:
+            runs = [run_child(mode, workdir) for _ in range(args.runs)]
+            medians = {key: statistics.median(run[key] for run in runs) * 1000 for key in runs[0]}
+            print(f"{mode:12} {medians['import']:>9.0f} {medians['first_lookup']:>9.1f} "
+                  f"{medians['first_semantic']:>9.0f} {medians['ready']:>9.0f} {medians['process']:>9.0f}")
+
+        if args.importtime:
+            print("\nSlowest direct imports of app.py (WARMUP=off):")
+            for microseconds, name in slowest_imports(workdir, 10):
+                print(f"  {microseconds / 1000:8.1f} ms  {name}")
+    finally:
+        stub.stop()
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
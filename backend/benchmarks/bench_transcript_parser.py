@@ -0,0 +1,84 @@
+"""Compare the local transcript parser against GPT-4 extraction.
+
+Generates synthetic transcript PDFs and reports per-upload latency and
+course-level precision/recall for the local parser. With --llm (needs
+OPENAI_API_KEY and an initialized DB) the GPT-4 path is measured as well.
+
+    python benchmarks/bench_transcript_parser.py --count 50
+    python benchmarks/bench_transcript_parser.py --count 5 --llm
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import PyPDF2
+
+from pdf_extraction import extract_page_texts
+from synthetic_transcripts import synthetic_transcripts
+from transcript_parser import TranscriptParser
+
+def score(found, expected):
+    found, expected = set(found), set(expected)
+    hits = len(found & expected)
+    precision = hits / len(found) if found else 0.0
+    recall = hits / len(expected) if expected else 1.0
+    return precision, recall
+
+def run_local(pdf_bytes):
+    parser = TranscriptParser()
+    for text in extract_page_texts(pdf_bytes, max_pages=100):
+        parser.feed_page(text)
+    return parser.course_numbers(), parser.confidence
+
+def run_llm(pdf_bytes):
+    from app import extract_courses_with_llm
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    text = ""
+    for page in reader.pages:
+        text += page.extract_text()
+    return extract_courses_with_llm(text)
+
+def report(name, latencies, scores):
+    precisions = [p for p, _ in scores]
+    recalls = [r for _, r in scores]
+    print(f"{name:6s} median={statistics.median(latencies) * 1000:9.2f}ms "
+          f"max={max(latencies) * 1000:9.2f}ms "
+          f"precision={statistics.mean(precisions):.3f} recall={statistics.mean(recalls):.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--llm', action='store_true', help='also measure the GPT-4 extraction path')
+    args = parser.parse_args()
+
+    transcripts = list(synthetic_transcripts(args.count, seed=args.seed))
+    print(f"{len(transcripts)} synthetic transcripts, "
+          f"{sum(len(expected) for _, expected in transcripts)} CSE course rows")
+
+    latencies, scores, confidences = [], [], []
+    for pdf_bytes, expected in transcripts:
+        start = time.perf_counter()
+        found, confidence = run_local(pdf_bytes)
+        latencies.append(time.perf_counter() - start)
+        scores.append(score(found, [c['number'] for c in expected]))
+        confidences.append(confidence)
+    report('local', latencies, scores)
+    print(f"local confidence min={min(confidences):.2f} mean={statistics.mean(confidences):.2f}")
+
+    if args.llm:
+        latencies, scores = [], []
+        for pdf_bytes, expected in transcripts:
+            start = time.perf_counter()
+            found = run_llm(pdf_bytes)
+            latencies.append(time.perf_counter() - start)
+            scores.append(score(found, [c['number'] for c in expected]))
+        report('gpt-4', latencies, scores)
+
+if __name__ == '__main__':
+    main()
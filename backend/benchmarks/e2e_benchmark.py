@@ -0,0 +1,323 @@
+"""Offline end-to-end benchmark of the whole backend.
+
+Starts a local OpenAI stand-in (benchmarks/stub_openai.py), builds a fresh
+Chroma database with init_db.py in a temporary directory, then serves app.py
+in-process and replays scripted multi-turn advising sessions and transcript
+uploads against it at the given concurrency. No network access or API key is
+needed, and the LLM latency is a parameter, so runs are repeatable and the
+cost of our own code can be separated from the cost of waiting for OpenAI.
+
+Reports p50/p95/p99 latency per endpoint and per pipeline stage, throughput,
+error counts, stub API calls and process memory, e.g.
+
+    python benchmarks/e2e_benchmark.py --sessions 100 --concurrency 16 --llm-latency 0.8
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_test import percentile
+from stub_openai import StubOpenAI
+from synthetic_transcripts import BACKEND_DIR, synthetic_transcripts
+
+# Files init_db.py and app.py read from their working directory
+DATA_FILES = ['cse_courses_processed.json', 'cse_prereq_graph.json']
+
+# Multi-turn conversations; each virtual user replays one of them
+SESSION_SCRIPTS = [
+    [
+        "I'm an undergrad in computer science",
+        "What is CSE 2221 about?",
+        "What are the prerequisites for CSE 2231?",
+        "Should I take it next semester?",
+        "What electives would you recommend after that?",
+    ],
+    [
+        "Which courses cover machine learning?",
+        "How hard is CSE 5523 compared to CSE 3521?",
+        "How many units is CSE 5523?",
+        "Can you plan my remaining semesters?",
+    ],
+    [
+        "I want to learn about operating systems and networking",
+        "What is the title of CSE 2431?",
+        "Tell me about this course",
+        "What should I take after CSE 2431?",
+    ],
+    [
+        "What courses should I take to get into security?",
+        "Describe CSE 4471",
+        "Is CSE 5473 a good follow up?",
+    ],
+]
+
+# Pipeline functions in app.py that are timed as stages
+STAGES = [
+    'handle_level_change', 'route_factual_query', 'get_session_memory', 'get_relevant_courses',
+    'lookup_courses', 'create_prompt', 'query_openai', 'stream_openai', 'extract_courses_from_pdf',
+]
+
+class StageTimer:
+    """Wraps module-level functions so every call records its duration"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def record(self, name, elapsed):
+        with self._lock:
+            self.samples.setdefault(name, []).append(elapsed)
+
+    def wrap(self, module, name):
+        func = getattr(module, name)
+        timer = self
+
+        if name == 'stream_openai':
+            # A generator: time from the call until the last token is consumed
+            def timed_stream(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    yield from func(*args, **kwargs)
+                finally:
+                    timer.record(name, time.perf_counter() - start)
+            setattr(module, name, timed_stream)
+            return
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timer.record(name, time.perf_counter() - start)
+        setattr(module, name, timed)
+
+def prepare_workdir(stub, prefix='e2e-bench-'):
+    """Build a fresh database against the stub in a temporary directory and chdir into it.
+
+    Also points OPENAI_BASE_URL at the stub, so app.py imported (or started)
+    afterwards in this environment talks to it too. With ``stub=None`` the
+    database is built with the real OpenAI API and OPENAI_API_KEY.
+    """
+    workdir = tempfile.mkdtemp(prefix=prefix)
+    for name in DATA_FILES:
+        shutil.copy(os.path.join(BACKEND_DIR, name), workdir)
+    os.environ['SESSION_STORE'] = 'memory'
+    if stub is not None:
+        os.environ.update({'OPENAI_API_KEY': 'sk-offline-benchmark', 'OPENAI_BASE_URL': stub.base_url})
+    os.chdir(workdir)
+    print(f"{f'Stub OpenAI at {stub.base_url}' if stub else 'Real OpenAI API'}, working directory {workdir}")
+
+    import init_db
+    init_db.init_database()
+    return workdir
+
+def memory_mb():
+    """(current RSS, peak RSS) of this process in MB"""
+    current = None
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    current = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    return current, peak
+
+def post_json(url, payload, stream=False):
+    """POST a JSON body; returns (ok, time to first byte, total time)"""
+    req = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'),
+                                 headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=300) as res:
+        if stream:
+            first = res.readline()
+            first_byte = time.perf_counter() - start
+            body = first + res.read()
+            ok = res.status == 200 and b'"error"' not in body
+        else:
+            res.read()
+            first_byte = time.perf_counter() - start
+            ok = res.status == 200
+    return ok, first_byte, time.perf_counter() - start
+
+def post_pdf(url, pdf_bytes, session_id):
+    """Upload a transcript as multipart/form-data; returns (ok, total time)"""
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"session_id\"\r\n\r\n{session_id}\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"transcript.pdf\"\r\n"
+        f"Content-Type: application/pdf\r\n\r\n"
+    ).encode('utf-8') + pdf_bytes + f"\r\n--{boundary}--\r\n".encode('utf-8')
+    req = urllib.request.Request(url, data=body,
+                                 headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    start = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=300) as res:
+        res.read()
+        ok = res.status == 200
+    return ok, time.perf_counter() - start
+
+class Results:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, endpoint, elapsed, ok=True):
+        with self._lock:
+            if ok:
+                self.latencies.setdefault(endpoint, []).append(elapsed)
+            else:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+def run_session(base_url, index, args, transcripts, results):
+    """One virtual user: maybe upload a transcript, then play a conversation"""
+    rng = random.Random(args.seed * 100003 + index)
+    session_id = f"bench-{index}"
+
+    if transcripts and rng.random() < args.upload_ratio:
+        try:
+            ok, elapsed = post_pdf(f"{base_url}/upload-transcript", transcripts[index % len(transcripts)], session_id)
+            results.add('/upload-transcript', elapsed, ok)
+        except Exception as e:
+            print(f"Upload failed: {e}")
+            results.add('/upload-transcript', 0, False)
+
+    for message in SESSION_SCRIPTS[index % len(SESSION_SCRIPTS)]:
+        stream = rng.random() < args.stream_ratio
+        endpoint = '/chat/stream' if stream else '/chat'
+        try:
+            ok, first_byte, elapsed = post_json(f"{base_url}{endpoint}",
+                                                {'message': message, 'session_id': session_id}, stream=stream)
+            results.add(endpoint, elapsed, ok)
+            if stream:
+                results.add('/chat/stream (first event)', first_byte, ok)
+        except Exception as e:
+            print(f"Request to {endpoint} failed: {e}")
+            results.add(endpoint, 0, False)
+
+def summarize(samples):
+    return {
+        'count': len(samples),
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+    }
+
+def print_table(title, rows):
+    print(f"\n{title}")
+    print(f"  {'':34} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in rows.items():
+        print(f"  {name:34} {stats['count']:>6} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=40, help='virtual users, each plays one conversation')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='seconds per completion')
+    parser.add_argument('--llm-jitter', type=float, default=0.2, help='+/- share of the latency')
+    parser.add_argument('--embedding-latency', type=float, default=0.05, help='seconds per embeddings call')
+    parser.add_argument('--stream-ratio', type=float, default=0.5, help='share of messages sent to /chat/stream')
+    parser.add_argument('--upload-ratio', type=float, default=0.3, help='share of sessions that upload a transcript')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--retrieval-backend', choices=['chroma', 'snapshot', 'hybrid', 'local'], default='chroma')
+    parser.add_argument('--json', help='also write the report to this file')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary working directory')
+    args = parser.parse_args()
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    stub = StubOpenAI(latency=args.llm_latency, jitter=args.llm_jitter,
+                      embedding_latency=args.embedding_latency, seed=args.seed).start()
+    os.environ.update({
+        'RETRIEVAL_BACKEND': args.retrieval_backend,
+        'WARMUP': 'sync',  # measure steady state, not lazy initialization
+    })
+    report = {'config': vars(args)}
+    start = time.perf_counter()
+    workdir = prepare_workdir(stub)
+    report['init_db_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    import app as backend
+    report['app_import_s'] = time.perf_counter() - start
+    report['memory_after_startup_mb'] = memory_mb()[0]
+    print(f"init_db {report['init_db_s']:.1f}s, app import {report['app_import_s']:.1f}s")
+
+    timer = StageTimer()
+    for name in STAGES:
+        timer.wrap(backend, name)
+
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # no per-request access log
+    server = make_server('127.0.0.1', 0, backend.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    n_uploads = int(round(args.sessions * args.upload_ratio))
+    transcripts = [pdf for pdf, _ in synthetic_transcripts(min(n_uploads, 20), seed=args.seed)] if n_uploads else []
+    setup_calls = dict(stub.counts)
+
+    results = Results()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(lambda i: run_session(base_url, i, args, transcripts, results), range(args.sessions)))
+    elapsed = time.perf_counter() - start
+
+    server.shutdown()
+    backend.pdf_pool.shutdown()
+
+    n_requests = sum(len(v) for k, v in results.latencies.items() if 'first event' not in k)
+    current, peak = memory_mb()
+    report.update({
+        'elapsed_s': elapsed,
+        'requests': n_requests,
+        'errors': results.errors,
+        'throughput_rps': n_requests / elapsed if elapsed else 0.0,
+        'endpoints': {name: summarize(v) for name, v in sorted(results.latencies.items())},
+        'stages': {name: summarize(timer.samples[name]) for name in STAGES if name in timer.samples},
+        'stub_calls': {k: stub.counts[k] - setup_calls[k] for k in stub.counts},
+        'memory_end_mb': current,
+        'memory_peak_mb': peak,
+        'router': backend.intent_router.stats(),
+        'llm_gateway': backend.llm_gateway.stats(),
+    })
+    stub.stop()
+
+    print(f"\nsessions={args.sessions} concurrency={args.concurrency} llm_latency={args.llm_latency}s "
+          f"requests={n_requests} errors={sum(results.errors.values())}")
+    print(f"throughput={report['throughput_rps']:.2f} req/s over {elapsed:.2f}s")
+    print_table("Per endpoint", report['endpoints'])
+    print_table("Per stage", report['stages'])
+    print(f"\nstub API calls during the run: {report['stub_calls']}")
+    print(f"intent router fast path: {report['router']['fast_path']}/{report['router']['queries']}")
+    gateway = report['llm_gateway']
+    print(f"llm gateway: {gateway['upstream']} upstream calls for {gateway['calls']} completions, "
+          f"{gateway['coalesced']} merged, {gateway['shed']} shed, {gateway['fallbacks']} fallbacks")
+    print(f"memory: {report['memory_after_startup_mb']:.0f} MB after startup, "
+          f"{current:.0f} MB at end, {peak:.0f} MB peak")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.keep:
+        print(f"Kept {workdir}")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Concurrent load test for a running backend.
+
+Fires POST /chat requests at the given concurrency and reports throughput and
+latency percentiles, e.g.
+
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --concurrency 32 --requests 200
+"""
+import argparse
+import json
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+def send_chat(url, message, session_id):
+    body = json.dumps({'message': message, 'session_id': session_id}).encode('utf-8')
+    req = urllib.request.Request(f"{url}/chat", data=body, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=300) as res:
+            res.read()
+            ok = res.status == 200
+    except Exception as e:
+        print(f"Request failed: {e}")
+        ok = False
+    return time.perf_counter() - start, ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--message', default='What is CSE 2231 about?')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(
+            lambda i: send_chat(args.url, args.message, f"load-{i % args.concurrency}"),
+            range(args.requests)
+        ))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, ok in results if ok]
+    errors = sum(1 for _, ok in results if not ok)
+    print(f"requests={args.requests} concurrency={args.concurrency} errors={errors}")
+    print(f"throughput={len(latencies) / elapsed:.2f} req/s over {elapsed:.2f}s")
+    print(f"p50={percentile(latencies, 50) * 1000:.0f}ms "
+          f"p95={percentile(latencies, 95) * 1000:.0f}ms "
+          f"p99={percentile(latencies, 99) * 1000:.0f}ms")
+
+if __name__ == '__main__':
+    main()
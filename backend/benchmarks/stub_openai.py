@@ -0,0 +1,185 @@
+"""Local stand-in for the OpenAI API, for offline benchmarks.
+
+Serves /v1/embeddings and /v1/chat/completions (plain and streamed) on a
+local port. Embeddings are deterministic hashed bag-of-words vectors, so
+semantic search still finds the course a query names. Completions wait a
+configurable latency and return canned text; a transcript-analysis prompt
+gets back the CSE course numbers it contains, like GPT-4 would, and a
+conversation-summary prompt gets back JSON goals and decisions. Point the
+app at it with OPENAI_BASE_URL=<server.base_url>.
+"""
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+class StubOpenAI:
+    def __init__(self, latency=0.5, jitter=0.1, embedding_latency=0.05, dims=1536, response_words=120, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.embedding_latency = embedding_latency
+        self.dims = dims
+        self.response_words = response_words
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {'embedding_requests': 0, 'embedded_texts': 0, 'completions': 0, 'streamed_completions': 0}
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self, host='127.0.0.1', port=0):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if self.path.endswith('/embeddings'):
+                    self._send_json(stub.embeddings(body))
+                elif self.path.endswith('/chat/completions') and body.get('stream'):
+                    self._send_stream(stub.stream_chunks(body))
+                elif self.path.endswith('/chat/completions'):
+                    self._send_json(stub.completion(body))
+                else:
+                    self._send_json({'error': {'message': f'unknown path {self.path}'}}, status=404)
+
+            def _send_json(self, payload, status=200):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, chunks):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for chunk in chunks:
+                    data = f"data: {chunk}\n\n".encode('utf-8')
+                    self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.counts[key] += n
+
+    def _delay(self, base):
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter, self.jitter) * base if base else 0.0
+        return max(0.0, base + jitter)
+
+    def embed(self, text):
+        """Deterministic unit vector: each word hashed into one dimension"""
+        vector = np.zeros(self.dims, dtype=np.float32)
+        for word in re.findall(r'\w+', text.upper()):
+            vector[int(hashlib.md5(word.encode('utf-8')).hexdigest(), 16) % self.dims] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embeddings(self, body):
+        texts = body.get('input') or []
+        if isinstance(texts, str):
+            texts = [texts]
+        self._count('embedding_requests')
+        self._count('embedded_texts', len(texts))
+        time.sleep(self._delay(self.embedding_latency))
+
+        data = []
+        for i, text in enumerate(texts):
+            vector = self.embed(text if isinstance(text, str) else " ".join(map(str, text)))
+            if body.get('encoding_format') == 'base64':
+                embedding = base64.b64encode(vector.astype('<f4').tobytes()).decode('ascii')
+            else:
+                embedding = vector.tolist()
+            data.append({'object': 'embedding', 'index': i, 'embedding': embedding})
+        tokens = sum(len(str(t).split()) for t in texts)
+        return {'object': 'list', 'data': data, 'model': body.get('model'),
+                'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}}
+
+    def _answer(self, body):
+        messages = body.get('messages') or []
+        system = next((m['content'] for m in messages if m.get('role') == 'system'), '')
+        user = messages[-1]['content'] if messages else ''
+        if 'transcript analysis' in system.lower():
+            return ", ".join(dict.fromkeys(f"CSE {n}" for n in re.findall(r'CSE\s*(\d{4})', user)))
+        if 'conversation summary' in system.lower():
+            courses = list(dict.fromkeys(re.findall(r'CSE\s?\d{4}', user.split('Newest exchanges:')[-1])))
+            return json.dumps({'goals': ['finish the BS CSE degree'],
+                               'decisions': [f"considering {course}" for course in courses[:3]]})
+        courses = list(dict.fromkeys(re.findall(r'CSE\s?\d{4}', user)))[:3] or ['the CSE curriculum']
+        words = f"Here is some advice about {', '.join(courses)}.".split()
+        filler = "This stand-in response has roughly the length of a real advising answer".split()
+        while len(words) < self.response_words:
+            words.extend(filler)
+        return " ".join(words[:self.response_words])
+
+    def _usage(self, body, content):
+        prompt_tokens = sum(len(m.get('content', '').split()) for m in body.get('messages') or [])
+        completion_tokens = len(content.split())
+        return {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens}
+
+    def completion(self, body):
+        self._count('completions')
+        time.sleep(self._delay(self.latency))
+        content = self._answer(body)
+        return {
+            'id': 'chatcmpl-stub', 'object': 'chat.completion', 'created': int(time.time()),
+            'model': body.get('model'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': self._usage(body, content),
+        }
+
+    def stream_chunks(self, body):
+        """SSE payloads for a streamed completion; a quarter of the latency is time to first token"""
+        self._count('streamed_completions')
+        total = self._delay(self.latency)
+        words = self._answer(body).split()
+        time.sleep(total * 0.25)
+        per_token = total * 0.75 / max(1, len(words))
+        for i, word in enumerate(words):
+            yield json.dumps({
+                'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                'model': body.get('model'),
+                'choices': [{'index': 0, 'delta': {'content': word + ('' if i == len(words) - 1 else ' ')},
+                             'finish_reason': None}],
+            })
+            time.sleep(per_token)
+        yield json.dumps({
+            'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+            'model': body.get('model'), 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+        })
+        if (body.get('stream_options') or {}).get('include_usage'):
+            yield json.dumps({
+                'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                'model': body.get('model'), 'choices': [], 'usage': self._usage(body, " ".join(words)),
+            })
+        yield '[DONE]'
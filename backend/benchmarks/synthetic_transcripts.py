@@ -0,0 +1,118 @@
+"""Synthetic OSU-style transcripts for benchmarks.
+
+Transcripts are generated from the course catalog with a seeded RNG and
+rendered to small but real PDFs (Helvetica text, one term per page), so the
+benchmarks exercise PyPDF2 text extraction the same way uploads do.
+"""
+import json
+import os
+import random
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TERMS = ['Autumn', 'Spring', 'Summer']
+LETTER_GRADES = ['A', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'D', 'E', 'W', 'S']
+OTHER_COURSES = [
+    ('MATH 1151', 'Calculus I', 5.0),
+    ('MATH 1172', 'Engineering Mathematics A', 5.0),
+    ('PHYSICS 1250', 'Mechanics, Work and Energy', 5.0),
+    ('ENGR 1181', 'Fundamentals of Engineering I', 2.0),
+    ('STAT 3470', 'Introduction to Probability and Statistics', 3.0),
+    ('ENGLISH 1110', 'First-Year English Composition', 3.0),
+]
+
+def load_catalog():
+    with open(os.path.join(BACKEND_DIR, 'cse_courses_processed.json')) as f:
+        return json.load(f)
+
+def _units(course):
+    try:
+        return float(course['units'].replace('Units:', '').split('-')[0].strip())
+    except ValueError:
+        return 3.0
+
+def generate_transcript(rng, catalog, n_terms=6, courses_per_term=(2, 4), in_progress=True):
+    """Return (pages, expected) where pages is a list of text lines per term and
+    expected is the list of CSE course dicts the transcript contains"""
+    undergrad = [c for c in catalog if c['level'] == 'undergraduate']
+    chosen = rng.sample(undergrad, min(len(undergrad), n_terms * courses_per_term[1]))
+    pages = []
+    expected = []
+    year = rng.randint(2018, 2022)
+    for term_index in range(n_terms):
+        term = f"{TERMS[term_index % len(TERMS)]} {year + (term_index + 2) // len(TERMS)}"
+        lines = [
+            'The Ohio State University - Unofficial Transcript',
+            f'Name: Student {rng.randint(1000, 9999)}    Program: Computer Science and Engineering BS',
+            f'{term}',
+            'Course Description Attempted Earned Grade Points',
+        ]
+        last_term = term_index == n_terms - 1
+        count = rng.randint(*courses_per_term)
+        for _ in range(count):
+            if not chosen:
+                break
+            course = chosen.pop()
+            units = _units(course)
+            number = course['number']
+            title = course['title'][:40]
+            if last_term and in_progress:
+                lines.append(f"{number} {title} {units:.3f}")
+                grade = None
+            else:
+                grade = rng.choice(LETTER_GRADES)
+                earned = 0.0 if grade in ('E', 'W') else units
+                lines.append(f"{number} {title} {units:.3f} {earned:.3f} {grade} {units * 3:.3f}")
+            expected.append({'number': number, 'term': term, 'grade': grade, 'credits': units})
+        other = rng.choice(OTHER_COURSES)
+        lines.append(f"{other[0]} {other[1]} {other[2]:.3f} {other[2]:.3f} B {other[2] * 3:.3f}")
+        lines.append(f'Term GPA: {rng.uniform(2.0, 4.0):.2f}   Cumulative GPA: {rng.uniform(2.0, 4.0):.2f}')
+        pages.append(lines)
+    return pages, expected
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def render_pdf(pages):
+    """Render lists of text lines to PDF bytes, one page per list"""
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog_id = add(None)
+    pages_id = add(None)
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_ids = []
+    for lines in pages:
+        content = "BT /F1 10 Tf 14 TL 50 750 Td " + " ".join(f"({_escape(line)}) Tj T*" for line in lines) + " ET"
+        content = content.encode('latin-1', 'replace')
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        page_ids.append(add(
+            f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>".encode()
+        ))
+    objects[catalog_id - 1] = f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode()
+    kids = " ".join(f"{i} 0 R" for i in page_ids)
+    objects[pages_id - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog_id, xref)
+    return bytes(out)
+
+def synthetic_transcripts(count, seed=0, **kwargs):
+    """Yield (pdf_bytes, expected_courses) pairs"""
+    rng = random.Random(seed)
+    catalog = load_catalog()
+    for _ in range(count):
+        pages, expected = generate_transcript(rng, catalog, **kwargs)
+        yield render_pdf(pages), expected
@@ -0,0 +1,158 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from intent_router import find_course_numbers
+
+SUMMARY_SYSTEM_MESSAGE = """You maintain the conversation summary for an academic advising chat.
+Given the current summary and the newest exchanges, reply with JSON only:
+{"goals": [...], "decisions": [...]}
+"goals" are the student's stated goals and interests (for example "graduate in spring 2026", "focus on machine learning").
+"decisions" are choices made or advice accepted (for example "taking CSE 3341 next semester").
+Keep every item under 15 words, merge duplicates, drop anything superseded, and keep the most recent items last."""
+
+
+def empty_summary():
+    return {'goals': [], 'decisions': [], 'courses': []}
+
+def unsummarized_messages(record):
+    """The exchanges not yet folded into the session's summary, oldest first"""
+    return [msg for msg in record.messages if msg['timestamp'] > record.summarized_until]
+
+def describe_summary(summary):
+    """Prompt lines for a session summary (empty if there is nothing to say)"""
+    lines = []
+    if summary.get('goals'):
+        lines.append("Stated goals: " + "; ".join(summary['goals']))
+    if summary.get('decisions'):
+        lines.append("Decisions so far: " + "; ".join(summary['decisions']))
+    if summary.get('courses'):
+        lines.append("Courses discussed: " + ", ".join(summary['courses']))
+    return lines
+
+class ConversationSummarizer:
+    """Folds older exchanges of each session into a compact structured summary.
+
+    ``schedule`` queues an update on a small thread pool, so the LLM call
+    never sits on the request path. An update only compacts once the
+    unsummarized exchanges exceed ``token_threshold`` tokens (by
+    ``count_tokens``) or fill the session's message memory, so most turns
+    cost nothing. It then takes the exchanges that are neither summarized
+    yet nor among the ``keep_recent`` newest, asks ``complete`` (messages ->
+    reply text) to merge them into the summary's goals and decisions, and
+    collects the course numbers they mention (``find_courses``: text -> course
+    numbers) without the LLM. While
+    ``should_defer()`` is true (user traffic needs the LLM) updates are put
+    off until a later turn. Prompts carry the summary plus the unsummarized
+    exchanges only. Updates for one session never run concurrently; a turn
+    that arrives during an update triggers another pass.
+    """
+
+    def __init__(self, store, complete, keep_recent=1, max_items=8, max_workers=2,
+                 count_tokens=None, token_threshold=0, should_defer=None, find_courses=None):
+        self.store = store
+        self.complete = complete
+        self.find_courses = find_courses or (lambda text: find_course_numbers(text, bare=False))
+        self.keep_recent = keep_recent
+        self.max_items = max_items
+        self.count_tokens = count_tokens
+        self.token_threshold = token_threshold
+        self.should_defer = should_defer
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='summarizer')
+        self._lock = threading.Lock()
+        self._running = set()
+        self._dirty = set()
+        self._counts = {'scheduled': 0, 'updates': 0, 'exchanges': 0, 'deferred': 0, 'failures': 0}
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._counts[key] += n
+
+    def schedule(self, session_id):
+        """Update the session's summary in the background"""
+        if not session_id:
+            # Anonymous requests have no session to summarize
+            return
+        with self._lock:
+            self._counts['scheduled'] += 1
+            if session_id in self._running:
+                self._dirty.add(session_id)
+                return
+            self._running.add(session_id)
+        self._executor.submit(self._run, session_id)
+
+    def _run(self, session_id):
+        while True:
+            try:
+                self.update(session_id)
+            except Exception as e:
+                print(f"Could not update the conversation summary: {e}")
+                self._count('failures')
+            with self._lock:
+                if session_id not in self._dirty:
+                    self._running.discard(session_id)
+                    return
+                self._dirty.discard(session_id)
+
+    def update(self, session_id):
+        """Fold the session's older unsummarized exchanges into its summary; returns how many"""
+        record = self.store.get(session_id)
+        unsummarized = unsummarized_messages(record)
+        pending = unsummarized[:max(0, len(unsummarized) - self.keep_recent)]
+        if not pending or not self._due(record, unsummarized):
+            return 0
+        if self.should_defer and self.should_defer():
+            self._count('deferred')
+            return 0
+
+        summary = self.merge(record.summary or empty_summary(), pending)
+        with self.store.edit(session_id) as record:
+            record.summary = summary
+            record.summarized_until = max(record.summarized_until, pending[-1]['timestamp'])
+        self._count('updates')
+        self._count('exchanges', len(pending))
+        return len(pending)
+
+    def _due(self, record, unsummarized):
+        """Whether the unsummarized history is big enough to be worth an LLM call"""
+        if record.messages.maxlen and len(unsummarized) >= record.messages.maxlen:
+            # The next exchange would push one out before it was summarized
+            return True
+        if not self.count_tokens:
+            return True
+        tokens = sum(self.count_tokens(f"{msg['user']}\n{msg['assistant']}") for msg in unsummarized)
+        return tokens > self.token_threshold
+
+    def merge(self, summary, exchanges):
+        """A new summary with ``exchanges`` folded in"""
+        courses = list(summary.get('courses', []))
+        for msg in exchanges:
+            for course in self.find_courses(f"{msg['user']}\n{msg['assistant']}"):
+                if course in courses:
+                    courses.remove(course)
+                courses.append(course)
+
+        transcript = "".join(f"User: {msg['user']}\nAssistant: {msg['assistant']}\n" for msg in exchanges)
+        reply = self.complete([
+            {"role": "system", "content": SUMMARY_SYSTEM_MESSAGE},
+            {"role": "user", "content": f"Current summary:\n{json.dumps({k: summary.get(k, []) for k in ('goals', 'decisions')})}"
+                                        f"\n\nNewest exchanges:\n{transcript}"}
+        ])
+        try:
+            fields = json.loads(reply[reply.index('{'):reply.rindex('}') + 1])
+            goals = [str(item) for item in fields.get('goals', [])]
+            decisions = [str(item) for item in fields.get('decisions', [])]
+        except (ValueError, AttributeError):
+            # Keep what we had rather than lose it to a malformed reply; the courses are still updated
+            print("Conversation summary reply was not valid JSON, keeping the previous goals and decisions")
+            goals, decisions = summary.get('goals', []), summary.get('decisions', [])
+
+        return {
+            'goals': goals[-self.max_items:],
+            'decisions': decisions[-self.max_items:],
+            'courses': courses[-self.max_items * 2:]
+        }
+
+    def stats(self):
+        with self._lock:
+            return {**self._counts, 'running': len(self._running)}
@@ -0,0 +1,89 @@
+import json
+import re
+
+COURSES_PATH = 'cse_courses_processed.json'
+
+# Whitespace and the commas between array items
+_SEPARATORS = re.compile(r'[\s,]*')
+
+def load_courses(path=COURSES_PATH):
+    """Load the processed course catalog"""
+    with open(path) as f:
+        return json.load(f)
+
+def iter_courses(path=COURSES_PATH, chunk_size=1 << 16):
+    """Yield the courses of a JSON array or JSON Lines file one at a time, reading it in chunks"""
+    decoder = json.JSONDecoder()
+    with open(path) as f:
+        buffer = f.read(chunk_size)
+        pos = _SEPARATORS.match(buffer).end()
+        if buffer[pos:pos + 1] == '[':
+            pos += 1
+        while True:
+            pos = _SEPARATORS.match(buffer, pos).end()
+            if buffer[pos:pos + 1] == ']':
+                return
+            try:
+                course, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Either the next item is cut off at the end of the buffer or the file is done
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    if pos >= len(buffer):
+                        return
+                    raise
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            yield course
+
+def course_number(course):
+    """Normalized course number, e.g. 'CSE 3901' -> 'CSE3901'"""
+    return course['number'].replace(' ', '')
+
+def course_department(course):
+    """Department code, e.g. 'CSE' for 'CSE 3901' (processed catalogs also store it)"""
+    department = course.get('department')
+    if department:
+        return department
+    match = re.match(r'[A-Za-z]+', course_number(course))
+    return match.group().upper() if match else 'UNKNOWN'
+
+def render_title_doc(course):
+    """Create the title-focused document stored in the *_titles collections"""
+    course_num = course_number(course)
+    return f"""Course Number: {course_num} {course_num} {course_num}
+Course: {course_num} - {course['title']}
+Level: {course['level']}
+Search Terms: {course_num} {course_department(course)} {course_num[-4:]} {course['title']}"""
+
+def render_full_doc(course):
+    """Create the comprehensive document stored in the *_courses collections"""
+    course_num = course_number(course)
+    return f"""Course Number: {course_num} {course_num} {course_num}
+Course Title: {course_num} - {course['title']}
+Level: {course['level']}
+Description: {course['description']}
+Prerequisites: {course['prerequisites']}
+Units: {course['units']}
+Search Terms: {course_num} {course_department(course)} {course_num[-4:]} {course['title']}"""
+
+def course_metadata(course):
+    """Metadata stored alongside both documents of a course"""
+    course_num = course_number(course)
+    return {
+        "number": course_num,
+        "number_raw": course_num[-4:],
+        "title": course['title'],
+        "prerequisites": course['prerequisites'],
+        "units": course['units'],
+        "level": course['level'],
+        "department": course_department(course)
+    }
+
+def course_credits(course, default=3.0):
+    """Credit hours from the catalog's 'Units: 3.0' field (the low end of a range)"""
+    try:
+        return float(course['units'].replace('Units:', '').split('-')[0].strip())
+    except ValueError:
+        return default
@@ -0,0 +1,91 @@
+import os
+import re
+import threading
+from datetime import datetime
+
+from reloadable import Reloadable
+from course_docs import COURSES_PATH, iter_courses, course_department, course_number, render_full_doc
+
+# Written by init_db.py after every rebuild so running workers can notice it
+CATALOG_STAMP_PATH = './chroma_db/catalog_version'
+
+def write_catalog_stamp(path=CATALOG_STAMP_PATH):
+    """Record that the course database was just rebuilt"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(datetime.now().isoformat())
+
+def read_catalog_stamp(path=CATALOG_STAMP_PATH):
+    """Return the current catalog version, or None if the DB was never built"""
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def base_number(course_num):
+    """('CSE', '5477') for 'CSE5477.01': department and four-digit number, ignoring suffixes"""
+    match = re.match(r'([A-Z]*)(\d{4})', course_num)
+    return (match.group(1), match.group(2)) if match else (course_num, '')
+
+class CourseIndex(Reloadable):
+    """In-memory index of full course documents for exact course-number lookups.
+
+    Maps normalized numbers ('CSE3901') and base numbers (('CSE', '5477') for
+    CSE 5477.01 and .02) to the same documents init_db.py stores in the
+    *_courses collections, per level, so exact matches never have to go
+    through a Chroma metadata scan. Numbers only match within their own
+    department.
+    """
+
+    def __init__(self, path=COURSES_PATH, stamp_path=CATALOG_STAMP_PATH):
+        super().__init__()
+        self.path = path
+        self.stamp_path = stamp_path
+        self._lock = threading.Lock()
+        self._by_number = {}
+        self._by_raw = {}
+        self._courses = {}
+        self.departments = frozenset()
+
+    def _watched_paths(self):
+        # The catalog file, and the DB build stamp
+        return self.path, self.stamp_path
+
+    def load(self):
+        """(Re)build the index from the processed course catalog"""
+        with self._lock:
+            version = self._current_version()
+            by_number = {}
+            by_raw = {}
+            courses = {}
+            departments = set()
+            for course in iter_courses(self.path):
+                course_num = course_number(course)
+                doc = render_full_doc(course)
+                level = course['level']
+                by_number.setdefault(level, {}).setdefault(course_num, []).append(doc)
+                by_raw.setdefault(level, {}).setdefault(base_number(course_num), []).append(doc)
+                courses.setdefault(course_num, course)
+                courses.setdefault(base_number(course_num), course)
+                departments.add(course_department(course))
+
+            # Swap in the new tables at once so readers never see a partial index
+            self._by_number, self._by_raw, self._courses = by_number, by_raw, courses
+            self.departments = frozenset(departments)
+            self._version = version
+            print(f"Loaded course index: {sum(len(v) for v in by_number.values())} courses")
+
+    def lookup(self, course_num, level):
+        """Return documents for a course number ('CSE3901'), trying the exact number before its base number"""
+        docs = self._by_number.get(level, {}).get(course_num)
+        if docs:
+            return docs
+        return self._by_raw.get(level, {}).get(base_number(course_num), [])
+
+    def course(self, course_num):
+        """The catalog entry (title, units, prerequisites, ...) for a course number, at any level"""
+        return self._courses.get(course_num) or self._courses.get(base_number(course_num))
+
+    def __len__(self):
+        return sum(len(v) for v in self._by_number.values())
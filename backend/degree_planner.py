@@ -0,0 +1,358 @@
+import time
+
+from course_docs import iter_courses, course_number, course_credits
+from prereq_graph import display_course_id, normalize_course_id
+
+# BS CSE requirement groups (the same program summarized in app.SYSTEM_MESSAGE).
+# A group either lists courses that are all required, lets the student choose
+# some of its options, or asks for a number of credits from a pool of courses.
+# Groups without a pool can't be planned from the CSE catalog and are only reported.
+BS_CSE_REQUIREMENTS = [
+    {'name': 'Software sequence', 'courses': ['CSE2221', 'CSE2231']},
+    {'name': 'Foundations sequence', 'courses': ['CSE2321', 'CSE2331']},
+    {'name': 'Systems sequence', 'courses': ['CSE2421', 'CSE2431']},
+    {'name': 'Programming languages', 'courses': ['CSE3341']},
+    {'name': 'Ethics', 'choose': 1, 'options': ['CSE2501', 'PHILOS2338']},
+    {'name': 'Junior project', 'choose': 1, 'options': ['CSE3901', 'CSE3902', 'CSE3903']},
+    {'name': 'Core elective: software engineering or databases', 'choose': 1, 'options': ['CSE3231', 'CSE3241']},
+    {'name': 'Core elective: architecture or networking', 'choose': 1, 'options': ['CSE3421', 'CSE3461']},
+    {'name': 'Core elective: AI or graphics', 'choose': 1, 'options': ['CSE3521', 'CSE3541']},
+    {'name': 'Capstone', 'choose': 1,
+     'options': ['CSE5911', 'CSE5912', 'CSE5913', 'CSE5914', 'CSE5915', 'CSE5916']},
+    {'name': 'Math', 'courses': ['MATH1151', 'MATH1172', 'MATH2568', 'MATH3345']},
+    {'name': 'Statistics', 'courses': ['STAT3470']},
+    {'name': 'Physics', 'courses': ['PHYSICS1250']},
+    {'name': 'Engineering', 'courses': ['ECE2020', 'ECE2060', 'ENGR1181', 'ENGR1182', 'ENGR1100']},
+    {'name': 'Technical electives', 'credits': 17, 'subject': 'CSE', 'numbers': (3000, 5999),
+     'caps': [(['CSE4251', 'CSE4252', 'CSE4253', 'CSE4254', 'CSE4256'], 2),
+              (['CSE4193', 'CSE4998', 'CSE4999'], 6)],
+     'exclude_titles': ['Intermediate Studies', 'Non-Majors']},
+    {'name': 'Science/Math electives', 'credits': 8},
+]
+
+# Required courses from other departments aren't in the CSE catalog; their
+# titles, credits and (simplified) prerequisites are listed here
+EXTERNAL_COURSES = {
+    'MATH1151': ('Calculus I', 5.0, []),
+    'MATH1172': ('Engineering Mathematics A', 5.0, ['MATH1151']),
+    'MATH2568': ('Linear Algebra', 3.0, ['MATH1172']),
+    'MATH3345': ('Foundations of Higher Mathematics', 3.0, ['MATH1172']),
+    'STAT3470': ('Introduction to Probability and Statistics for Engineers', 3.0, ['MATH1172']),
+    'PHYSICS1250': ('Mechanics, Work, and Energy', 5.0, ['MATH1151']),
+    'PHILOS2338': ('Computing Ethics for a Just and Diverse World', 3.0, []),
+    'ECE2020': ('Analog Systems and Circuits', 3.0, ['PHYSICS1250', 'MATH1172']),
+    'ECE2060': ('Introduction to Digital Logic', 3.0, []),
+    'ENGR1181': ('Fundamentals of Engineering I', 2.0, []),
+    'ENGR1182': ('Fundamentals of Engineering II', 2.0, ['ENGR1181']),
+    'ENGR1100': ('Engineering Survey', 1.0, []),
+}
+
+DEFAULT_MAX_CREDITS = 17
+DEFAULT_MAX_TERMS = 12
+
+class DegreePlanner:
+    """Deterministic semester-by-semester planner.
+
+    Picks the courses still needed for each requirement group (the cheapest
+    option of each choice, electives with the fewest extra prerequisites),
+    adds any missing prerequisites, then list-schedules them: each term takes
+    the ready courses on the longest remaining prerequisite chain first, up
+    to the per-term credit cap. Prerequisites come from prereq_graph.PrereqGraph.
+    """
+
+    def __init__(self, prereq_graph, courses=None, requirements=BS_CSE_REQUIREMENTS,
+                 external_courses=EXTERNAL_COURSES):
+        self.graph = prereq_graph
+        self.requirements = requirements
+        self.external = external_courses
+        self.titles = {}
+        self.credits = {}
+        for course in courses if courses is not None else iter_courses():
+            course_id = course_number(course)
+            self.titles[course_id] = course['title']
+            self.credits[course_id] = course_credits(course)
+        for course_id, (title, credits, _) in external_courses.items():
+            self.titles.setdefault(course_id, title)
+            self.credits.setdefault(course_id, credits)
+
+        self._indexed_version = None
+
+    def _index(self):
+        """(Re)build the tables derived from the prerequisite graph when it was reloaded"""
+        if self._indexed_version == self.graph.version:
+            return
+        # Exclusions work both ways: credit for either course rules out the other
+        conflicts = {}
+        for course_id in self.graph.course_ids():
+            for other in self.graph.record(course_id)['exclusions']:
+                conflicts.setdefault(course_id, set()).add(other)
+                conflicts.setdefault(other, set()).add(course_id)
+        self.conflicts = conflicts
+        self._pools = {}
+        self._indexed_version = self.graph.version
+
+    def _credits(self, course_id):
+        return self.credits.get(course_id, 3.0)
+
+    def _missing(self, course_id, have, level):
+        """Courses not in ``have`` that course_id still needs"""
+        if self.graph.record(course_id) is not None:
+            return self.graph.missing_courses(course_id, have, level)
+        _, _, prereqs = self.external.get(course_id, (None, None, []))
+        return [p for p in prereqs if p not in have]
+
+    def _closure(self, course_ids, have, level):
+        """Extra courses needed (transitively) to take course_ids, in discovery order"""
+        have = set(have) | set(course_ids)
+        added = []
+        queue = list(course_ids)
+        while queue:
+            for missing in self._missing(queue.pop(0), have, level):
+                if missing not in have:
+                    have.add(missing)
+                    added.append(missing)
+                    queue.append(missing)
+        return added
+
+    def _excluded(self, course_id, have):
+        """True if the student can't get credit for course_id given what they have or plan"""
+        return not self.conflicts.get(course_id, set()).isdisjoint(have)
+
+    def _elective_pool(self, group, level):
+        """Catalog courses that may count toward a credit group"""
+        key = (group['name'], level)
+        if key not in self._pools:
+            self._pools[key] = self._build_pool(group, level)
+        return self._pools[key]
+
+    def _build_pool(self, group, level):
+        grouped = {c for g in self.requirements for c in g.get('courses', []) + g.get('options', [])}
+        low, high = group['numbers']
+        pool = []
+        for course_id in self.graph.course_ids():
+            record = self.graph.record(course_id)
+            digits = course_id[len(group['subject']):len(group['subject']) + 4]
+            if not course_id.startswith(group['subject']) or not digits.isdigit():
+                continue
+            if not low <= int(digits) <= high or course_id in grouped:
+                continue
+            if any(word in record['title'] for word in group.get('exclude_titles', [])):
+                continue
+            if any('CSE' in note for note in record['notes']):
+                # "Not open to CSE/CIS majors" and similar
+                continue
+            # Skip courses gated on permission or other conditions a plan can't promise
+            if self.graph.requirement_met(course_id, set(self.credits), level) is not True:
+                continue
+            pool.append(course_id)
+        return pool
+
+    def _select(self, completed, level):
+        """Courses to plan, mapped to the group they satisfy, plus each group's status"""
+        selected = {}
+        groups = []
+
+        def have():
+            return completed | set(selected)
+
+        def add(course_ids, group_name):
+            for course_id in course_ids:
+                if selected.get(course_id, 'Prerequisite') == 'Prerequisite':
+                    selected[course_id] = group_name
+            for course_id in self._closure(course_ids, have(), level):
+                selected.setdefault(course_id, 'Prerequisite')
+
+        # All required courses go in before any prerequisites are worked out, so
+        # an OR alternative that is required anyway (STAT 3470) is the one used
+        for group in self.requirements:
+            if 'courses' not in group:
+                continue
+            done = [c for c in group['courses'] if c in completed]
+            # Credit for an equivalent course ("Not open to students with credit for ...") counts
+            equivalent = [c for c in group['courses'] if c not in completed and self._excluded(c, completed)]
+            needed = [c for c in group['courses'] if c not in done and c not in equivalent]
+            for course_id in needed:
+                selected[course_id] = group['name']
+            groups.append({'group': group['name'], 'completed': done + equivalent, 'planned': needed})
+        for course_id in self._closure(list(selected), completed | set(selected), level):
+            selected.setdefault(course_id, 'Prerequisite')
+
+        for group in self.requirements:
+            if 'options' not in group:
+                continue
+            done = [c for c in group['options'] if c in completed]
+            planned = []
+            for _ in range(max(0, group['choose'] - len(done))):
+                candidates = [c for c in group['options']
+                              if c not in done and c not in planned and not self._excluded(c, have())]
+                if not candidates:
+                    break
+                # Cheapest option in extra credits, listed order breaks ties
+                best = min(candidates, key=lambda c: (
+                    0 if c in selected else
+                    sum(self._credits(x) for x in self._closure([c], have(), level)) + self._credits(c),
+                    group['options'].index(c)))
+                planned.append(best)
+                add([best], group['name'])
+            groups.append({'group': group['name'], 'completed': done, 'planned': planned})
+
+        for group in self.requirements:
+            if 'credits' not in group or 'courses' in group or 'options' in group:
+                continue
+            if 'subject' not in group:
+                groups.append({'group': group['name'], 'completed': [], 'planned': [],
+                               'unplanned_credits': group['credits']})
+                continue
+            pool = self._elective_pool(group, level)
+            caps = [(set(courses), limit) for courses, limit in group.get('caps', [])]
+            done = [c for c in pool if c in completed]
+            earned = sum(self._credits(c) for c in done)
+            used = {id(cap): sum(self._credits(c) for c in done if c in cap[0]) for cap in caps}
+            planned = []
+            while earned < group['credits']:
+                candidates = []
+                for course_id in pool:
+                    if course_id in done or course_id in planned or course_id in selected:
+                        continue
+                    if self._excluded(course_id, have()):
+                        continue
+                    credits = self._credits(course_id)
+                    if any(course_id in cap[0] and used[id(cap)] + credits > cap[1] for cap in caps):
+                        continue
+                    extra = self._closure([course_id], have(), level)
+                    candidates.append((sum(self._credits(x) for x in extra), -credits, course_id))
+                if not candidates:
+                    break
+                _, _, best = min(candidates)
+                planned.append(best)
+                earned += self._credits(best)
+                for cap in caps:
+                    if best in cap[0]:
+                        used[id(cap)] += self._credits(best)
+                add([best], group['name'])
+            groups.append({'group': group['name'], 'completed': done, 'planned': planned,
+                           'credits': group['credits'],
+                           'unplanned_credits': max(0, group['credits'] - earned)})
+        return selected, groups
+
+    def prerequisites_met(self, course_id, done, level):
+        """Whether course_id can be taken after the normalized courses in ``done``"""
+        if self.graph.record(course_id) is not None:
+            # Undecidable conditions (e.g. a GE course) don't hold a course back
+            return self.graph.requirement_met(course_id, done, level) is not False
+        return not self._missing(course_id, done, level)
+
+    def concurrent_met(self, course_id, done, level):
+        """Whether course_id's concurrent requirements are in ``done`` (including this term)"""
+        if self.graph.record(course_id) is not None:
+            return self.graph.concurrent_met(course_id, done, level) is not False
+        return True
+
+    def _heights(self, course_ids):
+        """Length of the longest chain of planned courses that depend on each course"""
+        planned = set(course_ids)
+        dependents = {c: [] for c in planned}
+        for course_id in planned:
+            # Alternatives of an OR all count, which is fine for a priority
+            for prereq in self._direct(course_id):
+                if prereq in planned and prereq != course_id:
+                    dependents[prereq].append(course_id)
+
+        heights = {}
+        def height(course_id, visiting=()):
+            if course_id not in heights:
+                if course_id in visiting:
+                    return 0
+                heights[course_id] = 1 + max((height(d, visiting + (course_id,)) for d in dependents[course_id]),
+                                             default=0)
+            return heights[course_id]
+        for course_id in planned:
+            height(course_id)
+        return heights
+
+    def _direct(self, course_id):
+        """Every course mentioned in course_id's prerequisites or concurrent requirements"""
+        record = self.graph.record(course_id)
+        if record is None:
+            return list(self.external.get(course_id, (None, None, []))[2])
+        found = []
+        stack = [record['requires'], record['concurrent']]
+        while stack:
+            node = stack.pop()
+            if not node:
+                continue
+            if 'course' in node:
+                found.append(node['course'])
+            elif 'args' in node:
+                stack.extend(node['args'])
+        return found
+
+    def plan(self, completed_courses, level='undergraduate', max_credits=DEFAULT_MAX_CREDITS,
+             max_terms=DEFAULT_MAX_TERMS):
+        """Plan the remaining requirements for a student.
+
+        Returns a dict with ``terms`` (courses and credits per semester),
+        ``requirements`` (per-group completed/planned courses), ``unscheduled``
+        courses that couldn't be placed within ``max_terms`` and ``elapsed_ms``.
+        """
+        start = time.perf_counter()
+        self._index()
+        completed = {normalize_course_id(c) for c in completed_courses}
+        selected, groups = self._select(completed, level)
+
+        remaining = set(selected)
+        heights = self._heights(remaining)
+        done = set(completed)
+        terms = []
+        while remaining and len(terms) < max_terms:
+            ready = sorted((c for c in remaining if self.prerequisites_met(c, done, level)),
+                           key=lambda c: (-heights[c], c))
+            term, credits = [], 0.0
+            for course_id in ready:
+                if credits + self._credits(course_id) <= max_credits:
+                    term.append(course_id)
+                    credits += self._credits(course_id)
+
+            # Drop courses whose concurrent requirements didn't make it into this term
+            while True:
+                taking = done | set(term)
+                late = [c for c in term if not self.concurrent_met(c, taking, level)]
+                if not late:
+                    break
+                term = [c for c in term if c not in late]
+            if not term:
+                break
+
+            done.update(term)
+            remaining.difference_update(term)
+            terms.append({
+                'term': len(terms) + 1,
+                'credits': sum(self._credits(c) for c in term),
+                'courses': [{'course': display_course_id(c), 'title': self.titles.get(c, ''),
+                             'credits': self._credits(c), 'group': selected[c]} for c in term],
+            })
+
+        for group in groups:
+            group['completed'] = [display_course_id(c) for c in group['completed']]
+            group['planned'] = [display_course_id(c) for c in group['planned']]
+        return {
+            'terms': terms,
+            'requirements': groups,
+            'unscheduled': [display_course_id(c) for c in sorted(remaining)],
+            'total_credits': sum(term['credits'] for term in terms),
+            'max_credits': max_credits,
+            'elapsed_ms': (time.perf_counter() - start) * 1000,
+        }
+
+def describe_plan(plan):
+    """Plain-text rendering of a plan for the LLM to narrate"""
+    lines = []
+    for term in plan['terms']:
+        courses = ", ".join(f"{c['course']} {c['title']} ({c['credits']:g} cr, {c['group']})" for c in term['courses'])
+        lines.append(f"Semester {term['term']} ({term['credits']:g} credits): {courses}")
+    if plan['unscheduled']:
+        lines.append(f"Could not be scheduled within {len(plan['terms'])} semesters: {', '.join(plan['unscheduled'])}")
+    unplanned = [f"{g['group']} ({g['unplanned_credits']:g} credits)" for g in plan['requirements'] if g.get('unplanned_credits')]
+    if unplanned:
+        lines.append(f"Still to choose outside this plan: {', '.join(unplanned)}")
+    return lines
@@ -0,0 +1,82 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+
+from tiered_cache import TieredCache
+
+class CachedEmbeddingFunction(EmbeddingFunction):
+    """Caching wrapper that can stand in for any Chroma embedding function.
+
+    Embeddings are keyed on model name plus whitespace-normalized text and kept
+    in an in-memory LRU with size and TTL eviction. When ``db_path`` is given,
+    entries are also written to a local SQLite file so warm caches survive
+    restarts and are shared by every worker process on the machine.
+    ``on_embed``, if given, is called with each batch of texts sent upstream.
+    """
+
+    def __init__(self, embedding_function, model_name, max_size=10000, ttl=30 * 24 * 3600,
+                 db_path=None, max_disk_entries=100000, on_embed=None):
+        self.embedding_function = embedding_function
+        self.on_embed = on_embed
+        self.model_name = model_name
+        self.cache = TieredCache(
+            'embeddings', 'vector', 'BLOB', max_size=max_size, ttl=ttl, db_path=db_path,
+            max_disk_entries=max_disk_entries,
+            to_disk=lambda vector: vector.tobytes(),
+            from_disk=lambda blob: np.frombuffer(blob, dtype=np.float32)
+        )
+
+    # Chroma checks these against the embedding function persisted with the
+    # collection, so report whatever the wrapped function reports
+    def name(self):
+        return self.embedding_function.name()
+
+    def get_config(self):
+        return self.embedding_function.get_config()
+
+    def is_legacy(self):
+        return self.embedding_function.is_legacy()
+
+    def default_space(self):
+        return self.embedding_function.default_space()
+
+    def supported_spaces(self):
+        return self.embedding_function.supported_spaces()
+
+    def _key(self, text):
+        normalized = ' '.join(text.split())
+        return hashlib.sha256(f"{self.model_name}\n{normalized}".encode('utf-8')).hexdigest()
+
+    def __call__(self, input):
+        now = time.time()
+        results = [None] * len(input)
+        missing = OrderedDict()  # key -> positions in input
+
+        for i, text in enumerate(input):
+            key = self._key(text)
+            vector = self.cache.get(key, now) if key not in missing else None
+            if vector is not None:
+                results[i] = vector
+            else:
+                missing.setdefault(key, []).append(i)
+
+        if missing:
+            # Embed every distinct uncached text in one upstream call
+            texts = [input[positions[0]] for positions in missing.values()]
+            vectors = self.embedding_function(texts)
+            if self.on_embed:
+                self.on_embed(texts)
+            for (key, positions), vector in zip(missing.items(), vectors):
+                vector = np.asarray(vector, dtype=np.float32)
+                self.cache.put(key, vector, now)
+                for i in positions:
+                    results[i] = vector
+
+        return results
+
+    def stats(self):
+        """Hit/miss counters for this process"""
+        return self.cache.stats()
@@ -0,0 +1,18 @@
+# Production serving config: gunicorn -c gunicorn.conf.py app:app
+#
+# Requests spend almost all of their time waiting on OpenAI, so each worker
+# runs a thread pool (gthread) and keeps many LLM calls in flight at once
+# instead of blocking a whole process per request.
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+worker_class = 'gthread'
+
+# With the default in-memory session store conversations live in each worker
+# process, so keep a single worker unless SESSION_STORE=sqlite is set
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+threads = int(os.getenv('WORKER_THREADS', 32))
+
+# GPT-4 completions (and streamed responses) can take a while
+timeout = int(os.getenv('WORKER_TIMEOUT', 120))
+keepalive = 5
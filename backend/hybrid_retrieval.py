@@ -0,0 +1,194 @@
+import math
+import re
+import tempfile
+import threading
+from collections import Counter
+
+import numpy as np
+
+from course_docs import COURSES_PATH, iter_courses, render_full_doc
+from course_index import CATALOG_STAMP_PATH
+from reloadable import Reloadable
+from retrieval import BaseRetriever
+from shards import split_by_shard
+
+TOKEN_PATTERN = re.compile(r'c\+\+|c#|[a-z]+|\d+')
+
+# Common English words plus the field labels every course document carries
+STOPWORDS = frozenset("""
+a an and are as at be by for from how i in is it its me my of on or that the this to what which who with
+about any can do does should take taking want course courses class classes number title level description
+prerequisites prereq prereqs units search terms
+""".split())
+
+def tokenize(text):
+    """Lower-cased words and digit runs, so 'CSE 3901', 'CSE3901' and '3901' share the token '3901'.
+
+    A plural 's' is dropped so 'compilers' matches 'compiler'.
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Merge ranked lists of documents: each scores sum(1 / (k + rank)) over the lists it appears in"""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            scores[doc] = scores.get(doc, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+class LexicalIndex:
+    """In-process BM25 over course fields, one inverted index per (department, level) shard.
+
+    Each course is indexed from its number, title, description and
+    prerequisites, with the number and title repeated per FIELD_WEIGHTS so
+    they count for more than a passing mention in a description. Postings
+    hold each term's precomputed BM25 weight per course, so scoring a query
+    is a sum of a few sparse vectors.
+    """
+
+    FIELD_WEIGHTS = (('number', 3), ('title', 2), ('description', 1), ('prerequisites', 1))
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._state = {}
+
+    def clear(self):
+        self._state = {}
+
+    def index_shard(self, key, courses):
+        """(Re)build one shard's index from its courses"""
+        term_counts = []
+        for course in courses:
+            tokens = []
+            for field, weight in self.FIELD_WEIGHTS:
+                tokens.extend(tokenize(course.get(field) or '') * weight)
+            term_counts.append(Counter(tokens))
+
+        lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float32)
+        norms = self.k1 * (1 - self.b + self.b * lengths / max(lengths.mean(), 1.0))
+        rows_by_term = {}
+        for row, counts in enumerate(term_counts):
+            for term, tf in counts.items():
+                rows_by_term.setdefault(term, []).append((row, tf))
+
+        n = len(courses)
+        postings = {}
+        for term, entries in rows_by_term.items():
+            idf = math.log(1 + (n - len(entries) + 0.5) / (len(entries) + 0.5))
+            rows = np.array([row for row, _ in entries], dtype=np.int32)
+            tf = np.array([tf for _, tf in entries], dtype=np.float32)
+            postings[term] = (rows, idf * tf * (self.k1 + 1) / (tf + norms[rows]))
+        # Copy on write, so searches of other shards never see a half-updated dict
+        state = dict(self._state)
+        state[key] = ([render_full_doc(course) for course in courses], postings)
+        self._state = state
+
+    def scores(self, query_text, shard):
+        """BM25 score of every course in the shard, in index order"""
+        documents, postings = self._state.get(shard, ([], {}))
+        scores = np.zeros(len(documents), dtype=np.float32)
+        for term in dict.fromkeys(tokenize(query_text)):
+            if term in postings:
+                rows, weights = postings[term]
+                scores[rows] += weights
+        return scores
+
+    def search_many(self, query_texts, shard, n_results=3):
+        """Ranked full documents for each query; courses sharing no term with it are left out"""
+        documents, _ = self._state.get(shard, ([], {}))
+        if not documents:
+            return [[] for _ in query_texts]
+        results = []
+        for query_text in query_texts:
+            scores = self.scores(query_text, shard)
+            k = min(n_results, len(documents))
+            top = np.argpartition(-scores, k - 1)[:k] if k < len(documents) else np.arange(len(documents))
+            top = top[np.argsort(-scores[top], kind='stable')]
+            results.append([documents[row] for row in top if scores[row] > 0])
+        return results
+
+class HybridRetriever(Reloadable, BaseRetriever):
+    """Lexical (BM25) and vector retrieval fused with reciprocal rank fusion.
+
+    ``vectors`` is any retrieval.BaseRetriever: Chroma with OpenAI
+    embeddings, the vector snapshot, or local_embeddings.LocalVectorIndex for
+    fully offline search. Both sides contribute their top ``candidates`` per
+    query, and the fused order decides the results. The catalog is split into per-shard files in one pass, and a
+    shard's lexical index (and local vectors) is built the first time it is
+    searched, so only the shards queries reach are held in memory. Both are
+    rebuilt when the catalog file or the DB build stamp changes.
+    """
+
+    def __init__(self, vectors, path=COURSES_PATH, stamp_path=CATALOG_STAMP_PATH, rrf_k=60, candidates=20):
+        super().__init__()
+        self.vectors = vectors
+        self.embedding_function = vectors.embedding_function
+        self.path = path
+        self.stamp_path = stamp_path
+        self.rrf_k = rrf_k
+        self.candidates = candidates
+        self.lexical = LexicalIndex()
+        self._lock = threading.Lock()
+        self._spill = None
+        self._shards = {}
+        self._indexed = set()
+        self.load()
+
+    def _watched_paths(self):
+        return self.path, self.stamp_path
+
+    def load(self):
+        """Split the catalog by shard and drop the indexes built from the previous one"""
+        with self._lock:
+            version = self._current_version()
+            spill = tempfile.TemporaryDirectory(prefix='catalog-shards-')
+            shards = split_by_shard(iter_courses(self.path), spill.name)
+            self.lexical.clear()
+            clear = getattr(self.vectors, 'clear', None)
+            if clear:
+                clear()
+            if self._spill:
+                self._spill.cleanup()
+            self._spill, self._shards, self._indexed = spill, shards, set()
+            self._version = version
+            print(f"Split catalog into {len(shards)} shards for lexical search")
+
+    def index_shard(self, shard):
+        """Build the shard's lexical index, and local vectors if any, unless already built"""
+        if shard in self._indexed:
+            return
+        with self._lock:
+            if shard in self._indexed or shard not in self._shards:
+                return
+            courses = list(iter_courses(self._shards[shard]['path']))
+            self.lexical.index_shard(shard, courses)
+            index_shard = getattr(self.vectors, 'index_shard', None)
+            if index_shard:
+                index_shard(shard, courses)
+            self._indexed.add(shard)
+            print(f"Built lexical index for {shard}: {len(courses)} courses")
+
+    def search_many(self, query_texts, shard, n_results=3, seen_courses=None, query_embeddings=None):
+        """Fused lexical and vector results for several queries; one vector search for all of them"""
+        if not query_texts:
+            return [], self._new_stats()
+
+        self.reload_if_changed()
+        self.index_shard(shard)
+        k = max(self.candidates, n_results)
+        lexical = self.lexical.search_many(query_texts, shard, k)
+        vector, stats = self.vectors.search_many(query_texts, shard, k, query_embeddings=query_embeddings)
+
+        results = [
+            self._take_unseen(reciprocal_rank_fusion([lexical[i], vector[i]], self.rrf_k), seen, n_results)
+            for i, seen in enumerate(self._seen_sets(seen_courses, len(query_texts)))
+        ]
+        return results, stats
@@ -1,128 +1,208 @@
-import os
+import argparse
+import hashlib
 import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import chromadb
 from chromadb.utils import embedding_functions
 from dotenv import load_dotenv
 
+from course_docs import iter_courses, course_number, render_title_doc, render_full_doc, course_metadata
+from course_index import write_catalog_stamp
+from embedding_cache import CachedEmbeddingFunction
+from shards import SHARDS_PATH, collection_names, read_shard_registry, shard_key, split_by_shard, write_shard_registry
+from vector_snapshot import SNAPSHOT_PATH, export_snapshot
+
 # Load environment variables
 load_dotenv()
 
-def init_database():
+# Per-level collections from before the catalog was sharded by department
+LEGACY_COLLECTION_NAMES = ("undergrad_titles", "undergrad_courses", "grad_titles", "grad_courses")
+
+def course_content_hash(title_doc, full_doc, metadata):
+    """Hash of everything stored for a course, used to skip unchanged courses"""
+    payload = json.dumps([title_doc, full_doc, metadata], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def embed_with_retry(embedding_function, texts, retries=3, backoff=1.0):
+    """Embed one batch, retrying with exponential backoff on failure"""
+    for attempt in range(retries + 1):
+        try:
+            return embedding_function(texts)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            print(f"Embedding batch failed ({e}), retrying in {delay:.0f}s")
+            time.sleep(delay)
+
+def embed_in_batches(embedding_function, texts, batch_size, workers):
+    """Embed texts in fixed-size batches with bounded parallelism, preserving order"""
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        embedded = pool.map(lambda batch: embed_with_retry(embedding_function, batch), batches)
+        return [vector for batch in embedded for vector in batch]
+
+def registry_entry(shard):
+    """Registry entry (without the collection count) for a shard from split_by_shard"""
+    titles, full = collection_names(shard['department'], shard['level'])
+    return {'department': shard['department'], 'level': shard['level'],
+            'subject': shard['subject'], 'titles': titles, 'courses': full}
+
+def delete_collection(chroma_client, name):
+    try:
+        chroma_client.delete_collection(name=name)
+        print(f"Deleted existing collection: {name}")
+    except Exception:
+        print(f"No existing collection found: {name}")
+
+def sync_level(courses, title_collection, full_collection, embedding_function, batch_size, workers):
+    """Bring a shard's collections in line with the catalog, re-embedding only new or changed courses.
+
+    Returns (added_or_updated, removed, unchanged) counts.
+    """
+    desired = {}
+    for course in courses:
+        course_id = course_number(course)
+        if course_id in desired:
+            print(f"WARNING: duplicate course number {course_id}, keeping the first entry")
+            continue
+        title_doc = render_title_doc(course)
+        full_doc = render_full_doc(course)
+        metadata = course_metadata(course)
+        metadata['content_hash'] = course_content_hash(title_doc, full_doc, metadata)
+        desired[course_id] = (title_doc, full_doc, metadata)
+
+    # Both collections are written together, so a course only counts as current
+    # if it is present with the right hash in each of them
+    existing_title = title_collection.get(include=['metadatas'])
+    existing_full = full_collection.get(include=['metadatas'])
+    title_hashes = {i: (m or {}).get('content_hash') for i, m in zip(existing_title['ids'], existing_title['metadatas'])}
+    full_hashes = {i: (m or {}).get('content_hash') for i, m in zip(existing_full['ids'], existing_full['metadatas'])}
+
+    changed = [course_id for course_id, (_, _, metadata) in desired.items()
+               if title_hashes.get(course_id) != metadata['content_hash']
+               or full_hashes.get(course_id) != metadata['content_hash']]
+
+    # Removed courses, plus anything left over from the old positional ids
+    stale_title = [i for i in title_hashes if i not in desired]
+    stale_full = [i for i in full_hashes if i not in desired]
+    if stale_title:
+        title_collection.delete(ids=stale_title)
+    if stale_full:
+        full_collection.delete(ids=stale_full)
+
+    for start in range(0, len(changed), batch_size * workers):
+        chunk = changed[start:start + batch_size * workers]
+        title_docs = [desired[i][0] for i in chunk]
+        full_docs = [desired[i][1] for i in chunk]
+        metadatas = [desired[i][2] for i in chunk]
+
+        title_embeddings = embed_in_batches(embedding_function, title_docs, batch_size, workers)
+        full_embeddings = embed_in_batches(embedding_function, full_docs, batch_size, workers)
+
+        title_collection.upsert(ids=chunk, documents=title_docs, metadatas=metadatas, embeddings=title_embeddings)
+        full_collection.upsert(ids=chunk, documents=full_docs, metadatas=metadatas, embeddings=full_embeddings)
+
+    removed = len(set(stale_title) | set(stale_full))
+    return len(changed), removed, len(desired) - len(changed)
+
+def init_database(full_rebuild=False, batch_size=None, workers=None):
+    batch_size = batch_size or int(os.getenv('EMBED_BATCH_SIZE', 100))
+    workers = workers or int(os.getenv('EMBED_WORKERS', 4))
+
     # Initialize ChromaDB
     chroma_client = chromadb.PersistentClient(path="./chroma_db")
-    
+
     # Initialize OpenAI embedding function
-    openai_ef = embedding_functions.OpenAIEmbeddingFunction(
-        api_key=os.getenv('OPENAI_API_KEY'),
-        model_name="text-embedding-ada-002"
+    # Wrapped in the same on-disk cache app.py uses, so unchanged documents are not re-embedded
+    openai_ef = CachedEmbeddingFunction(
+        embedding_functions.OpenAIEmbeddingFunction(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            model_name="text-embedding-ada-002"
+        ),
+        model_name="text-embedding-ada-002",
+        max_size=int(os.getenv('EMBEDDING_CACHE_SIZE', 10000)),
+        ttl=int(os.getenv('EMBEDDING_CACHE_TTL', 30 * 24 * 3600)),
+        db_path=os.getenv('EMBEDDING_CACHE_PATH', './embedding_cache.sqlite3') or None
     )
 
-    # Load course data
-    with open('cse_courses_processed.json') as f:
-        courses = json.load(f)
+    # One (department, level) shard per collection pair. The catalog is split
+    # into per-shard files in one pass, so only the shard being synced is
+    # held in memory
+    spill = tempfile.TemporaryDirectory(prefix='catalog-shards-')
+    split = split_by_shard(iter_courses(), spill.name)
+    shards = {key: registry_entry(shard) for key, shard in split.items()}
+    shards_path = os.getenv('SHARDS_PATH', SHARDS_PATH)
+    previous = read_shard_registry(shards_path)
 
-    # Separate courses by level
-    undergrad_courses = [c for c in courses if c['level'] == 'undergraduate']
-    grad_courses = [c for c in courses if c['level'] == 'graduate']
+    # Drop the collections of shards no longer in the catalog, and the
+    # pre-sharding per-level ones; re-adding their courses is served from the
+    # embedding cache, which is keyed by document text
+    obsolete = [name for key, entry in previous.items() if key not in shards
+                for name in (entry['titles'], entry['courses'])]
+    existing = {getattr(c, 'name', c) for c in chroma_client.list_collections()}
+    obsolete.extend(name for name in LEGACY_COLLECTION_NAMES if name in existing)
+    if full_rebuild:
+        obsolete.extend(name for entry in shards.values() for name in (entry['titles'], entry['courses']))
+    for name in dict.fromkeys(obsolete):
+        delete_collection(chroma_client, name)
+    changed = bool(obsolete)
 
-    # Delete existing collections if they exist
-    collection_names = ["undergrad_titles", "undergrad_courses", 
-                       "grad_titles", "grad_courses"]
-    for name in collection_names:
-        try:
-            chroma_client.delete_collection(name=name)
-            print(f"Deleted existing collection: {name}")
-        except:
-            print(f"No existing collection found: {name}")
-
-    # Create collections for each level
-    collections = {
-        'undergrad_titles': chroma_client.create_collection(
-            name="undergrad_titles",
-            embedding_function=openai_ef
-        ),
-        'undergrad_courses': chroma_client.create_collection(
-            name="undergrad_courses",
-            embedding_function=openai_ef
-        ),
-        'grad_titles': chroma_client.create_collection(
-            name="grad_titles",
-            embedding_function=openai_ef
-        ),
-        'grad_courses': chroma_client.create_collection(
-            name="grad_courses",
-            embedding_function=openai_ef
-        )
-    }
-
-    # Function to process course batch
-    def process_course_batch(courses, title_collection, full_collection):
-        title_documents = []
-        full_documents = []
-        metadatas = []
-        ids = []
-        
-        for i, course in enumerate(courses):
-            course_num = course['number'].replace(' ', '')
-            
-            # Create title-focused document
-            title_doc = f"""Course Number: {course_num} {course_num} {course_num}
-Course: {course_num} - {course['title']}
-Level: {course['level']}
-Search Terms: {course_num} CSE {course_num[-4:]} {course['title']}"""
-            
-            # Create comprehensive document
-            full_doc = f"""Course Number: {course_num} {course_num} {course_num}
-Course Title: {course_num} - {course['title']}
-Level: {course['level']}
-Description: {course['description']}
-Prerequisites: {course['prerequisites']}
-Units: {course['units']}
-Search Terms: {course_num} CSE {course_num[-4:]} {course['title']}"""
-            
-            title_documents.append(title_doc)
-            full_documents.append(full_doc)
-            metadatas.append({
-                "number": course_num,
-                "number_raw": course_num[-4:],
-                "title": course['title'],
-                "prerequisites": course['prerequisites'],
-                "units": course['units'],
-                "level": course['level']
-            })
-            ids.append(str(i))
-        
-        # Add documents to collections
-        title_collection.add(
-            documents=title_documents,
-            metadatas=metadatas,
-            ids=ids
-        )
-        full_collection.add(
-            documents=full_documents,
-            metadatas=metadatas,
-            ids=ids
+    # Create each shard's collections, keeping whatever is already there
+    collections = {}
+    for key, entry in shards.items():
+        metadata = {'department': entry['department'], 'level': entry['level']}
+        collections[key] = tuple(
+            chroma_client.get_or_create_collection(name=name, embedding_function=openai_ef, metadata=metadata)
+            for name in (entry['titles'], entry['courses'])
         )
-        return len(title_documents)
 
-    # Process undergraduate courses
-    try:
-        n_undergrad = process_course_batch(
-            undergrad_courses,
-            collections['undergrad_titles'],
-            collections['undergrad_courses']
-        )
-        print(f"Added {n_undergrad} undergraduate courses")
-        
-        n_grad = process_course_batch(
-            grad_courses,
-            collections['grad_titles'],
-            collections['grad_courses']
-        )
-        print(f"Added {n_grad} graduate courses")
-        
-    except Exception as e:
-        print(f"Error adding documents to collections: {e}")
+    # A shard that fails to sync keeps its previous registry entry, so queries
+    # routed to it still find its collections
+    registry = {}
+    for key, entry in sorted(shards.items()):
+        try:
+            updated, removed, unchanged = sync_level(
+                iter_courses(split[key]['path']),
+                collections[key][0],
+                collections[key][1],
+                openai_ef,
+                batch_size,
+                workers
+            )
+        except Exception as e:
+            print(f"Error adding documents to {key} collections: {e}")
+            changed = True
+            if key in previous:
+                registry[key] = previous[key]
+            continue
+        changed = changed or updated or removed
+        registry[key] = dict(entry, count=collections[key][1].count())
+        print(f"{key} courses: {updated} added/updated, {removed} removed, {unchanged} unchanged")
+    spill.cleanup()
+
+    # Publish every shard at once, so the app's router can pick them
+    if registry:
+        write_shard_registry(registry, shards_path)
+
+    # Export the memory-mappable snapshot used by RETRIEVAL_BACKEND=snapshot
+    snapshot_path = os.getenv('SNAPSHOT_PATH', SNAPSHOT_PATH)
+    if changed or not os.path.exists(os.path.join(snapshot_path, 'index.json')):
+        try:
+            n_exported = export_snapshot(collections.__getitem__, sorted(registry), snapshot_path)
+            print(f"Exported {n_exported} courses to vector snapshot at {snapshot_path}")
+        except Exception as e:
+            print(f"Error exporting vector snapshot: {e}")
+
+    # Let running app workers know their in-memory course index is stale
+    if changed:
+        write_catalog_stamp()
+
+    print(f"Embedding cache: {openai_ef.stats()}")
 
     # Add verification step
     try:
@@ -130,9 +210,7 @@ Search Terms: {course_num} CSE {course_num[-4:]} {course['title']}"""
         test_courses = ["CSE3901", "CSE3902", "CSE3241"]
         print("\nVerifying course entries:")
         for test_course in test_courses:
-            result = collections['undergrad_courses'].get(
-                where={"number": test_course}
-            )
+            result = collections[shard_key('CSE', 'undergraduate')][1].get(ids=[test_course])
             if result['documents']:
                 print(f"Found {test_course}: {result['documents'][0][:100]}...")
             else:
@@ -141,4 +219,9 @@ Search Terms: {course_num} CSE {course_num[-4:]} {course['title']}"""
         print(f"Error during verification: {e}")
 
 if __name__ == "__main__":
-    init_database() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build or incrementally update the course vector database")
+    parser.add_argument('--full', action='store_true', help='drop all collections and re-embed every course')
+    parser.add_argument('--batch-size', type=int, help='documents per embedding request (default EMBED_BATCH_SIZE or 100)')
+    parser.add_argument('--workers', type=int, help='concurrent embedding requests (default EMBED_WORKERS or 4)')
+    args = parser.parse_args()
+    init_database(full_rebuild=args.full, batch_size=args.batch_size, workers=args.workers)
@@ -0,0 +1,157 @@
+import re
+import threading
+
+from course_docs import course_credits
+from prereq_graph import describe_eligibility
+
+# A course number in an upper-cased message with the word before it, which is
+# its department code if it names one, e.g. 'CSE 3901', 'MATH1151', 'IS 2231'
+COURSE_NUMBER_PATTERN = re.compile(r'\b(?:([A-Z]{2,8})\s?)?(\d{4}(?:\.\d{2})?H?)\b')
+
+# "this course", "it": refer back to the last course discussed
+REFERENCE_PATTERNS = [
+    r'\b(this|that|the|current|same) course\b',
+    r'\bit\b',
+    r'\bthis one\b'
+]
+
+# Factual questions that can be answered straight from the catalog, in answer
+# order. Each matches a lookup phrasing, not just a keyword, so "how many hours
+# of homework" isn't a units question
+FACT_PATTERNS = [
+    ('title', re.compile(r"\b((title|name) of|what('s| is) (the|its) (title|name)|called)\b", re.IGNORECASE)),
+    ('units', re.compile(r'\b(how many (units|credits|credit hours)|number of (units|credits)|'
+                         r'(units|credits|credit hours) (is|are|for|of|does|do))\b', re.IGNORECASE)),
+    ('prerequisites', re.compile(r'\b(prereq\w*|pre-?requisites?|requirements? (for|to take))\b', re.IGNORECASE)),
+    ('description', re.compile(r"\b(what('s| is| are) [^?]{0,30}\babout|tell me (more )?about|describe|description( of)?|"
+                               r"what does [^?]{0,30}\bcover|topics)\b", re.IGNORECASE)),
+]
+
+# Questions the catalog can't answer (who teaches it, when it's offered,
+# workload, opinions) go to the LLM even when they also match a fact pattern
+OTHER_INTENT_PATTERN = re.compile(
+    r'\b(who|when|where|offered|offering|online|in person|think|opinions?|reviews?|homework|workload|'
+    r'hours (a|per) week|instructors?|professors?|teach\w*|taught|exams?|syllabus|sections?|textbooks?|'
+    r'semesters?|summer|fall|spring|seats?|waitlist\w*)\b',
+    re.IGNORECASE
+)
+
+# Anything that asks for judgement or personal advice goes to the LLM
+ADVISING_PATTERN = re.compile(
+    r'\b(should|recommend\w*|suggest\w*|plan\w*|schedul\w*|next|best|easy|easier|hard|harder|difficult\w*|'
+    r'compare|versus|vs|why|advice|advise|worth|electives?|graduat\w*|instead|better|or)\b',
+    re.IGNORECASE
+)
+
+MAX_FACTUAL_QUERY_LENGTH = 200
+
+def find_course_numbers(query, departments=('CSE',), default_department='CSE', bare=True):
+    """Normalized course numbers ('MATH1151') mentioned in a message, in the order they appear.
+
+    A number takes the department code written before it if that is one of
+    ``departments``. A bare number ('and 2231') inherits the last department
+    named before it, else ``default_department``; ``bare=False`` skips them.
+    """
+    numbers = []
+    current = default_department
+    for match in COURSE_NUMBER_PATTERN.finditer(query.upper()):
+        department, number = match.groups()
+        if department in departments:
+            current = department
+        elif not bare:
+            continue
+        numbers.append(f"{current}{number}")
+    return list(dict.fromkeys(numbers))
+
+def has_course_reference(query):
+    return any(re.search(pattern, query.lower()) for pattern in REFERENCE_PATTERNS)
+
+class IntentRouter:
+    """Answers plain catalog lookups (title, units, prerequisites, description)
+    without retrieval or an LLM call.
+
+    A message takes the fast path only if it names known courses (or refers
+    back to the last one discussed), asks one or more factual questions in a
+    lookup phrasing and asks nothing else (no advising language, nothing
+    about instructors, scheduling or workload); everything else returns None
+    and goes to the LLM. Counts are kept so the share of traffic served locally can be reported.
+    """
+
+    def __init__(self, course_index, prereq_graph=None, default_department='CSE'):
+        self.course_index = course_index
+        self.prereq_graph = prereq_graph
+        self.default_department = default_department
+        self._lock = threading.Lock()
+        self._counts = {'queries': 0, 'fast_path': 0}
+        self._intents = {name: 0 for name, _ in FACT_PATTERNS}
+
+    def classify(self, query):
+        """Names of the factual intents in a message, or [] if it needs the LLM"""
+        if (len(query) > MAX_FACTUAL_QUERY_LENGTH or ADVISING_PATTERN.search(query)
+                or OTHER_INTENT_PATTERN.search(query)):
+            return []
+        return [name for name, pattern in FACT_PATTERNS if pattern.search(query)]
+
+    def route(self, query, memory=None):
+        """Return (answer, mentioned course numbers) for a factual question, or None"""
+        answer = self._answer(query, memory)
+        with self._lock:
+            self._counts['queries'] += 1
+            if answer:
+                self._counts['fast_path'] += 1
+                for intent in answer[2]:
+                    self._intents[intent] += 1
+        return answer[:2] if answer else None
+
+    def _answer(self, query, memory):
+        intents = self.classify(query)
+        if not intents:
+            return None
+
+        self.course_index.reload_if_changed()
+        numbers = find_course_numbers(query, self.course_index.departments, self.default_department)
+        if not numbers and memory and memory.last_course and has_course_reference(query):
+            # Same fallback get_relevant_courses uses
+            numbers = [memory.last_course]
+        if not numbers:
+            return None
+
+        courses = [self.course_index.course(number) for number in numbers]
+        if not all(courses):
+            # Unknown course numbers are better handled by semantic search
+            return None
+
+        lines = []
+        for course in courses:
+            name = f"{course['number']} ({course['title']})"
+            for intent in intents:
+                if intent == 'title':
+                    lines.append(f"{course['number']} is {course['title']}.")
+                elif intent == 'units':
+                    lines.append(f"{name} is {course_credits(course):g} units.")
+                elif intent == 'prerequisites':
+                    lines.append(f"Prerequisites for {name}: {course['prerequisites']}")
+                    lines.extend(self._eligibility(course, memory))
+                elif intent == 'description':
+                    lines.append(f"{name}: {course['description'].removeprefix('Description:').strip()}")
+        mentioned = {course['number'].replace(' ', '') for course in courses}
+        return "\n\n".join(lines), mentioned, intents
+
+    def _eligibility(self, course, memory):
+        """The student's standing for a course, if their transcript is known"""
+        if not self.prereq_graph or not memory or not memory.completed_courses:
+            return []
+        self.prereq_graph.reload_if_changed()
+        result = self.prereq_graph.check(course['number'], memory.completed_courses, memory.student_level)
+        return [f"Based on your transcript: {line}" for line in describe_eligibility([result])]
+
+    def stats(self):
+        with self._lock:
+            queries = self._counts['queries']
+            return {
+                'queries': queries,
+                'fast_path': self._counts['fast_path'],
+                'llm': queries - self._counts['fast_path'],
+                'hit_rate': self._counts['fast_path'] / queries if queries else 0.0,
+                'intents': dict(self._intents),
+            }
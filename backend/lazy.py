@@ -0,0 +1,47 @@
+import threading
+import time
+
+class ResourceUnavailable(Exception):
+    """A lazily created resource could not be built"""
+
+class LazyResource:
+    """A value built by ``factory`` on first use, so importing app.py stays cheap.
+
+    Thread-safe: concurrent first uses wait for one build. A failed build
+    raises ResourceUnavailable and is tried again on the next use instead of
+    taking the process down.
+    """
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self.load_seconds = None
+        self.error = None
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                start = time.perf_counter()
+                try:
+                    self._value = self.factory()
+                except Exception as e:
+                    self.error = str(e)
+                    print(f"Could not initialize {self.name}: {e}")
+                    raise ResourceUnavailable(f"{self.name} is not available: {e}") from e
+                self.load_seconds = time.perf_counter() - start
+                self.error = None
+                self._loaded = True
+                print(f"Initialized {self.name} in {self.load_seconds * 1000:.0f}ms")
+        return self._value
+
+    def status(self):
+        return {'loaded': self._loaded, 'seconds': self.load_seconds, 'error': self.error}
@@ -0,0 +1,290 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+def retryable_errors():
+    """Errors worth another attempt; anything else (bad request, auth) fails straight away"""
+    import openai
+    return (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+class GatewayOverloaded(Exception):
+    """A completion was shed because too many are already waiting"""
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class _SharedStream:
+    """The chunks of one upstream stream so far, replayed to every caller reading it"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.readers = 1
+        self.abandoned = False  # every reader left, so the upstream stream was cut short
+        self.changed = threading.Condition()
+
+class LLMGateway:
+    """Shared front door for every chat completion the backend makes.
+
+    - Identical in-flight requests (same model, messages and parameters) are
+      merged: one upstream call, every caller gets its response.
+    - At most ``max_concurrency`` calls run upstream at once. Up to
+      ``max_queue`` more wait up to ``queue_timeout`` seconds for a slot;
+      beyond that GatewayOverloaded is raised instead of tying up a thread.
+    - A call that waited longer than ``fallback_after`` seconds for its slot
+      goes to ``fallback_model`` (if set), which answers faster.
+    - Each attempt has a ``timeout``; timeouts, connection errors, rate limits
+      and 5xx responses are retried ``retries`` times with jittered
+      exponential backoff. The client's own retries are turned off.
+
+    Streams get the same admission control and retries (until the first
+    chunk arrives), and identical streams are merged too: one upstream
+    stream, whose chunks every caller replays from the start. ``on_usage`` is called with the
+    token usage of each upstream call. ``client_factory`` returns the OpenAI
+    client and is only called when the first completion is made.
+    """
+
+    def __init__(self, client_factory, model='gpt-4', fallback_model=None, max_concurrency=16, max_queue=64,
+                 queue_timeout=10.0, fallback_after=2.0, timeout=30.0, retries=2, backoff=0.5, on_usage=None):
+        self.model = model
+        self.fallback_model = fallback_model
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.fallback_after = fallback_after
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.on_usage = on_usage
+
+        self._client_factory = client_factory
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._in_flight = {}  # request key -> _InFlight
+        self._streams = {}  # request key -> _SharedStream
+        self._active = 0
+        self._queued = 0
+        self._counts = {'calls': 0, 'upstream': 0, 'coalesced': 0, 'shed': 0, 'retries': 0,
+                        'timeouts': 0, 'fallbacks': 0, 'errors': 0}
+        self._queue_wait = 0.0
+
+    def _upstream(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._client_factory().with_options(timeout=self.timeout, max_retries=0)
+        return self._client
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._counts[key] += n
+
+    @staticmethod
+    def _key(model, messages, params):
+        payload = json.dumps([model, messages, params], sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def complete(self, messages, model=None, **params):
+        """A chat completion response, shared with any identical call already in flight"""
+        model = model or self.model
+        key = self._key(model, messages, params)
+        with self._lock:
+            self._counts['calls'] += 1
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _InFlight()
+            else:
+                self._counts['coalesced'] += 1
+
+        if not leader:
+            if not call.done.wait(self.queue_timeout + self.timeout * (self.retries + 1)):
+                raise GatewayOverloaded("Timed out waiting for an identical completion")
+            if call.error:
+                raise call.error
+            return call.result
+
+        try:
+            with self._slot() as waited:
+                call.result = self._create(messages, self._choose_model(model, waited), params)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+
+    def stream(self, messages, model=None, **params):
+        """Yield the chunks of a streamed completion, shared with any identical stream already in flight.
+
+        The upstream stream runs in a background thread that holds the slot
+        until it ends, or until every caller reading it has gone away.
+        """
+        model = model or self.model
+        params = dict(params, stream=True)
+        key = self._key(model, messages, params)
+        with self._lock:
+            self._counts['calls'] += 1
+            shared = self._streams.get(key)
+            if shared is not None:
+                with shared.changed:
+                    if shared.abandoned:
+                        shared = None
+                    else:
+                        shared.readers += 1
+            leader = shared is None
+            if leader:
+                shared = self._streams[key] = _SharedStream()
+            else:
+                self._counts['coalesced'] += 1
+        if leader:
+            threading.Thread(target=self._pump, args=(key, shared, messages, model, params),
+                             name='llm-stream', daemon=True).start()
+
+        read = 0
+        try:
+            while True:
+                with shared.changed:
+                    while read == len(shared.chunks) and not shared.done:
+                        shared.changed.wait()
+                    chunks = shared.chunks[read:]
+                    done = shared.done
+                yield from chunks
+                read += len(chunks)
+                if done:
+                    if shared.error:
+                        raise shared.error
+                    return
+        finally:
+            with shared.changed:
+                shared.readers -= 1
+
+    def _pump(self, key, shared, messages, model, params):
+        """Read one upstream stream into ``shared``"""
+        try:
+            with self._slot() as waited:
+                chunks = self._create(messages, self._choose_model(model, waited), params)
+                try:
+                    for chunk in chunks:
+                        if chunk.usage and self.on_usage:
+                            self.on_usage(chunk.usage)
+                        with shared.changed:
+                            if not shared.readers:
+                                # Every caller disconnected; stop paying for the rest
+                                shared.abandoned = True
+                                break
+                            shared.chunks.append(chunk)
+                            shared.changed.notify_all()
+                finally:
+                    chunks.close()
+        except Exception as e:
+            shared.error = e
+        finally:
+            with self._lock:
+                if self._streams.get(key) is shared:
+                    del self._streams[key]
+            with shared.changed:
+                shared.done = True
+                shared.changed.notify_all()
+
+    @contextmanager
+    def _slot(self):
+        """Wait for an upstream slot, yielding how long the wait took"""
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._counts['shed'] += 1
+                raise GatewayOverloaded(f"{self._queued} completions already waiting")
+            self._queued += 1
+        start = time.monotonic()
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._queued -= 1
+        waited = time.monotonic() - start
+        with self._lock:
+            self._queue_wait += waited
+            if not acquired:
+                self._counts['shed'] += 1
+            else:
+                self._active += 1
+        if not acquired:
+            raise GatewayOverloaded(f"No completion slot free after {self.queue_timeout:g}s")
+        try:
+            yield waited
+        finally:
+            with self._lock:
+                self._active -= 1
+            self._slots.release()
+
+    def _choose_model(self, model, waited):
+        if self.fallback_model and model != self.fallback_model and waited >= self.fallback_after:
+            self._count('fallbacks')
+            print(f"Waited {waited:.1f}s for a completion slot, using {self.fallback_model} instead of {model}")
+            return self.fallback_model
+        return model
+
+    def _create(self, messages, model, params):
+        """One upstream call with retries. For streams, retries stop once the first chunk arrives."""
+        client = self._upstream()
+        retryable = retryable_errors()
+        for attempt in range(self.retries + 1):
+            try:
+                response = client.chat.completions.create(model=model, messages=messages, **params)
+                if params.get('stream'):
+                    response = iter(response)
+                    first = next(response, None)
+                self._count('upstream')
+                break
+            except retryable as e:
+                if isinstance(e, retryable[0]):  # APITimeoutError
+                    self._count('timeouts')
+                if attempt == self.retries:
+                    self._count('errors')
+                    raise
+                self._count('retries')
+                delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                print(f"Completion attempt {attempt + 1} failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+            except Exception:
+                self._count('errors')
+                raise
+
+        if params.get('stream'):
+            return self._resume(first, response)
+        if self.on_usage and response.usage:
+            self.on_usage(response.usage)
+        return response
+
+    @staticmethod
+    def _resume(first, rest):
+        if first is not None:
+            yield first
+        yield from rest
+
+    def saturated(self):
+        """Whether a new completion would have to wait for a slot"""
+        with self._lock:
+            return self._queued > 0 or self._active >= self.max_concurrency
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._counts,
+                'active': self._active,
+                'queued': self._queued,
+                'queue_wait_seconds': self._queue_wait,
+                'max_concurrency': self.max_concurrency,
+                'max_queue': self.max_queue,
+            }
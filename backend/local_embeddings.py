@@ -0,0 +1,123 @@
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from course_docs import render_full_doc, render_title_doc
+from retrieval import BaseRetriever
+from vector_snapshot import SnapshotRetriever, _normalize_rows
+
+WORD_PATTERN = re.compile(r'[a-z]+|\d+')
+
+class HashingEmbeddingFunction:
+    """Deterministic bag-of-words embedding computed on the CPU.
+
+    Words and their character trigrams are hashed into ``dims`` signed
+    buckets, weighted by log term frequency and L2-normalized. Needs no model
+    download or network, so retrieval works offline and in tests; it matches
+    vocabulary (including partial words) rather than meaning.
+    """
+
+    def __init__(self, dims=1024):
+        self.dims = dims
+
+    def __call__(self, input):
+        return [self._embed(text) for text in input]
+
+    def _embed(self, text):
+        counts = {}
+        for word in WORD_PATTERN.findall(text.lower()):
+            features = [word]
+            if len(word) > 3:
+                padded = f"<{word}>"
+                features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+            for feature in features:
+                counts[feature] = counts.get(feature, 0) + 1
+
+        vector = np.zeros(self.dims, dtype=np.float32)
+        for feature, count in counts.items():
+            h = zlib.crc32(feature.encode('utf-8'))
+            vector[h % self.dims] += (1.0 if h & 0x80000000 else -1.0) * (1.0 + np.log(count))
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+class SentenceTransformerEmbeddingFunction:
+    """Embeddings from a sentence-transformers model run locally (optional dependency)"""
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device='cpu')
+
+    def __call__(self, input):
+        return self.model.encode(list(input), normalize_embeddings=True).tolist()
+
+def create_local_embedding_function(spec='hashing'):
+    """Build the local embedding named by LOCAL_EMBEDDING.
+
+    - ``hashing`` or ``hashing:<dims>``: HashingEmbeddingFunction, no dependencies
+    - ``minilm``: Chroma's bundled all-MiniLM-L6-v2 ONNX model (downloaded once)
+    - ``sentence-transformers:<model>``: any sentence-transformers model
+    """
+    name, _, arg = spec.partition(':')
+    if name == 'hashing':
+        return HashingEmbeddingFunction(int(arg) if arg else 1024)
+    if name == 'minilm':
+        from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+        return ONNXMiniLM_L6_V2()
+    if name == 'sentence-transformers' and arg:
+        return SentenceTransformerEmbeddingFunction(arg)
+    raise ValueError(f"Unknown local embedding: {spec}")
+
+class LocalVectorIndex(BaseRetriever):
+    """Course vectors from a local embedding function, searched in memory.
+
+    Embeds the same title and full documents init_db.py stores in Chroma,
+    per (department, level) shard, and searches them like vector_snapshot.SnapshotRetriever (title
+    hits first, then full-document hits). A retrieval.BaseRetriever;
+    ``index_shard`` (re)builds a shard from its
+    courses, as hybrid_retrieval.HybridRetriever does on a shard's first search.
+    """
+
+    def __init__(self, embedding_function):
+        self.embedding_function = embedding_function
+        self._lock = threading.Lock()
+        self._state = {}
+
+    def clear(self):
+        with self._lock:
+            self._state = {}
+
+    def index_shard(self, key, courses):
+        documents = [render_full_doc(course) for course in courses]
+        title = _normalize_rows(np.asarray(self.embedding_function(
+            [render_title_doc(course) for course in courses]), dtype=np.float32))
+        full = _normalize_rows(np.asarray(self.embedding_function(documents), dtype=np.float32))
+        with self._lock:
+            state = dict(self._state)
+            state[key] = (documents, title, full)
+            self._state = state
+        print(f"Embedded {len(documents)} {key} courses for local vector search")
+
+    def search_many(self, query_texts, shard, n_results=3, seen_courses=None, query_embeddings=None):
+        """Run several searches of one shard with one embedding call and one matrix product per document kind"""
+        stats = self._new_stats()
+        if not query_texts:
+            return [], stats
+        state = self._state.get(shard)
+        if state is None:
+            return [[] for _ in query_texts], stats
+        documents, title, full = state
+
+        query_embeddings = self._embed_queries(query_texts, query_embeddings, stats)
+        queries = _normalize_rows(np.asarray(query_embeddings, dtype=np.float32))
+
+        k = min(n_results, len(documents))
+        title_top = SnapshotRetriever._top_k(queries @ title.T, k)
+        full_top = SnapshotRetriever._top_k(queries @ full.T, k)
+
+        results = [
+            self._take_unseen((documents[int(row)] for row in list(title_top[i]) + list(full_top[i])), seen, n_results)
+            for i, seen in enumerate(self._seen_sets(seen_courses, len(query_texts)))
+        ]
+        return results, stats
@@ -0,0 +1,201 @@
+import bisect
+import functools
+import inspect
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Seconds; covers everything from a dict lookup to a slow GPT-4 completion
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, '') for name in self.labelnames), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, [('le', '+Inf')])
+            lines.append(f"{self.name}_bucket{labels} {values[-2]}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_count{labels} {values[-2]}")
+            lines.append(f"{self.name}_sum{labels} {_format_value(float(values[-1]))}")
+        return lines
+
+class Callback:
+    """A gauge or counter read from a function at scrape time.
+
+    The function returns a number, or a dict of label-value tuples to numbers.
+    """
+
+    def __init__(self, name, help, func, kind='gauge', labelnames=()):
+        self.name = name
+        self.help = help
+        self.func = func
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            values = self.func()
+        except Exception as e:
+            print(f"Could not collect metric {self.name}: {e}")
+            return lines
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Metrics:
+    """Process-local metrics registry rendered in the Prometheus text format.
+
+    Stage timings go into one histogram labelled by stage. When tracing is on,
+    each request also collects its stage timings and token counts and is
+    logged as one JSON line when it finishes; with tracing off the per-request
+    cost is a few histogram updates.
+    """
+
+    def __init__(self, prefix='advisor', trace=False):
+        self.prefix = prefix
+        self.trace_enabled = trace
+        self._metrics = []
+        self._local = threading.local()
+        self.stage_seconds = self.histogram('stage_seconds', 'Time spent in each pipeline stage', ['stage'])
+        self.errors = self.counter('errors_total', 'Errors by pipeline stage or source', ['source'])
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(f"{self.prefix}_{name}", help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(f"{self.prefix}_{name}", help, labelnames, buckets))
+
+    def callback(self, name, help, func, kind='gauge', labelnames=()):
+        return self._register(Callback(f"{self.prefix}_{name}", help, func, kind, labelnames))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def observe_stage(self, name, elapsed):
+        self.stage_seconds.observe(elapsed, stage=name)
+        trace = getattr(self._local, 'trace', None)
+        if trace is not None:
+            trace['stages'].append([name, round(elapsed * 1000, 3)])
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.errors.inc(source=name)
+            raise
+        finally:
+            self.observe_stage(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """Decorator recording a function as a stage; generators are timed until exhausted"""
+        def decorator(func):
+            if inspect.isgeneratorfunction(func):
+                @functools.wraps(func)
+                def timed_generator(*args, **kwargs):
+                    with self.stage(name):
+                        yield from func(*args, **kwargs)
+                return timed_generator
+
+            @functools.wraps(func)
+            def timed_function(*args, **kwargs):
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return timed_function
+        return decorator
+
+    def annotate(self, key, value):
+        """Add to a numeric field of the current request's trace, if one is being collected"""
+        trace = getattr(self._local, 'trace', None)
+        if trace is not None:
+            trace[key] = trace.get(key, 0) + value
+
+    def start_trace(self, **fields):
+        if self.trace_enabled:
+            self._local.trace = {'trace_id': uuid.uuid4().hex[:16], **fields, 'stages': []}
+
+    def finish_trace(self, **fields):
+        trace = getattr(self._local, 'trace', None)
+        self._local.trace = None
+        if trace is not None:
+            trace.update(fields)
+            print(json.dumps(trace))
@@ -0,0 +1,125 @@
+import io
+import multiprocessing
+import threading
+import time
+
+class PdfExtractionError(Exception):
+    """Raised when an uploaded PDF can't or shouldn't be processed"""
+
+def extract_page_texts(pdf_bytes, max_pages):
+    """Extract the text of each page of an in-memory PDF.
+
+    Runs inside the worker processes, so it must stay importable without the
+    rest of the app. PyPDF2 is imported here so only the workers load it.
+    """
+    import PyPDF2
+    try:
+        reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+        if reader.is_encrypted and not reader.decrypt(""):
+            raise PdfExtractionError("Error: This PDF is encrypted. Please provide an unencrypted PDF file.")
+
+        if len(reader.pages) > max_pages:
+            raise PdfExtractionError(f"Error: Transcripts are limited to {max_pages} pages.")
+
+        return [page.extract_text() or "" for page in reader.pages]
+    except PdfExtractionError:
+        raise
+    except Exception as e:
+        if "PyCryptodome" in str(e):
+            raise PdfExtractionError("Error: The PDF file appears to be encrypted. Please provide an unencrypted PDF file.")
+        raise PdfExtractionError(f"Error processing PDF: {str(e)}")
+
+def _worker_loop(conn):
+    """Worker process: extract PDFs sent over ``conn`` until it is closed"""
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        pdf_bytes, max_pages = job
+        try:
+            conn.send((True, extract_page_texts(pdf_bytes, max_pages)))
+        except PdfExtractionError as e:
+            conn.send((False, str(e)))
+
+class PdfExtractionPool:
+    """Runs PDF text extraction in worker processes with a per-job timeout.
+
+    Slow or malicious PDFs then only tie up a worker process, never a request
+    thread. Each job has a worker to itself, and a job that times out has
+    only its own worker killed and replaced, so other uploads in flight carry
+    on. At most ``workers`` jobs run at once; idle workers are reused.
+    """
+
+    def __init__(self, workers=2, timeout=15, max_pages=20):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_pages = max_pages
+        self._slots = threading.BoundedSemaphore(workers)
+        self._idle = []  # (process, connection)
+        self._lock = threading.Lock()
+        # spawn, not fork: the app process has threads and open DB handles
+        self._context = multiprocessing.get_context('spawn')
+
+    def _checkout(self):
+        with self._lock:
+            while self._idle:
+                process, conn = self._idle.pop()
+                if process.is_alive():
+                    return process, conn
+                conn.close()
+        conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_worker_loop, args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        return process, conn
+
+    @staticmethod
+    def _kill(worker):
+        process, conn = worker
+        process.terminate()
+        process.join(timeout=1)
+        conn.close()
+
+    def extract(self, pdf_bytes):
+        """Return the page texts of a PDF, raising PdfExtractionError on failure"""
+        deadline = time.monotonic() + self.timeout
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PdfExtractionError("Error: The PDF took too long to process.")
+        worker = None
+        try:
+            worker = self._checkout()
+            worker[1].send((pdf_bytes, self.max_pages))
+            if not worker[1].poll(max(deadline - time.monotonic(), 0)):
+                self._kill(worker)
+                worker = None
+                raise PdfExtractionError("Error: The PDF took too long to process.")
+            ok, result = worker[1].recv()
+        except (EOFError, OSError):
+            if worker is not None:
+                self._kill(worker)
+                worker = None
+            raise PdfExtractionError("Error: The PDF could not be processed. Please try again.")
+        finally:
+            if worker is not None:
+                with self._lock:
+                    self._idle.append(worker)
+            self._slots.release()
+        if not ok:
+            raise PdfExtractionError(result)
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for process, conn in idle:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            conn.close()
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
@@ -0,0 +1,257 @@
+import functools
+import json
+import re
+import threading
+
+from process_prereqs import PREREQ_GRAPH_PATH
+from reloadable import Reloadable
+
+def normalize_course_id(course):
+    """'CSE 2221', 'cse2221' and '2221' all become 'CSE2221'"""
+    course_id = course.upper().replace(' ', '')
+    if course_id[:1].isdigit():
+        course_id = f"CSE{course_id}"
+    return course_id
+
+@functools.lru_cache(maxsize=4096)
+def display_course_id(course_id):
+    """'CSE2221' -> 'CSE 2221'; anything else is returned unchanged"""
+    return re.sub(r'^([A-Z]+)(?=\d)', r'\1 ', course_id)
+
+def condition_status(text, level):
+    """True/False when a non-course condition can be decided from the student's level, else None"""
+    if text.startswith('enrollment in') and 'CSE' in text:
+        # Everyone talking to this advisor is assumed to be in the CSE major
+        return True
+    if text.startswith('Grad standing'):
+        return level == 'graduate'
+    if text.endswith('standing') and level == 'graduate' and 'Grad' in text:
+        return True
+    return None
+
+LEVELS = ('undergraduate', 'graduate')
+
+def compile_requirement(node):
+    """Turn a requirement tree into a function of (completed set, level) -> True/False/None.
+
+    Done once at load time so a check is a few set operations instead of a
+    walk over the JSON tree.
+    """
+    if node is None:
+        return lambda completed, level: True
+    if 'course' in node:
+        course_id = node['course']
+        return lambda completed, level: course_id in completed
+    if 'cond' in node:
+        statuses = {level: condition_status(node['cond'], level) for level in LEVELS}
+        return lambda completed, level: statuses.get(level)
+
+    courses = frozenset(arg['course'] for arg in node['args'] if 'course' in arg)
+    others = [compile_requirement(arg) for arg in node['args'] if 'course' not in arg]
+    if node['op'] == 'and':
+        def check_all(completed, level):
+            if not courses <= completed:
+                return False
+            result = True
+            for check in others:
+                value = check(completed, level)
+                if value is False:
+                    return False
+                if value is None:
+                    result = None
+            return result
+        return check_all
+
+    def check_any(completed, level):
+        if not courses.isdisjoint(completed):
+            return True
+        result = False
+        for check in others:
+            value = check(completed, level)
+            if value:
+                return True
+            if value is None:
+                result = None
+        return result
+    return check_any
+
+class PrereqGraph(Reloadable):
+    """Structured prerequisite/exclusion graph written by process_prereqs.py.
+
+    Each course has an AND/OR ``requires`` tree, an optional ``concurrent``
+    tree (may be taken at the same time), ``exclusions`` (not open to students
+    with credit for any of them) and free-text ``notes``. Conditions that can't
+    be decided from a transcript (permission of instructor, class standing)
+    make a course conditional rather than eligible or blocked.
+    """
+
+    def __init__(self, path=PREREQ_GRAPH_PATH):
+        super().__init__()
+        self.path = path
+        self._lock = threading.Lock()
+        self._courses = {}
+        self._checks = {}
+
+    def _watched_paths(self):
+        return self.path,
+
+    def load(self):
+        """(Re)load the precomputed graph"""
+        with self._lock:
+            version = self._current_version()
+            with open(self.path) as f:
+                courses = json.load(f)
+            checks = {
+                course_id: (compile_requirement(record['requires']),
+                            compile_requirement(record['concurrent']),
+                            frozenset(record['exclusions']))
+                for course_id, record in courses.items()
+            }
+            # Swap both tables in at once so checks never mix two versions
+            self._courses, self._checks = courses, checks
+            self._version = version
+            print(f"Loaded prerequisite graph: {len(self._courses)} courses")
+
+    @property
+    def version(self):
+        """Changes whenever a different graph file is loaded"""
+        return self._version
+
+    def __contains__(self, course_id):
+        return normalize_course_id(course_id) in self._courses
+
+    def __len__(self):
+        return len(self._courses)
+
+    def record(self, course_id):
+        """The parsed record for a normalized course id, or None"""
+        return self._courses.get(course_id)
+
+    def course_ids(self, level=None):
+        return [c for c, record in self._courses.items() if level is None or record['level'] == level]
+
+    def requirement_met(self, course_id, completed, level='undergraduate'):
+        """True/False/None for a normalized course id against a set of normalized completed ids"""
+        return self._checks[course_id][0](completed, level)
+
+    def concurrent_met(self, course_id, completed, level='undergraduate'):
+        """Like requirement_met for the courses that may also be taken in the same term"""
+        return self._checks[course_id][1](completed, level)
+
+    def missing_courses(self, course_id, completed, level='undergraduate'):
+        """Normalized ids of the courses still needed for the prerequisites and
+        concurrent requirements, taking the shortest alternative of each OR"""
+        record = self._courses[course_id]
+        missing = (self._missing_courses(record['requires'], completed, level) or []) + \
+            (self._missing_courses(record['concurrent'], completed, level) or [])
+        return list(dict.fromkeys(missing))
+
+    def _missing_courses(self, node, completed, level):
+        """Courses-only version of _missing: undecidable conditions count as met
+        and conditions known to fail make an alternative impossible (None)"""
+        if node is None:
+            return []
+        if 'course' in node:
+            return [] if node['course'] in completed else [node['course']]
+        if 'cond' in node:
+            return None if condition_status(node['cond'], level) is False else []
+        missing = [self._missing_courses(arg, completed, level) for arg in node['args']]
+        if node['op'] == 'and':
+            if any(items is None for items in missing):
+                return None
+            return [item for items in missing for item in items]
+        possible = [items for items in missing if items is not None]
+        return min(possible, key=len) if possible else None
+
+    def _missing(self, node, completed, level):
+        """What is still needed to satisfy a tree, picking the shortest alternative of each OR.
+
+        Only walked for courses that aren't eligible, to explain why.
+        """
+        if node is None:
+            return []
+        if 'course' in node:
+            return [] if node['course'] in completed else [node['course']]
+        if 'cond' in node:
+            return [] if condition_status(node['cond'], level) else [node['cond']]
+        missing = [self._missing(arg, completed, level) for arg in node['args']]
+        if node['op'] == 'and':
+            return [item for items in missing for item in items]
+        return min(missing, key=len)
+
+    def check(self, course_id, completed_courses, level='undergraduate'):
+        """Eligibility of one course for a student with the given completed courses.
+
+        Returns a dict with ``status`` ('completed', 'eligible', 'conditional',
+        'blocked' or 'unknown') plus what is missing, concurrent requirements
+        and conflicting exclusions.
+        """
+        completed = {normalize_course_id(c) for c in completed_courses}
+        return self._check(normalize_course_id(course_id), completed, level)
+
+    def _check(self, course_id, completed, level):
+        result = {'course': display_course_id(course_id)}
+
+        record = self._courses.get(course_id)
+        if record is None:
+            result['status'] = 'unknown'
+            return result
+        result['title'] = record['title']
+        if course_id in completed:
+            result['status'] = 'completed'
+            return result
+
+        requires, concurrent, exclusions = self._checks[course_id]
+        satisfied = requires(completed, level)
+        if not exclusions.isdisjoint(completed):
+            result['status'] = 'blocked'
+            result['excluded_by'] = [display_course_id(c) for c in record['exclusions'] if c in completed]
+        elif satisfied is False:
+            result['status'] = 'blocked'
+            result['missing'] = [display_course_id(m) for m in self._missing(record['requires'], completed, level)]
+        elif satisfied is None:
+            result['status'] = 'conditional'
+            result['conditions'] = [display_course_id(m) for m in self._missing(record['requires'], completed, level)]
+        else:
+            result['status'] = 'eligible'
+
+        if record['concurrent'] and not concurrent(completed, level):
+            result['concurrent'] = [display_course_id(m) for m in self._missing(record['concurrent'], completed, level)]
+        return result
+
+    def eligibility(self, completed_courses, level=None, courses=None):
+        """Check every course (or just ``courses``), grouped by status.
+
+        ``level`` limits the catalog to one student level and decides
+        standing conditions; ``courses`` restricts the check to those ids.
+        """
+        completed = {normalize_course_id(c) for c in completed_courses}
+        if courses is None:
+            course_ids = self.course_ids(level)
+        else:
+            course_ids = [normalize_course_id(c) for c in courses]
+
+        grouped = {'eligible': [], 'conditional': [], 'blocked': [], 'completed': [], 'unknown': []}
+        for course_id in course_ids:
+            result = self._check(course_id, completed, level or 'undergraduate')
+            grouped[result['status']].append(result)
+        return grouped
+
+def describe_eligibility(results):
+    """One line per checked course, for the prompt"""
+    lines = []
+    for result in results:
+        status = result['status']
+        if status == 'unknown':
+            continue
+        line = f"{result['course']}: {status}"
+        if result.get('excluded_by'):
+            line += f" (not open to students with credit for {', '.join(result['excluded_by'])})"
+        elif result.get('missing'):
+            line += f" (missing {', '.join(result['missing'])})"
+        elif result.get('conditions'):
+            line += f" (requires {'; '.join(result['conditions'])})"
+        if result.get('concurrent'):
+            line += f"; must also take {', '.join(result['concurrent'])} before or concurrently"
+        lines.append(line)
+    return lines
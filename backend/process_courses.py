@@ -1,34 +1,116 @@
+import argparse
 import json
+import os
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from course_docs import COURSES_PATH, course_department, iter_courses
+from process_prereqs import process_prereqs
+
+CATALOG_PATHS = ('cse_courses.json',)
+
+# Courses per task sent to a worker process
+CHUNK_SIZE = 500
 
 def determine_course_level(course):
     """Determine if a course is undergraduate or graduate based on number and description"""
     course_num = course['number'].replace(' ', '')
     number = int(re.search(r'\d{4}', course_num).group())
-    
+
     # By OSU's numbering system:
     # 1000-4999 are undergraduate
     # 5000+ are graduate
     is_graduate = number >= 5000
-    
+
     # Additional checks in description for graduate keywords
     grad_keywords = ['graduate', 'masters', 'ph.d', 'doctoral']
     desc_lower = course['description'].lower()
     has_grad_keywords = any(keyword in desc_lower for keyword in grad_keywords)
-    
+
     return "graduate" if is_graduate or has_grad_keywords else "undergraduate"
 
-def process_courses():
-    with open('cse_courses.json', 'r') as f:
-        courses = json.load(f)
-    
-    # Add level field to each course
+def normalize_course(course):
+    """Tidy a scraped course and add its department and level"""
+    course = {key: value.strip() if isinstance(value, str) else value for key, value in course.items()}
+    course['number'] = ' '.join(course['number'].split())
+    course['department'] = course_department(course)
+    course['level'] = determine_course_level(course)
+    return course
+
+def normalize_chunk(courses):
+    """Normalize a chunk of courses in a worker process, skipping malformed entries.
+
+    Returns (normalized courses, number skipped).
+    """
+    normalized = []
+    skipped = 0
     for course in courses:
-        course['level'] = determine_course_level(course)
-    
-    # Save processed courses
-    with open('cse_courses_processed.json', 'w') as f:
-        json.dump(courses, f, indent=4)
+        try:
+            normalized.append(normalize_course(course))
+        except (KeyError, AttributeError, TypeError):
+            skipped += 1
+    return normalized, skipped
+
+def iter_chunks(paths, chunk_size):
+    """Courses from every catalog, in order, in lists of up to ``chunk_size``"""
+    chunk = []
+    for path in paths:
+        for course in iter_courses(path):
+            chunk.append(course)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+def process_catalogs(paths=CATALOG_PATHS, output_path=COURSES_PATH, workers=None, chunk_size=CHUNK_SIZE):
+    """Stream scraped catalogs through parallel normalization into one processed catalog.
+
+    Catalogs are read incrementally and at most ``workers * 2`` chunks are in
+    flight, so memory stays flat however large the input. Output keeps the
+    input order, one course per line, and replaces ``output_path`` atomically.
+    Returns (courses written, entries skipped).
+    """
+    workers = workers or os.cpu_count() or 1
+    written = 0
+    skipped = 0
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'w') as out, ProcessPoolExecutor(max_workers=workers) as pool:
+        out.write('[')
+        pending = deque()
+
+        def drain(limit):
+            nonlocal written, skipped
+            while len(pending) > limit:
+                courses, chunk_skipped = pending.popleft().result()
+                skipped += chunk_skipped
+                for course in courses:
+                    out.write(',\n' if written else '\n')
+                    out.write(json.dumps(course))
+                    written += 1
+
+        for chunk in iter_chunks(paths, chunk_size):
+            pending.append(pool.submit(normalize_chunk, chunk))
+            drain(workers * 2)
+        drain(0)
+        out.write('\n]\n')
+    os.replace(tmp_path, output_path)
+    return written, skipped
+
+def process_courses():
+    written, skipped = process_catalogs()
+    print(f"Processed {written} courses ({skipped} skipped)")
 
 if __name__ == "__main__":
-    process_courses() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Normalize scraped course catalogs into the processed catalog")
+    parser.add_argument('catalogs', nargs='*', default=list(CATALOG_PATHS),
+                        help='scraped catalogs, JSON arrays or JSON Lines (default cse_courses.json)')
+    parser.add_argument('--output', default=COURSES_PATH, help=f'processed catalog to write (default {COURSES_PATH})')
+    parser.add_argument('--workers', type=int, help='normalization processes (default: CPU count)')
+    args = parser.parse_args()
+
+    written, skipped = process_catalogs(args.catalogs, args.output, args.workers)
+    print(f"Processed {written} courses from {len(args.catalogs)} catalog(s) ({skipped} skipped)")
+    # Keep the parsed prerequisite graph in step with the catalog
+    process_prereqs(args.output)
@@ -0,0 +1,203 @@
+import json
+import os
+import re
+
+from course_docs import COURSES_PATH, course_department, course_number, iter_courses
+
+PREREQ_GRAPH_PATH = 'cse_prereq_graph.json'
+
+# Any capitalized subject code ('CSE', 'Math', 'Philos', 'Econ'), so a course in
+# a department outside the ingested catalogs keeps its own department
+SUBJECTS = r'[A-Z][A-Za-z]{1,7}'
+COURSE_REF = re.compile(rf'\b(?:({SUBJECTS})\s+)?(\d{{4}}(?:\.\d{{2}})?H?)\b(?:\s*\([^)]*\))?')
+
+# Non-course requirements that contain their own commas and "or"s; they are
+# swapped for placeholders before the course lists are split
+CONDITION_PATTERNS = [
+    re.compile(r'enrollment in [^;.]*?(?:majors?|minors?)(?:,? or [A-Za-z ]+? minor)?'),
+    re.compile(r'GE [^;.]*?course(?:: level \d)?(?:[,;]? or GE [^;.]*?course)?'),
+    re.compile(r'(?:(?:Soph|Jr|Sr|Grad|Honors),?\s+(?:or\s+)?)*(?:Soph|Jr|Sr|Grad|Honors)\s+standing(?:\s+in\s+[A-Z][A-Za-z ]*)?'),
+    re.compile(r'[Pp]ermission of (?:the )?[A-Za-z ]*?(?:instructor|Office)'),
+    re.compile(r'\w+ Placement Level \w+'),
+    re.compile(r'[Aa]t least [^;.]*'),
+]
+
+# Sentences that carry no requirement
+IGNORED_SENTENCE = re.compile(r'^(Repeatable|This course is|Cross-listed|GE quant|GE foundation math)')
+
+def split_sentences(text):
+    # Periods inside course numbers (1281.01H) and "equiv." aren't followed by a capital
+    return [s.strip().rstrip('.') for s in re.split(r'\.\s+(?=[A-Z])', text.strip()) if s.strip()]
+
+def _course_id(subject, number, department='CSE'):
+    # A bare number is a course in the department whose catalog it appears in
+    return f"{(subject or department).upper()}{number}"
+
+class _ClauseParser:
+    """Parses one requirement sentence into an AND/OR tree"""
+
+    def __init__(self, text, department='CSE'):
+        self.department = department
+        self.conditions = []
+
+        def stash(match):
+            self.conditions.append(match.group(0).strip())
+            return f" @{len(self.conditions) - 1} "
+
+        for pattern in CONDITION_PATTERNS:
+            text = pattern.sub(stash, text)
+        self.text = text
+        self.subject = None
+
+    def parse(self):
+        # Semicolons separate the top-level groups; a leading "or" makes the
+        # whole requirement so far one alternative, e.g. "A; and B; or Grad standing"
+        node = None
+        for clause in self.text.split(';'):
+            clause = clause.strip()
+            if not clause:
+                continue
+            connector = 'and'
+            marker = re.match(r'^(and|or)\s+', clause)
+            if marker:
+                connector = marker.group(1)
+                clause = clause[marker.end():]
+            # A bare number inherits the subject named earlier in the same group
+            self.subject = None
+            clause_node = self._parse_list(clause)
+            if clause_node is None:
+                continue
+            node = clause_node if node is None else _combine(connector, node, clause_node)
+        return node
+
+    def _parse_list(self, clause):
+        """OSU-style comma lists: the marker on an item ("or 3903", "and 3341")
+        sets the connector for the run of items before it, and a marked item
+        that is followed by unmarked items starts a new run"""
+        items = [item.strip() for item in clause.split(',') if item.strip()]
+        parsed = []
+        for item in items:
+            marker = re.match(r'^(and|or)\s+', item)
+            parsed.append((marker.group(1) if marker else None, item[marker.end():] if marker else item))
+
+        node = None
+        run = []
+        run_connector = None
+        outer_connector = None
+        for i, (marker, item) in enumerate(parsed):
+            next_unmarked = i + 1 < len(parsed) and parsed[i + 1][0] is None
+            if marker and run and next_unmarked:
+                # Close the current run; this marker joins it to the run starting here
+                run_node = _combine(run_connector or marker, *run)
+                node = run_node if node is None else _combine(outer_connector or marker, node, run_node)
+                outer_connector = marker
+                run, run_connector = [], None
+                marker = None
+            item_node = self._parse_item(item)
+            if item_node is not None:
+                run.append(item_node)
+            if marker:
+                if run_connector and run_connector != marker and len(run) > 1:
+                    closed = _combine(run_connector, *run[:-1])
+                    run = [closed, run[-1]]
+                run_connector = marker
+        if run:
+            run_node = _combine(run_connector or 'or', *run)
+            node = run_node if node is None else _combine(outer_connector or 'and', node, run_node)
+        return node
+
+    def _parse_item(self, item):
+        """A single list item, possibly "X or Y" / "X and Y" without commas"""
+        for connector in ('or', 'and'):
+            parts = re.split(rf'\s+{connector}\s+', item)
+            if len(parts) > 1:
+                nodes = [n for n in (self._parse_item(part) for part in parts) if n is not None]
+                return _combine(connector, *nodes) if nodes else None
+
+        placeholder = re.search(r'@(\d+)', item)
+        if placeholder:
+            return {'cond': self.conditions[int(placeholder.group(1))]}
+
+        match = COURSE_REF.search(item)
+        if match:
+            if match.group(1):
+                self.subject = match.group(1)
+            return {'course': _course_id(match.group(1) or self.subject, match.group(2), self.department)}
+
+        # Old quarter-system numbers, "equiv", "above" and the like. A subject
+        # named on an old number ("Math 366") still carries over to what follows.
+        old_number = re.search(rf'\b({SUBJECTS})\s+\d{{3}}\b', item)
+        if old_number:
+            self.subject = old_number.group(1)
+        return None
+
+def _combine(op, *nodes):
+    nodes = [n for n in nodes if n is not None]
+    if not nodes:
+        return None
+    if len(nodes) == 1:
+        return nodes[0]
+    args = []
+    for n in nodes:
+        # Flatten nested nodes of the same kind
+        args.extend(n['args'] if n.get('op') == op else [n])
+    return {'op': op, 'args': args}
+
+def parse_course_list(text, department='CSE'):
+    """Course ids mentioned in a sentence, e.g. an exclusion list"""
+    ids = []
+    subject = None
+    for match in COURSE_REF.finditer(text):
+        subject = match.group(1) or subject
+        ids.append(_course_id(subject, match.group(2), department))
+    return list(dict.fromkeys(ids))
+
+def parse_prerequisites(text, department='CSE'):
+    """Parse a catalog prerequisite string into a structured record.
+
+    Bare course numbers belong to ``department``, the catalog the text is from.
+    """
+    record = {'requires': None, 'concurrent': None, 'exclusions': [], 'notes': [], 'raw': text}
+    for sentence in split_sentences(text):
+        if sentence.startswith('No prerequisites') or IGNORED_SENTENCE.match(sentence):
+            continue
+        if sentence.startswith('Not open to students with credit for'):
+            record['exclusions'].extend(parse_course_list(sentence, department))
+            continue
+        if sentence.startswith('Not open to'):
+            record['notes'].append(sentence)
+            continue
+
+        concurrent = re.match(r'^(?:Prereq or concur|Concur)(?: \([^)]*\))?:\s*', sentence)
+        if concurrent:
+            node = _ClauseParser(sentence[concurrent.end():], department).parse()
+            record['concurrent'] = node if record['concurrent'] is None else _combine('and', record['concurrent'], node)
+            continue
+
+        node = _ClauseParser(sentence, department).parse()
+        if node is None:
+            record['notes'].append(sentence)
+            continue
+        record['requires'] = node if record['requires'] is None else _combine('and', record['requires'], node)
+
+    record['exclusions'] = list(dict.fromkeys(record['exclusions']))
+    return record
+
+def process_prereqs(courses_path=COURSES_PATH, output_path=PREREQ_GRAPH_PATH):
+    """Parse every course's prerequisites and write the graph used by prereq_graph.py"""
+    graph = {}
+    for course in iter_courses(courses_path):
+        record = parse_prerequisites(course['prerequisites'], course_department(course))
+        record['level'] = course['level']
+        record['title'] = course['title']
+        graph[course_number(course)] = record
+
+    # Replace the file atomically: PrereqGraph reloads it as soon as its mtime changes
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(graph, f, indent=1)
+    os.replace(tmp_path, output_path)
+    print(f"Wrote prerequisite graph for {len(graph)} courses to {output_path}")
+
+if __name__ == "__main__":
+    process_prereqs()
@@ -0,0 +1,156 @@
+import threading
+
+PROMPT_TEMPLATE = """You are an AI academic advisor at Ohio State University's Computer Science department.
+A student has asked: "{query}"
+
+{conversation_context}
+{context}
+
+Please provide a clear, concise response that, using the provided information, directly addresses only the student's query.
+If discussing prerequisites, use the prerequisite check when one is given; otherwise check the student's transcript.
+If a computed degree plan is given, explain that plan as it is instead of sequencing courses yourself.
+If recommending courses, consider the courses they've already taken.
+If this is a follow-up question, maintain consistency with previous responses.
+
+Response:"""
+
+# Don't bother including a truncated item with less room than this
+MIN_TRUNCATED_TOKENS = 40
+
+class TokenCounter:
+    """Counts tokens with the model's tiktoken encoding, or estimates if it can't be loaded"""
+
+    def __init__(self, model="gpt-4"):
+        self.model = model
+        self._encoding = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _get_encoding(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        import tiktoken
+                        self._encoding = tiktoken.encoding_for_model(self.model)
+                    except Exception as e:
+                        # tiktoken downloads its BPE files on first use; estimate when offline
+                        print(f"Could not load tiktoken encoding for {self.model} ({e}), estimating token counts")
+                    self._loaded = True
+        return self._encoding
+
+    def count(self, text):
+        encoding = self._get_encoding()
+        if encoding is None:
+            return (len(text) + 3) // 4
+        return len(encoding.encode(text))
+
+    def truncate(self, text, max_tokens):
+        """Cut text down to at most max_tokens, marking the cut"""
+        encoding = self._get_encoding()
+        if encoding is None:
+            return text[:max(0, max_tokens * 4 - 4)] + " ..."
+        tokens = encoding.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max(0, max_tokens - 2)]) + " ..."
+
+class PromptBuilder:
+    """Assembles the advising prompt within a token budget.
+
+    The system message, the query and the template itself are always sent.
+    Remaining room is filled in priority order: exact course matches, the
+    computed degree plan, the prerequisite check, the transcript course list, the conversation summary,
+    conversation history from newest to oldest, then related courses. An item that doesn't fit is
+    truncated if enough room is left, and everything after it is dropped.
+    """
+
+    def __init__(self, budget=3000, counter=None):
+        self.budget = budget
+        self.counter = counter or TokenCounter()
+
+    def build(self, query, system_message, exact_matches, related_courses, history, transcript_courses,
+              eligibility=None, plan=None, summary=None):
+        """Return (prompt, section token counts).
+
+        ``eligibility`` is a list of per-course lines from
+        prereq_graph.describe_eligibility, ``plan`` the lines of
+        degree_planner.describe_plan, ``summary`` the lines of
+        conversation_summary.describe_summary for exchanges no longer in ``history``.
+        """
+        count = self.counter.count
+        fixed = count(system_message) + count(PROMPT_TEMPLATE.format(query=query, conversation_context="", context=""))
+        remaining = self.budget - fixed
+
+        transcript_context = ""
+        if transcript_courses:
+            transcript_context = "\nStudent's completed courses from transcript:\n"
+            transcript_context += ", ".join(transcript_courses)
+            transcript_context += "\n"
+
+        eligibility_context = ""
+        if eligibility:
+            eligibility_context = "\nPrerequisite check against the student's completed courses:\n"
+            eligibility_context += "\n".join(eligibility)
+            eligibility_context += "\n"
+
+        plan_context = ""
+        if plan:
+            plan_context = "\nComputed degree plan for the remaining requirements:\n"
+            plan_context += "\n".join(plan)
+            plan_context += "\n"
+
+        summary_context = ""
+        if summary:
+            summary_context = "\nSummary of the earlier conversation:\n"
+            summary_context += "\n".join(summary)
+            summary_context += "\n"
+
+        # (section, key, text) in priority order
+        candidates = [('exact', i, f"\n[EXACT MATCH]\n{doc}\n") for i, doc in enumerate(exact_matches)]
+        if plan_context:
+            candidates.append(('plan', 0, plan_context))
+        if eligibility_context:
+            candidates.append(('eligibility', 0, eligibility_context))
+        if transcript_context:
+            candidates.append(('transcript', 0, transcript_context))
+        if summary_context:
+            candidates.append(('summary', 0, summary_context))
+        candidates.extend(
+            ('history', i, f"User: {msg['user']}\nAssistant: {msg['assistant']}\n")
+            for i, msg in reversed(list(enumerate(history)))
+        )
+        candidates.extend(('related', i, f"\n[RELATED COURSE]\n{doc}\n") for i, doc in enumerate(related_courses))
+
+        included = {}
+        tokens = {'system': count(system_message), 'query': fixed - count(system_message),
+                  'exact': 0, 'plan': 0, 'eligibility': 0, 'transcript': 0, 'summary': 0, 'history': 0, 'related': 0, 'dropped': 0}
+        for section, key, text in candidates:
+            if remaining <= 0:
+                tokens['dropped'] += 1
+                continue
+            n = count(text)
+            if n > remaining:
+                if remaining < MIN_TRUNCATED_TOKENS:
+                    remaining = 0
+                    tokens['dropped'] += 1
+                    continue
+                text = self.counter.truncate(text, remaining)
+                n = count(text)
+            included[(section, key)] = text
+            tokens[section] += n
+            remaining -= n
+
+        context = "".join(included.get((section, 0), "") for section in ('transcript', 'plan', 'eligibility'))
+        context += "\nRelevant courses:\n"
+        context += "".join(included[('exact', i)] for i in range(len(exact_matches)) if ('exact', i) in included)
+        context += "".join(included[('related', i)] for i in range(len(related_courses)) if ('related', i) in included)
+
+        conversation_context = included.get(('summary', 0), "")
+        history_parts = [included[('history', i)] for i in range(len(history)) if ('history', i) in included]
+        if history_parts:
+            conversation_context += "\nRecent conversation history:\n" + "".join(history_parts)
+
+        prompt = PROMPT_TEMPLATE.format(query=query, conversation_context=conversation_context, context=context)
+        tokens['total'] = sum(n for section, n in tokens.items() if section != 'dropped')
+        return prompt, tokens
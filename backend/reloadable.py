@@ -0,0 +1,42 @@
+import os
+import threading
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+class Reloadable:
+    """Mixin for state loaded from files and reloaded when any of them changes.
+
+    Subclasses return the files they are built from in ``_watched_paths`` and
+    implement ``load``, which reads ``_current_version()`` before reading the
+    files and stores it in ``self._version`` once the new state is in place.
+    Call ``super().__init__()`` from the subclass constructor.
+    """
+
+    def __init__(self):
+        self._version = None
+        self._reload_lock = threading.Lock()
+
+    def _watched_paths(self):
+        raise NotImplementedError
+
+    def load(self):
+        raise NotImplementedError
+
+    def _current_version(self):
+        """Modification times of the watched files (None for missing ones)"""
+        return tuple(_mtime(path) for path in self._watched_paths())
+
+    def reload_if_changed(self):
+        """Reload if any watched file changed since the last load"""
+        if self._current_version() == self._version:
+            return False
+        with self._reload_lock:
+            # Another thread may have reloaded while this one waited
+            if self._current_version() == self._version:
+                return False
+            self.load()
+        return True
@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+
+from course_index import CATALOG_STAMP_PATH
+from reloadable import Reloadable
+
+class ResponseCache(Reloadable):
+    """Reuses generated answers for near-identical questions.
+
+    Answers are grouped by student level and the set of retrieved course ids;
+    a new question hits when its embedding has cosine similarity of at least
+    ``threshold`` with a cached question in the same group. Only answers that
+    didn't depend on a session (no transcript, no history) should be stored.
+    Entries are evicted least-recently-used beyond ``max_size`` and after
+    ``ttl`` seconds, and everything is dropped when init_db.py rewrites the
+    catalog stamp.
+    """
+
+    def __init__(self, max_size=1000, ttl=6 * 3600, threshold=0.97, stamp_path=CATALOG_STAMP_PATH):
+        super().__init__()
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.stamp_path = stamp_path
+        self._entries = OrderedDict()  # entry id -> (group, created, vector, response), least recently used first
+        self._groups = {}  # group -> {entry id: vector}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.load()
+
+    @staticmethod
+    def _group(level, course_ids):
+        return level, tuple(sorted(course_ids))
+
+    @staticmethod
+    def _normalize(vector):
+        import numpy as np
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _watched_paths(self):
+        return self.stamp_path,
+
+    def load(self):
+        """Drop everything; runs again whenever init_db.py rebuilds the catalog"""
+        with self._lock:
+            version = self._current_version()
+            if self._entries:
+                print("Course catalog changed, clearing the response cache")
+                self.invalidations += 1
+            self._entries.clear()
+            self._groups.clear()
+            self._version = version
+
+    def _remove(self, entry_id):
+        group = self._entries.pop(entry_id)[0]
+        members = self._groups[group]
+        del members[entry_id]
+        if not members:
+            del self._groups[group]
+
+    def get(self, level, course_ids, embedding):
+        """The cached answer to a similar question about the same courses, or None"""
+        if not self.max_size:
+            return None
+        group = self._group(level, course_ids)
+        vector = self._normalize(embedding)
+        now = time.time()
+        self.reload_if_changed()
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            for entry_id, cached in list(self._groups.get(group, {}).items()):
+                if now - self._entries[entry_id][1] > self.ttl:
+                    self._remove(entry_id)
+                    continue
+                score = float(vector @ cached)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id][3]
+
+    def put(self, level, course_ids, embedding, response):
+        if not self.max_size:
+            return
+        group = self._group(level, course_ids)
+        vector = self._normalize(embedding)
+        self.reload_if_changed()
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (group, time.time(), vector, response)
+            self._groups.setdefault(group, {})[entry_id] = vector
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,115 @@
+class BaseRetriever:
+    """Query plumbing shared by the retrieval backends.
+
+    Subclasses set ``embedding_function`` and implement ``search_many``, which
+    returns (list of document lists in query order, stats) where stats counts
+    the embedding and DB calls made; ``search`` is a single-query wrapper.
+    """
+
+    def embed(self, text):
+        """Embed a single query string"""
+        return self.embedding_function([text])[0]
+
+    def search(self, query_text, shard, n_results=3, seen_courses=None, query_embedding=None):
+        """Return (documents, stats) for the best matching full course documents"""
+        results, stats = self.search_many(
+            [query_text], shard, n_results,
+            seen_courses=[seen_courses] if seen_courses else None,
+            query_embeddings=[query_embedding] if query_embedding is not None else None
+        )
+        return results[0], stats
+
+    def search_many(self, query_texts, shard, n_results=3, seen_courses=None, query_embeddings=None):
+        raise NotImplementedError
+
+    @staticmethod
+    def _new_stats():
+        return {'embedding_calls': 0, 'db_calls': 0}
+
+    def _embed_queries(self, query_texts, query_embeddings, stats):
+        """The given query vectors, or all queries embedded in one call"""
+        if query_embeddings is None:
+            query_embeddings = self.embedding_function(list(query_texts))
+            stats['embedding_calls'] += 1
+        return list(query_embeddings)
+
+    @staticmethod
+    def _seen_sets(seen_courses, count):
+        """A fresh set of already-seen documents per query"""
+        return [set(s or ()) for s in (seen_courses or [None] * count)]
+
+    @staticmethod
+    def _take_unseen(docs, seen, n_results, results=None):
+        """Append docs not in ``seen`` to ``results`` until it holds n_results"""
+        results = [] if results is None else results
+        for doc in docs:
+            if len(results) >= n_results:
+                break
+            if doc not in seen:
+                results.append(doc)
+                seen.add(doc)
+        return results
+
+class SemanticRetriever(BaseRetriever):
+    """Semantic course search over a shard's title collection and full-document collection.
+
+    Queries are embedded once and the vectors are passed to both collections via
+    ``query_embeddings``; full documents for title hits are fetched in a single
+    batched ``get``. Each search reports how many embedding and DB calls it made.
+    Callers that already embedded the queries pass ``query_embeddings``.
+
+    ``collections_for_shard`` maps a (department, level) shard key such as
+    'CSE:undergraduate' to its (title, full) Chroma collections.
+    vector_snapshot.SnapshotRetriever offers the same interface.
+    """
+
+    def __init__(self, embedding_function, collections_for_shard):
+        self.embedding_function = embedding_function
+        self.collections_for_shard = collections_for_shard
+
+    def search_many(self, query_texts, shard, n_results=3, seen_courses=None, query_embeddings=None):
+        """Run several searches with one embedding call and one call per DB step.
+
+        Returns (list of document lists in query order, stats).
+        """
+        stats = self._new_stats()
+        if not query_texts:
+            return [], stats
+
+        title_collection, full_collection = self.collections_for_shard(shard)
+
+        seen = self._seen_sets(seen_courses, len(query_texts))
+        results = [[] for _ in query_texts]
+        query_embeddings = self._embed_queries(query_texts, query_embeddings, stats)
+
+        # Try title collection first
+        title_results = title_collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results
+        )
+        stats['db_calls'] += 1
+
+        title_ids = list(dict.fromkeys(doc_id for ids in title_results['ids'] for doc_id in ids))
+        if title_ids:
+            # One batched fetch instead of a get() per title hit
+            full_courses = full_collection.get(ids=title_ids)
+            stats['db_calls'] += 1
+            docs_by_id = dict(zip(full_courses['ids'], full_courses['documents']))
+
+            for i, ids in enumerate(title_results['ids']):
+                docs = [docs_by_id[doc_id] for doc_id in ids if doc_id in docs_by_id]
+                self._take_unseen(docs, seen[i], n_results, results[i])
+
+        # If some queries still need more results, try full collection with the same vectors
+        short = [i for i, docs in enumerate(results) if len(docs) < n_results]
+        if short:
+            full_results = full_collection.query(
+                query_embeddings=[query_embeddings[i] for i in short],
+                n_results=n_results
+            )
+            stats['db_calls'] += 1
+
+            for i, docs in zip(short, full_results['documents']):
+                self._take_unseen(docs, seen[i], n_results, results[i])
+
+        return results, stats
@@ -0,0 +1,243 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+class SessionRecord:
+    """Compact per-session conversation state"""
+
+    __slots__ = ('session_id', 'last_access', 'student_level', 'messages', 'mentioned_courses',
+                 'transcript_courses', 'completed_courses', 'summary', 'summarized_until', 'last_course')
+
+    def __init__(self, session_id, memory_limit, last_access=None):
+        self.session_id = session_id
+        self.last_access = last_access if last_access is not None else time.time()
+        self.student_level = 'undergraduate'
+        self.messages = deque(maxlen=memory_limit)
+        self.mentioned_courses = set()
+        # The course "it" or "this course" refers to
+        self.last_course = None
+        self.transcript_courses = set()
+        self.completed_courses = set()
+        # Rolling summary of older exchanges (see conversation_summary.py) and
+        # the timestamp of the newest exchange it covers
+        self.summary = None
+        self.summarized_until = 0.0
+
+    def copy(self):
+        record = SessionRecord(self.session_id, self.messages.maxlen, self.last_access)
+        record.student_level = self.student_level
+        record.messages.extend(dict(msg) for msg in self.messages)
+        record.mentioned_courses = set(self.mentioned_courses)
+        record.last_course = self.last_course
+        record.transcript_courses = set(self.transcript_courses)
+        record.completed_courses = set(self.completed_courses)
+        record.summary = {key: list(items) for key, items in self.summary.items()} if self.summary else None
+        record.summarized_until = self.summarized_until
+        return record
+
+    def to_json(self):
+        return json.dumps({
+            'student_level': self.student_level,
+            'messages': list(self.messages),
+            'mentioned_courses': sorted(self.mentioned_courses),
+            'last_course': self.last_course,
+            'transcript_courses': sorted(self.transcript_courses),
+            'completed_courses': sorted(self.completed_courses),
+            'summary': self.summary,
+            'summarized_until': self.summarized_until
+        })
+
+    @classmethod
+    def from_json(cls, session_id, data, memory_limit, last_access):
+        fields = json.loads(data)
+        record = cls(session_id, memory_limit, last_access)
+        record.student_level = fields['student_level']
+        record.messages.extend(fields['messages'])
+        record.mentioned_courses = set(fields['mentioned_courses'])
+        record.last_course = fields.get('last_course')
+        record.transcript_courses = set(fields['transcript_courses'])
+        record.completed_courses = set(fields['completed_courses'])
+        record.summary = fields.get('summary')
+        record.summarized_until = fields.get('summarized_until', 0.0)
+        return record
+
+class SessionStore:
+    """Interface for conversation session storage.
+
+    ``get`` returns a snapshot of a session (a new one if needed) that is safe
+    to read without locks. Changes must go through ``edit``, which yields the
+    record and persists it atomically when the block exits. Requests without
+    a session id are never stored: both get a fresh record, and edits to it
+    are discarded.
+    """
+
+    def __init__(self, memory_limit=5, expiry=7200):
+        self.memory_limit = memory_limit
+        self.expiry = expiry
+
+    def _anonymous(self):
+        return SessionRecord(None, self.memory_limit, time.time())
+
+    def get(self, session_id):
+        raise NotImplementedError
+
+    def edit(self, session_id):
+        raise NotImplementedError
+
+    def active_count(self):
+        raise NotImplementedError
+
+class InMemorySessionStore(SessionStore):
+    """Process-local store. Sessions are kept in recency order, so expiring
+    stale sessions only ever looks at the oldest entries (amortized O(1))."""
+
+    def __init__(self, memory_limit=5, expiry=7200):
+        super().__init__(memory_limit, expiry)
+        self._sessions = OrderedDict()  # session_id -> SessionRecord, least recently used first
+        self._lock = threading.RLock()
+
+    def _expire(self, now):
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_access <= self.expiry:
+                break
+            self._sessions.popitem(last=False)
+
+    def _touch(self, session_id):
+        now = time.time()
+        self._expire(now)
+        record = self._sessions.get(session_id)
+        if record is None:
+            record = SessionRecord(session_id, self.memory_limit, now)
+            self._sessions[session_id] = record
+        else:
+            record.last_access = now
+            self._sessions.move_to_end(session_id)
+        return record
+
+    def get(self, session_id):
+        if not session_id:
+            return self._anonymous()
+        with self._lock:
+            return self._touch(session_id).copy()
+
+    @contextmanager
+    def edit(self, session_id):
+        if not session_id:
+            yield self._anonymous()
+            return
+        with self._lock:
+            yield self._touch(session_id)
+
+    def active_count(self):
+        with self._lock:
+            self._expire(time.time())
+            return len(self._sessions)
+
+class SQLiteSessionStore(SessionStore):
+    """Store backed by a local SQLite file, so every worker process on the
+    machine can serve any session without sticky routing."""
+
+    EXPIRE_INTERVAL = 30  # Seconds between expiry sweeps
+    TOUCH_INTERVAL = 60  # Reads refresh a session's last_access at most this often
+
+    def __init__(self, path, memory_limit=5, expiry=7200):
+        super().__init__(memory_limit, expiry)
+        self.path = path
+        self._local = threading.local()
+        self._last_expire = 0.0
+        conn = self._connection()
+        conn.execute("""CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY NOT NULL,
+            last_access REAL NOT NULL,
+            data TEXT NOT NULL
+        )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+        # Tables created before the NOT NULL constraint may hold anonymous rows
+        conn.execute("DELETE FROM sessions WHERE session_id IS NULL")
+        conn.commit()
+
+    def _connection(self):
+        # SQLite connections can't be shared across threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _expire(self, conn, now):
+        # The last_access index makes this a range delete over expired rows only
+        if now - self._last_expire >= self.EXPIRE_INTERVAL:
+            self._last_expire = now
+            conn.execute("DELETE FROM sessions WHERE last_access < ?", (now - self.expiry,))
+
+    def _load(self, conn, session_id, now):
+        row = conn.execute(
+            "SELECT last_access, data FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None or now - row[0] > self.expiry:
+            return SessionRecord(session_id, self.memory_limit, now)
+        return SessionRecord.from_json(session_id, row[1], self.memory_limit, now)
+
+    def _save(self, conn, record):
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, last_access, data) VALUES (?, ?, ?)",
+            (record.session_id, record.last_access, record.to_json())
+        )
+
+    def get(self, session_id):
+        # A plain read: a chat turn reads its session several times, and a write
+        # transaction for each would serialize every worker on the file lock.
+        # An unknown session isn't stored until its first edit.
+        if not session_id:
+            return self._anonymous()
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute(
+            "SELECT last_access, data FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None or now - row[0] > self.expiry:
+            return SessionRecord(session_id, self.memory_limit, now)
+        if now - row[0] >= self.TOUCH_INTERVAL:
+            conn.execute("UPDATE sessions SET last_access = ? WHERE session_id = ? AND last_access < ?",
+                         (now, session_id, now))
+        return SessionRecord.from_json(session_id, row[1], self.memory_limit, now)
+
+    @contextmanager
+    def edit(self, session_id):
+        if not session_id:
+            yield self._anonymous()
+            return
+        conn = self._connection()
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent edits of
+        # the same session from other processes are serialized
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._expire(conn, now)
+            record = self._load(conn, session_id, now)
+            yield record
+            self._save(conn, record)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def active_count(self):
+        cutoff = time.time() - self.expiry
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM sessions WHERE last_access >= ?", (cutoff,)
+        ).fetchone()[0]
+
+def create_session_store(backend='memory', path='./sessions.sqlite3', memory_limit=5, expiry=7200):
+    """Build the session store selected by configuration"""
+    if backend == 'sqlite':
+        return SQLiteSessionStore(path, memory_limit, expiry)
+    if backend == 'memory':
+        return InMemorySessionStore(memory_limit, expiry)
+    raise ValueError(f"Unknown session store backend: {backend}")
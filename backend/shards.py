@@ -0,0 +1,140 @@
+import json
+import os
+import re
+import threading
+
+from course_docs import course_department
+from reloadable import Reloadable
+
+# Written by init_db.py: every (department, level) shard and its collections
+SHARDS_PATH = './chroma_db/shards.json'
+
+LEVEL_ABBREVIATIONS = {'undergraduate': 'undergrad', 'graduate': 'grad'}
+
+# Department code followed by a course number, e.g. 'MATH 1151' or 'CSE3901'
+DEPARTMENT_COURSE_PATTERN = re.compile(r'\b([A-Z]{2,8})\s?(\d{4})')
+
+def shard_key(department, level):
+    return f"{department}:{level}"
+
+def course_shard(course):
+    """The shard a processed course belongs to"""
+    return shard_key(course_department(course), course['level'])
+
+def collection_names(department, level):
+    """(titles, courses) Chroma collection names for a shard"""
+    prefix = f"{department.lower()}_{LEVEL_ABBREVIATIONS.get(level, level)}"
+    return f"{prefix}_titles", f"{prefix}_courses"
+
+def split_by_shard(courses, directory):
+    """Write each shard's courses to its own JSON Lines file in ``directory``, in one pass.
+
+    Only one course is held in memory at a time. Returns shard key ->
+    {'department', 'level', 'subject', 'path'} for every shard in ``courses``.
+    """
+    shards = {}
+    files = {}
+    try:
+        for course in courses:
+            key = course_shard(course)
+            if key not in shards:
+                path = os.path.join(directory, f"shard_{len(shards)}.jsonl")
+                shards[key] = {'department': course_department(course), 'level': course['level'],
+                               'subject': course.get('subject', ''), 'path': path}
+                files[key] = open(path, 'w')
+            files[key].write(json.dumps(course) + '\n')
+    finally:
+        for f in files.values():
+            f.close()
+    return shards
+
+def write_shard_registry(shards, path=SHARDS_PATH):
+    """Atomically replace the registry; ``shards`` maps shard key -> entry"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(shards, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def read_shard_registry(path=SHARDS_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+class ShardRouter(Reloadable):
+    """Picks the collection shard a query searches, from the registry init_db.py writes.
+
+    Each query goes to one (department, level) shard, so query latency and
+    the number of open collections don't grow with the catalog. The
+    department is the first one named in the query, either as a course number
+    ('MATH 1151') or by subject name ('mathematics'), falling back to
+    ``default_department``. The level is the student's.
+    """
+
+    def __init__(self, path=SHARDS_PATH, default_department='CSE'):
+        super().__init__()
+        self.path = path
+        self.default_department = default_department
+        self.shards = {}
+        self._departments = set()
+        self._subjects = {}
+        self._lock = threading.Lock()
+
+    def _watched_paths(self):
+        return self.path,
+
+    def load(self):
+        with self._lock:
+            version = self._current_version()
+            shards = read_shard_registry(self.path)
+            # Lookup tables first, then the registry itself
+            self._departments = {entry['department'] for entry in shards.values()}
+            self._subjects = {re.compile(rf"\b{re.escape(entry['subject'].lower())}\b"): entry['department']
+                              for entry in shards.values() if entry.get('subject')}
+            self.shards = shards
+            self._version = version
+        print(f"Loaded shard registry: {len(shards)} shards")
+
+    def departments_in(self, query):
+        """Departments with shards that the query names, in the order they appear"""
+        found = [department for department, _ in DEPARTMENT_COURSE_PATTERN.findall(query.upper())]
+        lowered = query.lower()
+        found.extend(department for subject, department in self._subjects.items() if subject.search(lowered))
+        return [department for department in dict.fromkeys(found) if department in self._departments]
+
+    def route(self, query, level):
+        """Shard key for a query from a student at ``level``"""
+        self.reload_if_changed()
+        for department in self.departments_in(query):
+            if shard_key(department, level) in self.shards:
+                return shard_key(department, level)
+        return shard_key(self.default_department, level)
+
+class ShardCollections:
+    """Chroma (titles, courses) collection pairs per shard, opened on first use.
+
+    ``open_collection`` opens a collection by name. Only shards that queries
+    are routed to are ever opened.
+    """
+
+    def __init__(self, router, open_collection):
+        self.router = router
+        self.open_collection = open_collection
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        collections = self._collections.get(key)
+        if collections is None:
+            self.router.reload_if_changed()
+            entry = self.router.shards.get(key)
+            if entry is None:
+                raise KeyError(f"No collection shard {key}")
+            with self._lock:
+                collections = self._collections.get(key)
+                if collections is None:
+                    collections = (self.open_collection(entry['titles']), self.open_collection(entry['courses']))
+                    self._collections[key] = collections
+        return collections
@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+class TieredCache:
+    """Key/value cache: an in-memory LRU with size and TTL eviction, optionally backed by SQLite.
+
+    When ``db_path`` is given, entries are also written to ``table`` in a
+    local SQLite file, so warm caches survive restarts and are shared by every
+    worker process on the machine. ``to_disk`` and ``from_disk`` convert
+    values to and from the stored ``column`` (of SQL type ``column_type``).
+    Used by the embedding and transcript caches.
+    """
+
+    def __init__(self, table, column, column_type='BLOB', max_size=1000, ttl=24 * 3600, db_path=None,
+                 max_disk_entries=10000, to_disk=lambda value: value, from_disk=lambda stored: stored):
+        self.table = table
+        self.column = column
+        self.column_type = column_type
+        self.max_size = max_size
+        self.ttl = ttl
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        self.to_disk = to_disk
+        self.from_disk = from_disk
+
+        self._memory = OrderedDict()  # key -> (created, value)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._disk_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if db_path:
+            self._init_disk()
+
+    def get(self, key, now=None):
+        """The cached value, or None; counts the lookup as a hit or miss"""
+        now = now or time.time()
+        value = self._get_memory(key, now)
+        if value is None and self.db_path:
+            value = self._get_disk(key, now)
+            if value is not None:
+                self._put_memory(key, value, now)
+                with self._lock:
+                    self.disk_hits += 1
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, key, value, now=None):
+        now = now or time.time()
+        self._put_memory(key, value, now)
+        if self.db_path:
+            self._put_disk(key, value, now)
+
+    def _get_memory(self, key, now):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            created, value = entry
+            if now - created > self.ttl:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return value
+
+    def _put_memory(self, key, value, now):
+        if not self.max_size:
+            return
+        with self._lock:
+            self._memory[key] = (now, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_size:
+                self._memory.popitem(last=False)
+
+    def _connection(self):
+        # SQLite connections can't be shared across threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_disk(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(f"""CREATE TABLE IF NOT EXISTS {self.table} (
+            key TEXT PRIMARY KEY,
+            created REAL NOT NULL,
+            {self.column} {self.column_type} NOT NULL
+        )""")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_created ON {self.table} (created)")
+        conn.commit()
+
+    def _get_disk(self, key, now):
+        try:
+            row = self._connection().execute(
+                f"SELECT created, {self.column} FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Cache read from {self.table} failed: {e}")
+            return None
+        if row is None or now - row[0] > self.ttl:
+            return None
+        return self.from_disk(row[1])
+
+    def _put_disk(self, key, value, now):
+        try:
+            conn = self._connection()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, created, {self.column}) VALUES (?, ?, ?)",
+                (key, now, self.to_disk(value))
+            )
+            conn.commit()
+            self._disk_writes += 1
+            if self._disk_writes % 100 == 0:
+                self._prune_disk(conn, now)
+        except sqlite3.Error as e:
+            print(f"Cache write to {self.table} failed: {e}")
+
+    def _prune_disk(self, conn, now):
+        conn.execute(f"DELETE FROM {self.table} WHERE created < ?", (now - self.ttl,))
+        conn.execute(f"""DELETE FROM {self.table} WHERE key IN (
+            SELECT key FROM {self.table} ORDER BY created DESC LIMIT -1 OFFSET ?
+        )""", (self.max_disk_entries,))
+        conn.commit()
+
+    def stats(self):
+        """Hit/miss counters for this process"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._memory)
+            }
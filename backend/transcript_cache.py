@@ -0,0 +1,40 @@
+import hashlib
+import json
+
+from tiered_cache import TieredCache
+
+# Bump when the extraction output changes so older cached results are ignored
+EXTRACTION_VERSION = 1
+
+class TranscriptCache:
+    """Content-addressed cache of transcript extraction results.
+
+    Keys are the SHA-256 of the uploaded PDF bytes (plus EXTRACTION_VERSION
+    and anything else passed as ``namespace``); values are the extracted
+    course lists, never the PDF itself. Results live in an in-memory LRU with
+    size and TTL eviction and, when ``db_path`` is given, in a local SQLite
+    file shared by every worker process on the machine.
+    """
+
+    def __init__(self, max_size=256, ttl=7 * 24 * 3600, db_path=None, max_disk_entries=10000, namespace=''):
+        self.namespace = f"v{EXTRACTION_VERSION}:{namespace}"
+        # Results are stored as JSON text, so every get returns a fresh copy
+        self.cache = TieredCache('transcripts', 'result', 'TEXT', max_size=max_size, ttl=ttl,
+                                 db_path=db_path, max_disk_entries=max_disk_entries)
+
+    def key(self, pdf_bytes):
+        digest = hashlib.sha256(self.namespace.encode('utf-8'))
+        digest.update(pdf_bytes)
+        return digest.hexdigest()
+
+    def get(self, key):
+        """A copy of the cached extraction result, or None"""
+        result = self.cache.get(key)
+        return json.loads(result) if result is not None else None
+
+    def put(self, key, result):
+        self.cache.put(key, json.dumps(result))
+
+    def stats(self):
+        """Hit/miss counters for this process"""
+        return self.cache.stats()
@@ -0,0 +1,86 @@
+import re
+
+TERM_PATTERN = re.compile(r'\b(Autumn|Fall|Winter|Spring|Summer)\s+(?:Term\s+|Semester\s+)?(\d{4})\b', re.IGNORECASE)
+
+# Letter grades plus OSU's non-letter marks (EN = failure/non-attendance,
+# K/T = transfer credit, IP = in progress)
+GRADE = r'(?:A-|A|B\+|B-|B|C\+|C-|C|D\+|D|EN|E|S|U|NP|P|W|IP|I|K|T)'
+CREDITS = r'\d{1,2}\.\d{1,3}'
+
+# Attempted (and optionally earned) credits followed by the grade, e.g. "4.000 4.000 A- 14.800"
+CREDITS_THEN_GRADE = re.compile(rf'(?<![\d.])(?P<credits>{CREDITS})(?:\s+{CREDITS})?\s+(?P<grade>{GRADE})(?![\w+-])')
+CREDITS_ONLY = re.compile(rf'(?<![\d.])(?P<credits>{CREDITS})(?![\d.])')
+
+# Grades that count as having completed the course
+PASSING_GRADES = {'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D+', 'D', 'S', 'P', 'K', 'T'}
+
+class TranscriptParser:
+    """Deterministic transcript parser that is fed one page of text at a time.
+
+    Each line mentioning a course in ``subject`` counts as a mention; it is
+    parsed if credits (and usually a grade) can be read from it. The ratio of
+    parsed lines to mentions is the parse confidence the caller uses to decide
+    whether to fall back to the LLM.
+    """
+
+    def __init__(self, subject='CSE'):
+        self.subject = subject
+        # Keep honors (H) and decimal section suffixes, e.g. CSE 4998H, CSE 5477.01
+        self.course_pattern = re.compile(rf'\b{subject}\s*(\d{{4}}(?:H|\.\d{{2}})?)\b')
+        self.courses = []
+        self.mentions = 0
+        self.parsed = 0
+        self._term = None
+
+    def feed_page(self, text):
+        """Parse the text of one PDF page"""
+        for line in text.splitlines():
+            term_match = TERM_PATTERN.search(line)
+            if term_match:
+                self._term = f"{term_match.group(1).title()} {term_match.group(2)}"
+
+            course_match = self.course_pattern.search(line)
+            if not course_match:
+                continue
+            self.mentions += 1
+
+            course = self._parse_course_line(line[course_match.end():])
+            if course is None:
+                continue
+            course['number'] = f"{self.subject} {course_match.group(1)}"
+            course['term'] = self._term
+            self.courses.append(course)
+            self.parsed += 1
+
+    def _parse_course_line(self, rest):
+        match = CREDITS_THEN_GRADE.search(rest)
+        if match:
+            return {'credits': float(match.group('credits')), 'grade': match.group('grade')}
+
+        # In-progress courses have credits but no grade yet
+        match = CREDITS_ONLY.search(rest)
+        if match:
+            return {'credits': float(match.group('credits')), 'grade': None}
+        return None
+
+    @property
+    def confidence(self):
+        """Share of course mentions that parsed cleanly (0 when nothing was found)"""
+        return self.parsed / self.mentions if self.mentions else 0.0
+
+    def course_numbers(self):
+        """Distinct course numbers in transcript order"""
+        return list(dict.fromkeys(course['number'] for course in self.courses))
+
+    def completed_course_numbers(self):
+        """Distinct course numbers with a passing grade"""
+        return list(dict.fromkeys(
+            course['number'] for course in self.courses if course['grade'] in PASSING_GRADES
+        ))
+
+def parse_transcript(pages, subject='CSE'):
+    """Parse an iterable of page texts, returning the fed TranscriptParser"""
+    parser = TranscriptParser(subject)
+    for text in pages:
+        parser.feed_page(text)
+    return parser
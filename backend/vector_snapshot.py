@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from reloadable import Reloadable
+from retrieval import BaseRetriever
+
+SNAPSHOT_PATH = './vector_snapshot'
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def _save_atomic(path, writer):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        writer(f)
+    os.replace(tmp_path, path)
+
+def export_snapshot(collections_for_shard, shard_keys, path=SNAPSHOT_PATH):
+    """Write every shard's courses and precomputed embeddings to a snapshot directory.
+
+    Rows are grouped by shard so each (department, level) shard is a
+    contiguous slice of the matrices, and title/full rows share the same
+    order. Files:
+
+    - title_embeddings.npy, full_embeddings.npy: float32, L2-normalized rows
+    - documents.bin: UTF-8 full documents back to back
+    - offsets.npy: int64 byte offsets into documents.bin (one more than rows)
+    - index.json: ids, metadata and the row range of each shard (written last)
+    """
+    os.makedirs(path, exist_ok=True)
+    ids, metadatas, documents = [], [], []
+    title_blocks, full_blocks = [], []
+    shard_ranges = {}
+
+    for key in shard_keys:
+        title_collection, full_collection = collections_for_shard(key)
+        full = full_collection.get(include=['embeddings', 'documents', 'metadatas'])
+        title = title_collection.get(include=['embeddings'])
+        title_by_id = dict(zip(title['ids'], title['embeddings']))
+
+        start = len(ids)
+        title_rows, full_rows = [], []
+        for course_id, embedding, doc, metadata in zip(full['ids'], full['embeddings'], full['documents'], full['metadatas']):
+            if course_id not in title_by_id:
+                continue
+            ids.append(course_id)
+            metadatas.append(metadata)
+            documents.append(doc.encode('utf-8'))
+            full_rows.append(embedding)
+            title_rows.append(title_by_id[course_id])
+        if full_rows:
+            # Convert each shard as it is read rather than holding the whole catalog as Python lists
+            title_blocks.append(np.asarray(title_rows, dtype=np.float32))
+            full_blocks.append(np.asarray(full_rows, dtype=np.float32))
+        shard_ranges[key] = [start, len(ids)]
+
+    if not ids:
+        print("No courses found, snapshot not written")
+        return 0
+
+    title_matrix = _normalize_rows(np.concatenate(title_blocks))
+    full_matrix = _normalize_rows(np.concatenate(full_blocks))
+    offsets = np.zeros(len(documents) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(doc) for doc in documents])
+
+    _save_atomic(os.path.join(path, 'title_embeddings.npy'), lambda f: np.save(f, title_matrix))
+    _save_atomic(os.path.join(path, 'full_embeddings.npy'), lambda f: np.save(f, full_matrix))
+    _save_atomic(os.path.join(path, 'offsets.npy'), lambda f: np.save(f, offsets))
+    _save_atomic(os.path.join(path, 'documents.bin'), lambda f: f.write(b"".join(documents)))
+    _save_atomic(os.path.join(path, 'index.json'), lambda f: f.write(json.dumps({
+        'ids': ids,
+        'metadatas': metadatas,
+        'shards': shard_ranges
+    }).encode('utf-8')))
+    return len(ids)
+
+class SnapshotRetriever(Reloadable, BaseRetriever):
+    """Retrieval backend that answers top-k queries from a memory-mapped snapshot.
+
+    Matrices and documents are opened with mmap, so loading copies nothing and
+    worker processes share the pages through the OS cache. A search is one
+    embedding call plus a matrix product per collection over the shard's rows.
+    A retrieval.BaseRetriever, like retrieval.SemanticRetriever.
+    """
+
+    def __init__(self, embedding_function, path=SNAPSHOT_PATH):
+        super().__init__()
+        self.embedding_function = embedding_function
+        self.path = path
+        self._lock = threading.Lock()
+        self.load()
+
+    def _watched_paths(self):
+        # index.json is written last, so it changes once per export
+        return os.path.join(self.path, 'index.json'),
+
+    def load(self):
+        """(Re)open the snapshot files"""
+        with self._lock:
+            version = self._current_version()
+            with open(os.path.join(self.path, 'index.json')) as f:
+                index = json.load(f)
+            title = np.load(os.path.join(self.path, 'title_embeddings.npy'), mmap_mode='r')
+            full = np.load(os.path.join(self.path, 'full_embeddings.npy'), mmap_mode='r')
+            offsets = np.load(os.path.join(self.path, 'offsets.npy'), mmap_mode='r')
+            documents = np.memmap(os.path.join(self.path, 'documents.bin'), dtype=np.uint8, mode='r')
+
+            # Swap everything in at once so searches never mix two snapshots
+            self._state = (index, title, full, offsets, documents)
+            self._version = version
+            print(f"Loaded vector snapshot: {len(index['ids'])} courses")
+
+    def search_many(self, query_texts, shard, n_results=3, seen_courses=None, query_embeddings=None):
+        """Run several searches of one shard with one embedding call and one matrix product per collection"""
+        stats = self._new_stats()
+        if not query_texts:
+            return [], stats
+
+        self.reload_if_changed()
+        index, title, full, offsets, documents = self._state
+        start, end = index.get('shards', {}).get(shard, (0, 0))
+        if start == end:
+            return [[] for _ in query_texts], stats
+
+        query_embeddings = self._embed_queries(query_texts, query_embeddings, stats)
+        queries = _normalize_rows(np.asarray(query_embeddings, dtype=np.float32))
+
+        # Contiguous shard slices of the memmaps are views, not copies
+        k = min(n_results, end - start)
+        title_top = self._top_k(queries @ title[start:end].T, k)
+        full_top = self._top_k(queries @ full[start:end].T, k)
+
+        def decode(row):
+            row = start + int(row)
+            return bytes(documents[offsets[row]:offsets[row + 1]]).decode('utf-8')
+
+        # Title hits first, then full-document hits, as with the Chroma backend
+        results = [
+            self._take_unseen(map(decode, list(title_top[i]) + list(full_top[i])), seen, n_results)
+            for i, seen in enumerate(self._seen_sets(seen_courses, len(query_texts)))
+        ]
+        return results, stats
+
+    @staticmethod
+    def _top_k(scores, k):
+        """Row-wise indices of the k highest scores, best first"""
+        if k < scores.shape[1]:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+        order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1)
+        return np.take_along_axis(candidates, order, axis=1)
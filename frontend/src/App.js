@@ -40,12 +40,59 @@ function App() {
     setError(null);
 
     try {
-      const res = await axios.post('http://127.0.0.1:5000/chat', { 
-        message,
-        session_id: sessionId
+      // Stream the response as server-sent events so text shows up as it is generated
+      const res = await fetch('http://127.0.0.1:5000/chat/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          message,
+          session_id: sessionId
+        }),
       });
-      const aiMessage = { role: 'assistant', content: res.data.response };
-      setConversation((prev) => [...prev, aiMessage]);
+      if (!res.ok || !res.body) {
+        throw new Error(`Request failed with status ${res.status}`);
+      }
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let started = false;
+
+      const appendToResponse = (text) => {
+        setConversation((prev) => {
+          const updated = [...prev];
+          const last = updated[updated.length - 1];
+          updated[updated.length - 1] = { ...last, content: last.content + text };
+          return updated;
+        });
+      };
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+
+        for (const event of events) {
+          const line = event.split('\n').find((l) => l.startsWith('data: '));
+          if (!line) continue;
+          const data = JSON.parse(line.slice('data: '.length));
+
+          if (data.error) {
+            throw new Error(data.error);
+          }
+          if (data.token) {
+            if (!started) {
+              started = true;
+              setLoading(false);
+              setConversation((prev) => [...prev, { role: 'assistant', content: '' }]);
+            }
+            appendToResponse(data.token);
+          }
+        }
+      }
     } catch (error) {
       console.error('Error fetching the AI response', error);
       setError('Sorry, there was an error getting the response. Please try again.');